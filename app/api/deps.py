@@ -1,8 +1,8 @@
 
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
@@ -11,7 +11,9 @@ from app.core import security
 from app.core.config import settings
 from app.models.user import User, UserRole
 from app.schemas.user import TokenPayload
-from app.models.token import RevokedToken, UserGlobalRevocation
+from app.core.revocation import revocation_cache
+from app.core.principal import Principal, principal_cache
+from app.core.auth_context import AuthContext, get_auth_context, verify_token
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -24,22 +26,30 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+async def get_token_context(
+    request: Request, token: str = Depends(reusable_oauth2)
+) -> AuthContext:
+    # Normally already verified by LoggingMiddleware
+    auth = get_auth_context(request)
+    if auth is None or auth.token != token:
+        try:
+            auth = verify_token(token)
+        except (JWTError, ValidationError):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+    return auth
+
 async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> User:
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-    except (JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
+    db: Session = Depends(get_db), auth: AuthContext = Depends(get_token_context)
+) -> Principal:
+    token = auth.token
+    payload = auth.payload
+    token_data = auth.token_data
         
     # Check if token is revoked
-    if await RevokedToken.find_one(RevokedToken.token == token):
+    if await revocation_cache.is_token_revoked(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been revoked",
@@ -47,12 +57,10 @@ async def get_current_user(
         
     # Check global revocation (Password changes)
     # If token issued BEFORE last revocation, deny.
-    global_revocation = await UserGlobalRevocation.find_one(UserGlobalRevocation.user_id == token_data.sub)
-    if global_revocation:
+    revoked_ts = await revocation_cache.get_user_revoked_at(token_data.sub)
+    if revoked_ts is not None:
         if "iat" in payload:
             token_iat = payload["iat"]
-            revoked_ts = global_revocation.revoked_at.timestamp()
-            # Allow a small buffer (e.g. 1 sec) or strictly > ?
             # Logic: if iat < revoked_at => token is old.
             if token_iat < revoked_ts:
                  raise HTTPException(
@@ -60,20 +68,19 @@ async def get_current_user(
                     detail="Session expired, please login again",
                 )
 
-    user = db.query(User).filter(User.id == token_data.sub).first()
+    user = principal_cache.get(db, token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    # Attach current role from token to user instance
+    # Attach current role from token to the principal
     # This is a runtime attribute, not persisted
-    user.current_role = token_data.role
-    return user
+    return user.with_role(token_data.role)
 
 def get_current_active_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if current_user.current_role != UserRole.ADMIN:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
@@ -81,8 +88,8 @@ def get_current_active_admin(
     return current_user
 
 def get_current_active_teacher(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if current_user.current_role != UserRole.TEACHER and current_user.current_role != UserRole.ADMIN:
          raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
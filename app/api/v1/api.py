@@ -1,6 +1,6 @@
 
 from fastapi import APIRouter
-from app.api.v1.endpoints import login, users, academic, courses, registration, examination, grades, disciplines, reports, settings
+from app.api.v1.endpoints import login, users, academic, courses, registration, examination, grades, disciplines, reports, settings, diagnostics
 
 api_router = APIRouter()
 api_router.include_router(login.router, tags=["login"])
@@ -14,3 +14,4 @@ api_router.include_router(grades.router, prefix="/grades", tags=["grades"])
 api_router.include_router(disciplines.router, prefix="/disciplines", tags=["disciplines"])
 api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
 api_router.include_router(settings.router, prefix="/settings", tags=["settings"])
+api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
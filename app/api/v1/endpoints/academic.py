@@ -4,8 +4,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.principal import Principal
 from app.models.academic import Semester, CalendarEvent
-from app.models.user import User
+from app.models.course import CourseOffering
+from app.services.gpa import registered_students
+from app.services.history import record_history_change
 from app.schemas.academic import Semester as SemesterSchema, SemesterCreate, SemesterUpdate, CalendarEvent as CalendarEventSchema, CalendarEventCreate
 
 router = APIRouter()
@@ -15,7 +18,7 @@ def read_semesters(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve semesters.
@@ -28,7 +31,7 @@ def create_semester(
     *,
     db: Session = Depends(deps.get_db),
     semester_in: SemesterCreate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new semester.
@@ -44,7 +47,7 @@ def create_calendar_event(
     *,
     db: Session = Depends(deps.get_db),
     event_in: CalendarEventCreate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new calendar event.
@@ -63,7 +66,7 @@ def update_calendar_event(
     db: Session = Depends(deps.get_db),
     event_id: int,
     event_in: CalendarEventUpdate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update a calendar event.
@@ -86,7 +89,7 @@ def delete_calendar_event(
     *,
     db: Session = Depends(deps.get_db),
     event_id: int,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Delete a calendar event.
@@ -107,7 +110,7 @@ def update_semester(
     db: Session = Depends(deps.get_db),
     semester_id: int,
     semester_in: SemesterUpdate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update a semester.
@@ -121,6 +124,8 @@ def update_semester(
         setattr(semester, field, value)
         
     db.add(semester)
+    # Name and start date appear in the academic history and order the running CGPA
+    record_history_change(db, registered_students(db, CourseOffering.semester_id == semester.id))
     db.commit()
     db.refresh(semester)
     return semester
@@ -130,7 +135,7 @@ def delete_semester(
     *,
     db: Session = Depends(deps.get_db),
     semester_id: int,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Delete a semester.
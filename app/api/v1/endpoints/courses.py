@@ -1,14 +1,19 @@
 
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import csv
 import io
 
 from app.api import deps
+from app.core.principal import Principal
 from app.models.course import Course, CourseOffering, TeacherCourse, CourseCategory
 from app.models.examination import Examination
 from app.models.user import User, UserRole
+from app.services.gpa import registered_students
+from app.services.history import record_history_change
+from app.services.ingest import semester_ids_by_name
 from app.schemas.course import Course as CourseSchema, CourseCreate, CourseOffering as CourseOfferingSchema, CourseOfferingCreate
 
 router = APIRouter()
@@ -18,7 +23,7 @@ def read_courses(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve courses.
@@ -31,7 +36,7 @@ def create_course(
     *,
     db: Session = Depends(deps.get_db),
     course_in: CourseCreate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new course.
@@ -49,7 +54,7 @@ def create_course(
 def read_semester_courses(
     semester_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve courses for a semester based on user role.
@@ -84,7 +89,7 @@ def read_semester_course_details(
     semester_id: int,
     course_code: str,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve student details, grades, and marks for a specific course offering.
@@ -169,7 +174,7 @@ def read_semester_course_details(
 def read_course_offerings(
     semester_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve course offerings for a semester.
@@ -184,7 +189,7 @@ def create_course_offering(
     *,
     db: Session = Depends(deps.get_db),
     offering_in: CourseOfferingCreate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new course offering.
@@ -203,7 +208,7 @@ def update_course_offering(
     db: Session = Depends(deps.get_db),
     offering_id: int,
     offering_in: CourseOfferingUpdate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update a course offering.
@@ -217,6 +222,8 @@ def update_course_offering(
         setattr(offering, field, value)
         
     db.add(offering)
+    # The course and semester of the offering feed its students' GPA rows and academic history
+    record_history_change(db, registered_students(db, CourseOffering.id == offering.id))
     db.commit()
     db.refresh(offering)
     return offering
@@ -226,7 +233,7 @@ def delete_course_offering(
     *,
     db: Session = Depends(deps.get_db),
     offering_id: int,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Delete a course offering.
@@ -247,7 +254,7 @@ def delete_course_offering(
 async def bulk_upload_course_offerings(
     file: UploadFile = File(...),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Bulk upload course offerings from CSV.
@@ -275,128 +282,157 @@ async def bulk_upload_course_offerings(
     reserved_columns = {'course_code', 'semester', 'course_name', 'category', 'credits', 'teacher_ids'}
     exam_columns = [col for col in fieldnames if col not in reserved_columns]
     
-    courses_created = 0
-    offerings_created = 0
-    exams_created = 0
-    errors = []
-    
-    from app.models.academic import Semester
-    
+    # Parse the whole sheet first so every reference can be resolved in one query per table
+    rows = []
     for row_idx, row in enumerate(csv_reader):
-        try:
-            course_code = row.get('course_code', '').strip() if row.get('course_code', '') else None
-            semester_name = row.get('semester', '').strip() if row.get('semester', '') else None   
-            course_name = row.get('course_name', '').strip() if row.get('course_name', '') else None
-            category_str = row.get('category', '').strip() if row.get('category', '') else None
-            credits_str = row.get('credits', '').strip() if row.get('credits', '') else None
-            teacher_ids_str = row.get('teacher_ids', '').strip() if row.get('teacher_ids', '') else None
-            
-            if not course_code or not semester_name:
-                errors.append(f"Row {row_idx}: Missing course_code or semester")
-                continue
-
-            # Lookup semester
-            semester = db.query(Semester).filter(Semester.name == semester_name).first()
-            if not semester:
-                errors.append(f"Row {row_idx}: Semester '{semester_name}' not found")
-                continue
-            semester_id = semester.id
-            
-            # Check/Create Course
-            course = db.query(Course).filter(Course.code == course_code).first()
-            if not course:
-                # Create course if details provided
-                if course_name and category_str:
-                     # Parse credits L-T-P
-                    l, t, p = 0, 0, 0
-                    if credits_str:
-                        parts = credits_str.split('-')
-                        if len(parts) == 3:
-                            l, t, p = map(int, parts)
-                    
-                    course = Course(
-                        code=course_code,
-                        name=course_name,
-                        category=CourseCategory(category_str),
-                        lecture_credits=l,
-                        tutorial_credits=t,
-                        practice_credits=p
-                    )
-                    db.add(course)
-                    db.flush() # Flush to get it in session but not commit yet
-                    courses_created += 1
-                else:
-                    errors.append(f"Row {row_idx}: Course {course_code} not found and details not provided")
+        fields = {key: (value or '').strip() if isinstance(value, str) else '' for key, value in row.items() if key}
+        rows.append((row_idx, fields))
+    
+    def ingest():
+        courses_created = 0
+        offerings_created = 0
+        exams_created = 0
+        errors = []
+        
+        semester_names = {fields.get('semester') for _, fields in rows} - {''}
+        course_codes = {fields.get('course_code') for _, fields in rows} - {''}
+        teacher_ids = {
+            tid.strip()
+            for _, fields in rows
+            for tid in fields.get('teacher_ids', '').split(';')
+        } - {''}
+        
+        semesters = semester_ids_by_name(db, semester_names)
+        courses = {
+            code for (code,) in db.query(Course.code).filter(Course.code.in_(course_codes))
+        } if course_codes else set()
+        offerings = {
+            (offering.course_code, offering.semester_id): offering
+            for offering in db.query(CourseOffering).filter(
+                CourseOffering.course_code.in_(course_codes),
+                CourseOffering.semester_id.in_(set(semesters.values())),
+            ).order_by(CourseOffering.id.desc())
+        } if course_codes and semesters else {}
+        existing_offering_ids = [offering.id for offering in offerings.values()]
+        teachers = {
+            tid for (tid,) in db.query(User.id).filter(User.id.in_(teacher_ids))
+        } if teacher_ids else set()
+        assignments = {
+            (tid, offering_id) for tid, offering_id in db.query(TeacherCourse.teacher_id, TeacherCourse.course_offering_id)
+            .filter(TeacherCourse.course_offering_id.in_(existing_offering_ids))
+        } if existing_offering_ids else set()
+        exams = {
+            (exam.course_offering_id, exam.name): exam
+            for exam in db.query(Examination).filter(Examination.course_offering_id.in_(existing_offering_ids))
+        } if existing_offering_ids else {}
+        
+        new_courses = []
+        new_offerings = []
+        # (offering, teacher_id) and (offering, exam_name) -> max_marks; new offerings have no id yet
+        new_assignments = {}
+        new_exams = {}
+        
+        for row_idx, fields in rows:
+            try:
+                course_code = fields.get('course_code')
+                semester_name = fields.get('semester')
+                course_name = fields.get('course_name')
+                category_str = fields.get('category')
+                credits_str = fields.get('credits')
+                teacher_ids_str = fields.get('teacher_ids')
+                
+                if not course_code or not semester_name:
+                    errors.append(f"Row {row_idx}: Missing course_code or semester")
                     continue
-            
-            # Create Offering if it does not exist
-            offering = db.query(CourseOffering).filter(
-                CourseOffering.course_code == course_code,
-                CourseOffering.semester_id == semester_id
-            ).first()
-            
-            if not offering:
-                offering = CourseOffering(course_code=course_code, semester_id=semester_id)
-                db.add(offering)
-                db.flush()
-                offerings_created += 1
-            
-            # Assign Teachers
-            if teacher_ids_str:
-                teacher_ids = teacher_ids_str.split(';')
-                for tid in teacher_ids:
-                    tid = tid.strip()
-                    if not tid: continue
-                    # Check if teacher exists
-                    teacher = db.query(User).filter(User.id == tid).first() # Assuming User ID is used
-                    if teacher:
-                        # Check if already assigned
-                        exists = db.query(TeacherCourse).filter(
-                            TeacherCourse.teacher_id == tid,
-                            TeacherCourse.course_offering_id == offering.id
-                        ).first()
-                        if not exists:
-                            tc = TeacherCourse(teacher_id=tid, course_offering_id=offering.id)
-                            db.add(tc)
-            
-            # Process exam columns
-            for exam_name in exam_columns:
-                max_marks_str = row.get(exam_name, '').strip() if row.get(exam_name, '') else None
                 
-                # Skip if empty or zero
-                if not max_marks_str or max_marks_str == '0':
+                semester_id = semesters.get(semester_name)
+                if semester_id is None:
+                    errors.append(f"Row {row_idx}: Semester '{semester_name}' not found")
                     continue
                 
-                try:
-                    max_marks = float(max_marks_str)
-                    if max_marks <= 0:
+                # Check/Create Course
+                if course_code not in courses:
+                    # Create course if details provided
+                    if course_name and category_str:
+                        # Parse credits L-T-P
+                        l, t, p = 0, 0, 0
+                        if credits_str:
+                            parts = credits_str.split('-')
+                            if len(parts) == 3:
+                                l, t, p = map(int, parts)
+                        
+                        new_courses.append(Course(
+                            code=course_code,
+                            name=course_name,
+                            category=CourseCategory(category_str),
+                            lecture_credits=l,
+                            tutorial_credits=t,
+                            practice_credits=p
+                        ))
+                        courses.add(course_code)
+                        courses_created += 1
+                    else:
+                        errors.append(f"Row {row_idx}: Course {course_code} not found and details not provided")
                         continue
-                except ValueError:
-                    errors.append(f"Row {row_idx}: Invalid max_marks '{max_marks_str}' for exam '{exam_name}'")
-                    continue
                 
-                # Check if exam already exists
-                exam = db.query(Examination).filter(
-                    Examination.course_offering_id == offering.id,
-                    Examination.name == exam_name
-                ).first()
+                # Create Offering if it does not exist
+                offering = offerings.get((course_code, semester_id))
+                if offering is None:
+                    offering = offerings[(course_code, semester_id)] = CourseOffering(course_code=course_code, semester_id=semester_id)
+                    new_offerings.append(offering)
+                    offerings_created += 1
                 
-                if not exam:
-                    exam = Examination(
-                        course_offering_id=offering.id,
-                        name=exam_name,
-                        max_marks=max_marks
-                    )
-                    db.add(exam)
-                    exams_created += 1
-                else:
-                    # Update max_marks if exam already exists
-                    exam.max_marks = max_marks
-
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
+                # Assign Teachers; unknown teacher ids are ignored
+                if teacher_ids_str:
+                    for tid in teacher_ids_str.split(';'):
+                        tid = tid.strip()
+                        if tid in teachers and (tid, offering.id) not in assignments:
+                            new_assignments[(id(offering), tid)] = (offering, tid)
+                
+                # Process exam columns
+                for exam_name in exam_columns:
+                    max_marks_str = fields.get(exam_name)
+                    
+                    # Skip if empty or zero
+                    if not max_marks_str or max_marks_str == '0':
+                        continue
+                    
+                    try:
+                        max_marks = float(max_marks_str)
+                        if max_marks <= 0:
+                            continue
+                    except ValueError:
+                        errors.append(f"Row {row_idx}: Invalid max_marks '{max_marks_str}' for exam '{exam_name}'")
+                        continue
+                    
+                    exam = exams.get((offering.id, exam_name)) if offering.id is not None else None
+                    if exam is not None:
+                        # Update max_marks if exam already exists
+                        exam.max_marks = max_marks
+                    else:
+                        if (id(offering), exam_name) not in new_exams:
+                            exams_created += 1
+                        new_exams[(id(offering), exam_name)] = (offering, exam_name, max_marks)
+            
+            except Exception as e:
+                errors.append(f"Row {row_idx}: {str(e)}")
+        
+        # One flush inserts the new courses and offerings, then the links and exams that need offering ids
+        db.add_all(new_courses)
+        db.add_all(new_offerings)
+        db.flush()
+        db.add_all([
+            TeacherCourse(teacher_id=tid, course_offering_id=offering.id)
+            for offering, tid in new_assignments.values()
+        ])
+        db.add_all([
+            Examination(course_offering_id=offering.id, name=exam_name, max_marks=max_marks)
+            for offering, exam_name, max_marks in new_exams.values()
+        ])
+        db.commit()
+        return courses_created, offerings_created, exams_created, errors
     
-    db.commit()
+    courses_created, offerings_created, exams_created, errors = await run_in_threadpool(ingest)
     
     return {
         "courses_created": courses_created,
@@ -413,7 +449,7 @@ def assign_teacher_to_offering(
     db: Session = Depends(deps.get_db),
     offering_id: int,
     teacher_id: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Assign a teacher to a course offering.
@@ -449,7 +485,7 @@ def remove_teacher_from_offering(
     db: Session = Depends(deps.get_db),
     offering_id: int,
     teacher_id: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Remove a teacher from a course offering.
@@ -471,7 +507,7 @@ def list_teachers_for_offering(
     *,
     db: Session = Depends(deps.get_db),
     offering_id: int,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     List all teachers assigned to a course offering.
@@ -502,7 +538,7 @@ def update_course(
     db: Session = Depends(deps.get_db),
     course_code: str,
     course_in: CourseUpdate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update a course.
@@ -516,6 +552,8 @@ def update_course(
         setattr(course, field, value)
         
     db.add(course)
+    # Name and credits feed the GPA rows and academic history of everyone who took the course
+    record_history_change(db, registered_students(db, CourseOffering.course_code == course.code))
     db.commit()
     db.refresh(course)
     return course
@@ -525,7 +563,7 @@ def delete_course(
     *,
     db: Session = Depends(deps.get_db),
     course_code: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Delete a course.
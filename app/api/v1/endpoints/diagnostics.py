@@ -0,0 +1,90 @@
+from typing import Any
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.api import deps
+from app.core import auth_context
+from app.core.hashing import password_hasher
+from app.core.log_writer import api_log_writer
+from app.core.metrics import metrics_registry
+from app.core.principal import Principal, principal_cache
+from app.core.revocation import revocation_cache
+from app.core.slow_query import slow_query_recorder
+from app.services.history import academic_history_cache
+from app.models.slow_query import SlowQuery
+
+router = APIRouter()
+
+@router.get("/runtime")
+def read_runtime_stats(
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    In-process cache and executor statistics for this worker.
+    """
+    return {
+        "auth_context_cache": auth_context.stats(),
+        "principal_cache": principal_cache.stats(),
+        "revocation_cache": revocation_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "api_log_writer": api_log_writer.stats(),
+        "slow_query_recorder": slow_query_recorder.stats(),
+        "academic_history_cache": academic_history_cache.stats(),
+    }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics(
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Per-route request metrics for this worker in Prometheus text format.
+    """
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+@router.get("/slow-queries")
+async def read_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Recorded slow SQL statements grouped by statement text, worst total time first.
+    """
+    pipeline = [
+        # Newest first, so $first picks the latest sample of each statement
+        {"$sort": {"timestamp": -1}},
+        {"$group": {
+            "_id": "$statement",
+            "count": {"$sum": 1},
+            "total_ms": {"$sum": "$duration_ms"},
+            "max_ms": {"$max": "$duration_ms"},
+            "last_seen": {"$first": "$timestamp"},
+            "parameter_types": {"$first": "$parameter_types"},
+            "endpoints": {"$addToSet": "$endpoint"},
+            # Most recent captured plan, if any sample of this statement was explained.
+            # Samples without one map to null, which sorts below any document.
+            "latest_plan": {"$max": {"$cond": [
+                {"$eq": [{"$ifNull": ["$plan", None]}, None]},
+                None,
+                {"timestamp": "$timestamp", "plan": "$plan"},
+            ]}},
+        }},
+        {"$sort": {"total_ms": -1}},
+        {"$limit": limit},
+    ]
+    return [
+        {
+            "statement": group["_id"],
+            "count": group["count"],
+            "total_ms": round(group["total_ms"], 2),
+            "avg_ms": round(group["total_ms"] / group["count"], 2),
+            "max_ms": group["max_ms"],
+            "last_seen": group["last_seen"],
+            "parameter_types": group["parameter_types"],
+            "endpoints": group["endpoints"],
+            "plan": group["latest_plan"]["plan"] if group["latest_plan"] else None,
+        }
+        for group in await SlowQuery.aggregate(pipeline).to_list()
+    ]
@@ -1,10 +1,13 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.principal import Principal
 from app.models.discipline import Discipline
 from app.models.user import User
+from app.services.history import bump_history_version
 from app.schemas.discipline import Discipline as DisciplineSchema, DisciplineCreate, DisciplineUpdate
 
 router = APIRouter()
@@ -14,7 +17,7 @@ def read_disciplines(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve disciplines.
@@ -27,7 +30,7 @@ def create_discipline(
     *,
     db: Session = Depends(deps.get_db),
     discipline_in: DisciplineCreate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new discipline.
@@ -46,7 +49,7 @@ def create_discipline(
 def read_discipline(
     code: str,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get discipline by code.
@@ -62,7 +65,7 @@ def update_discipline(
     db: Session = Depends(deps.get_db),
     code: str,
     discipline_in: DisciplineUpdate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update discipline.
@@ -75,6 +78,10 @@ def update_discipline(
     for field, value in update_data.items():
         setattr(discipline, field, value)
     
+    # The discipline name appears in its students' academic histories
+    if "name" in update_data:
+        bump_history_version(db, db.scalars(select(User.id).where(User.discipline_code == discipline.code)))
+    
     db.add(discipline)
     db.commit()
     db.refresh(discipline)
@@ -85,7 +92,7 @@ def delete_discipline(
     *,
     db: Session = Depends(deps.get_db),
     code: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Delete (deactivate) discipline.
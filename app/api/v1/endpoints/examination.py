@@ -1,15 +1,18 @@
 
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import csv
 import io
 
 from app.api import deps
-from app.models.examination import Examination, Marks, Registration
+from app.core.principal import Principal
+from app.models.examination import Examination
 from app.models.course import CourseOffering
-from app.models.user import User, UserRole
+from app.models.user import UserRole
 from app.schemas.examination import Examination as ExaminationSchema, ExaminationCreate
+from app.services.marks import apply_marks_sheet, load_registrations, upsert_marks
 
 router = APIRouter()
 
@@ -18,7 +21,7 @@ def create_examination(
     *,
     db: Session = Depends(deps.get_db),
     exam_in: ExaminationCreate,
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Create new examination.
@@ -31,13 +34,13 @@ def create_examination(
 
 from app.schemas.examination import ExaminationUpdate
 
-@router.put("/{exam_id}", response_model=ExaminationSchema)
+@router.put("/{exam_id:int}", response_model=ExaminationSchema)
 def update_examination(
     *,
     db: Session = Depends(deps.get_db),
     exam_id: int,
     exam_in: ExaminationUpdate,
-    current_user: User = Depends(deps.get_current_active_teacher), # Teachers/Admins
+    current_user: Principal = Depends(deps.get_current_active_teacher), # Teachers/Admins
 ) -> Any:
     """
     Update an examination.
@@ -60,7 +63,7 @@ def delete_examination(
     *,
     db: Session = Depends(deps.get_db),
     exam_id: int,
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Delete an examination.
@@ -83,7 +86,7 @@ async def bulk_upload_marks(
     semester_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Bulk upload marks from CSV.
@@ -118,80 +121,12 @@ async def bulk_upload_marks(
     if 'student_id' not in fieldnames:
         raise HTTPException(status_code=400, detail="Missing required column: student_id")
     
-    marks_updated = 0
-    exams_processed = set()
-    errors = []
+    def ingest():
+        result = apply_marks_sheet(db, offering.id, csv_reader)
+        db.commit()
+        return result
     
-    # Get all exams for this offering
-    existing_exams = {e.name: e for e in db.query(Examination).filter(Examination.course_offering_id == offering.id).all()}
-    
-    for row_idx, row in enumerate(csv_reader):
-        try:
-            student_id = row.get('student_id', '').strip() if row.get('student_id', '') else None
-            if not student_id:
-                errors.append(f"Row {row_idx}: Missing student_id")
-                continue
-            
-            # Check registration only if student_id is present
-            registration = db.query(Registration).filter(
-                Registration.student_id == student_id,
-                Registration.course_offering_id == offering.id
-            ).first()
-            
-            if not registration:
-                errors.append(f"Row {row_idx}: Registration not found for student {student_id}")
-                continue
-
-            for key, value in row.items():
-                if key == 'student_id' or not key: 
-                    continue
-                
-                exam_name = key.strip()
-                val_str = value.strip() if value else ''
-                
-                if not val_str:
-                    continue # Skip empty values
-                    
-                try:
-                    marks_obtained = float(val_str)
-                except ValueError:
-                    errors.append(f"Row {row_idx}: Invalid marks '{val_str}' for {exam_name}")
-                    continue
-                
-                if exam_name not in existing_exams:
-                    errors.append(f"Row {row_idx}: Examination {exam_name} not found")
-                    continue
-                
-                exam = existing_exams[exam_name]
-                exams_processed.add(exam_name)
-                
-                # Update/Create Marks
-                marks = db.query(Marks).filter(
-                    Marks.registration_id == registration.id,
-                    Marks.examination_id == exam.id
-                ).first()
-                
-                if marks:
-                    marks.marks_obtained = marks_obtained
-                else:
-                    marks = Marks(
-                        registration_id=registration.id,
-                        examination_id=exam.id,
-                        marks_obtained=marks_obtained
-                    )
-                    db.add(marks)
-                marks_updated += 1
-
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
-            
-    db.commit()
-    
-    return {
-        "marks_updated": marks_updated,
-        "exams_processed": list(exams_processed),
-        "errors": errors
-    }
+    return await run_in_threadpool(ingest)
 
 from app.schemas.examination import MarkUpdate
 
@@ -200,7 +135,7 @@ def update_marks(
     *,
     db: Session = Depends(deps.get_db),
     mark_in: MarkUpdate,
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Update marks for a specific student and exam.
@@ -221,12 +156,8 @@ def update_marks(
         raise HTTPException(status_code=404, detail="Course offering not found")
         
     # Verify registration
-    registration = db.query(Registration).filter(
-        Registration.student_id == mark_in.student_id,
-        Registration.course_offering_id == offering.id
-    ).first()
-    
-    if not registration:
+    registration_id = load_registrations(db, offering.id, [mark_in.student_id]).get(mark_in.student_id)
+    if registration_id is None:
         raise HTTPException(status_code=404, detail="Registration not found")
         
     # Verify examination
@@ -238,22 +169,7 @@ def update_marks(
     if not exam:
         raise HTTPException(status_code=404, detail="Examination not found")
         
-    # Update/Create Marks
-    marks = db.query(Marks).filter(
-        Marks.registration_id == registration.id,
-        Marks.examination_id == exam.id
-    ).first()
-    
-    if marks:
-        marks.marks_obtained = mark_in.marks
-    else:
-        marks = Marks(
-            registration_id=registration.id,
-            examination_id=exam.id,
-            marks_obtained=mark_in.marks
-        )
-        db.add(marks)
-        
+    upsert_marks(db, {(registration_id, exam.id): mark_in.marks})
     db.commit()
     
     return {"message": "Marks updated successfully"}
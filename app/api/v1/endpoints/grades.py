@@ -1,12 +1,19 @@
-
-from typing import Any, List
+from typing import Any, List, Optional
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.orm import Session, selectinload
 
 from app.api import deps
-from app.models.examination import GradeMapping
-from app.models.user import User
-from app.schemas.examination import GradeMapping as GradeMappingSchema, GradeMappingCreate
+from app.core.principal import Principal
+from app.models.examination import GradeMapping, GradeMappingVersion
+from app.schemas.examination import (
+    GradeMapping as GradeMappingSchema,
+    GradeMappingCreate,
+    GradeMappingVersion as GradeMappingVersionSchema,
+)
+from app.services.grading import grade_tables, create_mapping_version
+from app.services.recompute import correct_mapping_version
 
 router = APIRouter()
 
@@ -15,35 +22,92 @@ def read_grade_mappings(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
-    Retrieve grade mappings.
+    Retrieve the grade mappings currently in force.
     """
-    mappings = db.query(GradeMapping).offset(skip).limit(limit).all()
+    table = grade_tables.current(db)
+    if not table:
+        return []
+    mappings = db.query(GradeMapping).filter(GradeMapping.version_id == table.version_id).order_by(GradeMapping.id).offset(skip).limit(limit).all()
     return mappings
 
+@router.get("/mappings/versions", response_model=List[GradeMappingVersionSchema])
+def read_grade_mapping_versions(
+    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Retrieve all grade mapping versions, newest first.
+    """
+    return db.query(GradeMappingVersion).options(selectinload(GradeMappingVersion.mappings)).order_by(
+        GradeMappingVersion.effective_from.desc(), GradeMappingVersion.id.desc()
+    ).all()
+
 @router.post("/mappings", response_model=List[GradeMappingSchema])
 def update_grade_mappings(
     *,
     db: Session = Depends(deps.get_db),
     mappings_in: List[GradeMappingCreate],
-    current_user: User = Depends(deps.get_current_active_admin),
+    effective_from: Optional[datetime] = None,
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update or create grade mappings.
+
+    Mappings are never changed in place: the current set, with these grades
+    updated or added, is saved as a new version effective from effective_from
+    (default now). Grades already awarded keep the points of their version.
     """
-    # For simplicity, we can clear existing and re-create, or update/insert.
-    # Let's do update/insert based on grade.
-    results = []
+    if effective_from is None:
+        effective_from = datetime.now(timezone.utc)
+    elif effective_from.tzinfo is None:
+        raise HTTPException(status_code=400, detail="effective_from must include a timezone")
+
+    # Versions are created one at a time, each from the latest state of the table
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('grade_mapping_versions'))"))
+    grade_tables.invalidate()
+    base = grade_tables.at(db, effective_from)
+    points = dict(base.points) if base else {}
     for mapping_in in mappings_in:
-        mapping = db.query(GradeMapping).filter(GradeMapping.grade == mapping_in.grade).first()
-        if mapping:
-            mapping.points = mapping_in.points
-        else:
-            mapping = GradeMapping(grade=mapping_in.grade, points=mapping_in.points)
-            db.add(mapping)
+        points[mapping_in.grade] = mapping_in.points
+
+    version = create_mapping_version(db, points, effective_from)
+    db.commit()
+    grade_tables.invalidate()
+
+    updated = {mapping_in.grade for mapping_in in mappings_in}
+    return [mapping for mapping in version.mappings if mapping.grade in updated]
+
+@router.post("/mappings/versions/{version_id}/corrections", response_model=Any)
+def correct_grade_mapping_version(
+    *,
+    db: Session = Depends(deps.get_db),
+    version_id: int,
+    corrections_in: List[GradeMappingCreate],
+    dry_run: bool = True,
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Correct points of an existing mapping version, e.g. to fix a data-entry error.
+
+    Unlike POST /mappings this changes grades already awarded under the version:
+    their grade points and every affected SGPA/CGPA are recomputed. Runs as a
+    dry run by default, reporting how many students' CGPA would change.
+    """
+    version = db.query(GradeMappingVersion).filter(GradeMappingVersion.id == version_id).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Grade mapping version not found")
+
+    table = grade_tables.get(db, version_id)
+    unknown = [c.grade for c in corrections_in if c.grade not in table.points]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Grades not in version {version_id}: {', '.join(unknown)}")
+
+    corrections = {c.grade: c.points for c in corrections_in}
+    summary = correct_mapping_version(db, version, corrections, dry_run=dry_run)
+    if not dry_run:
         db.commit()
-        db.refresh(mapping)
-        results.append(mapping)
-    return results
+        grade_tables.invalidate()
+    return summary
@@ -2,15 +2,17 @@
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, timedelta
-from jose import jwt
 
 from app.api import deps
 from app.core import security
 from app.core.config import settings
+from app.core.principal import Principal, principal_cache
+from app.core.auth_context import AuthContext
+from app.core.hashing import password_hasher
 from app.models.user import User
-from app.schemas.token import Token, TokenPayload
+from app.schemas.token import Token
 
 router = APIRouter()
 
@@ -23,14 +25,15 @@ def login_access_token(
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = db.query(User).filter(User.id == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = db.query(User).options(joinedload(User.roles)).filter(User.id == form_data.username).first()
+    if not user or not password_hasher.verify_sync(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
     # Determine role
-    user_roles = [r.role for r in user.roles]
+    principal = principal_cache.put(user)
+    user_roles = list(principal.roles)
     if not user_roles:
          raise HTTPException(status_code=400, detail="User has no assigned roles")
          
@@ -54,15 +57,15 @@ def login_access_token(
 @router.post("/switch-role", response_model=Token)
 def switch_role(
     new_role: str,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
     db: Session = Depends(deps.get_db)
 ) -> Any:
     """
     Switch to a different role without re-login.
     """
     # Verify user has the new role
-    # Note: current_user.roles is a list of UserRoleEntry objects
-    user_roles = [r.role.value for r in current_user.roles]
+    # Note: current_user.roles is a tuple of UserRole values
+    user_roles = [r.value for r in current_user.roles]
     
     if new_role not in user_roles:
         raise HTTPException(status_code=400, detail="User does not have this role")
@@ -76,26 +79,24 @@ def switch_role(
     }
 
 from app.models.token import RevokedToken
+from app.core.revocation import revocation_cache
 from fastapi import status
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
 async def logout(
-    token: str = Depends(deps.reusable_oauth2),
-    current_user: User = Depends(deps.get_current_user),
+    auth: AuthContext = Depends(deps.get_token_context),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Logout the current user by revoking the token.
     """
     # Calculate expiration time from token
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-        expires_at = datetime.fromtimestamp(payload.get("exp"))
+        expires_at = datetime.fromtimestamp(auth.payload.get("exp"))
         
-        revoked_token = RevokedToken(token=token, expires_at=expires_at)
+        revoked_token = RevokedToken(token=auth.token, expires_at=expires_at)
         await revoked_token.create()
+        revocation_cache.revoke_token(auth.token)
         
         return {"message": "Successfully logged out"}
     except Exception as e:
@@ -1,24 +1,41 @@
 
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+import codecs
 import csv
 import io
+import time
 
 from app.api import deps
+from app.core.principal import Principal
+from app.core.config import settings
 from app.models.examination import Registration, GradeMapping
 from app.models.course import CourseOffering
-from app.models.user import User, UserRole
+from app.models.user import UserRole
+from app.services.history import record_history_change
+from app.services.grading import apply_grades, grade_tables
+from app.services.ingest import enroll_failing_students, ingest_registrations, register_compartments
+from app.services.marks import load_registrations
 from app.schemas.examination import Registration as RegistrationSchema, RegistrationCreate, RegistrationUpdate
 
 router = APIRouter()
 
+def _csv_upload_reader(file: UploadFile) -> csv.DictReader:
+    """
+    Stream the spooled upload row by row instead of reading it into memory.
+    Lines are decoded as they are iterated; before Python 3.11 the spooled file
+    is not io-compatible, so it cannot be wrapped in a TextIOWrapper.
+    """
+    return csv.DictReader(codecs.iterdecode(file.file, "utf-8"))
+
 @router.post("/", response_model=RegistrationSchema)
 def create_registration(
     *,
     db: Session = Depends(deps.get_db),
     registration_in: RegistrationCreate,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Register for a course.
@@ -42,6 +59,7 @@ def create_registration(
 
     registration = Registration(**registration_in.dict())
     db.add(registration)
+    record_history_change(db, [registration.student_id])
     db.commit()
     db.refresh(registration)
     return registration
@@ -49,7 +67,7 @@ def create_registration(
 @router.get("/me", response_model=List[RegistrationSchema])
 def read_my_registrations(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get current user's registrations.
@@ -61,7 +79,7 @@ def read_my_registrations(
 async def bulk_upload_registrations(
     file: UploadFile = File(...),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Bulk upload registrations from CSV.
@@ -69,9 +87,7 @@ async def bulk_upload_registrations(
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
 
-    content = await file.read()
-    decoded_content = content.decode('utf-8')
-    csv_reader = csv.DictReader(io.StringIO(decoded_content))
+    csv_reader = _csv_upload_reader(file)
     
     # Validate headers
     # We expect 'student_id', 'course_code', and 'semester'
@@ -87,62 +103,33 @@ async def bulk_upload_registrations(
     if 'semester' not in fieldnames:
          raise HTTPException(status_code=400, detail="Missing required column: semester")
     
-    registrations_created = 0
-    errors = []
-    
-    from app.models.academic import Semester
+    # Rows with missing fields are rejected here; the rest are resolved in SQL
+    row_errors = []
     
-    for row_idx, row in enumerate(csv_reader):
-        try:
-            student_id = row.get('student_id', '').strip() if row.get('student_id', '') else None
-            course_code = row.get('course_code', '').strip() if row.get('course_code', '') else None
-            
-            semester_id = None
-            semester_name = row.get('semester', '').strip() if row.get('semester', '') else None
+    def valid_rows():
+        for row_idx, row in enumerate(csv_reader):
+            student_id = (row.get('student_id') or '').strip()
+            course_code = (row.get('course_code') or '').strip()
+            semester_name = (row.get('semester') or '').strip()
             
             if not student_id or not course_code:
-                errors.append(f"Row {row_idx}: Missing required fields")
-                continue
-                
-            # Resolve Semester ID
-            if semester_name:
-                semester = db.query(Semester).filter(Semester.name == semester_name).first()
-                if not semester:
-                    errors.append(f"Row {row_idx}: Semester '{semester_name}' not found")
-                    continue
-                semester_id = semester.id
+                row_errors.append((row_idx, "Missing required fields"))
+            elif not semester_name:
+                row_errors.append((row_idx, "Missing semester info"))
             else:
-                errors.append(f"Row {row_idx}: Missing semester info")
-                continue
-            
-            # Find offering
-            offering = db.query(CourseOffering).filter(
-                CourseOffering.course_code == course_code,
-                CourseOffering.semester_id == semester_id
-            ).first()
-            
-            if not offering:
-                errors.append(f"Row {row_idx}: Course offering not found for {course_code} in semester {semester_id}")
-                continue
-            
-            # Check existing
-            existing = db.query(Registration).filter(
-                Registration.student_id == student_id,
-                Registration.course_offering_id == offering.id
-            ).first()
-            
-            if not existing:
-                reg = Registration(student_id=student_id, course_offering_id=offering.id)
-                db.add(reg)
-                registrations_created += 1
-                
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
-            
-    db.commit()
+                yield row_idx, student_id, course_code, semester_name
+    
+    def ingest():
+        created, sql_errors = ingest_registrations(db, valid_rows())
+        record_history_change(db, created)
+        db.commit()
+        return created, sql_errors
+    
+    created, sql_errors = await run_in_threadpool(ingest)
+    errors = [f"Row {row_idx}: {message}" for row_idx, message in sorted(row_errors + sql_errors)]
     
     return {
-        "registrations_created": registrations_created,
+        "registrations_created": len(created),
         "errors": errors
     }
 
@@ -152,7 +139,7 @@ def assign_grade(
     db: Session = Depends(deps.get_db),
     registration_id: int,
     grade_in: RegistrationUpdate,
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Assign grade to a registration.
@@ -173,13 +160,15 @@ def assign_grade(
     if grade_in.grade:
         registration.grade = grade_in.grade
         # Auto calculate grade point
-        mapping = db.query(GradeMapping).filter(GradeMapping.grade == grade_in.grade).first()
-        if mapping:
-            registration.grade_point = mapping.points
+        table = grade_tables.current_for_write(db)
+        if table and grade_in.grade in table.points:
+            registration.grade_point = table.points[grade_in.grade]
+            registration.grade_mapping_version_id = table.version_id
         else:
              raise HTTPException(status_code=400, detail=f"Grade mapping not found for grade {grade_in.grade}")
 
     db.add(registration)
+    record_history_change(db, [registration.student_id])
     db.commit()
     db.refresh(registration)
     return registration
@@ -189,7 +178,7 @@ def delete_registration(
     *,
     db: Session = Depends(deps.get_db),
     registration_id: int,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Delete a registration and its associated marks.
@@ -208,6 +197,7 @@ def delete_registration(
     db.query(Marks).filter(Marks.registration_id == registration_id).delete()
     
     db.delete(registration)
+    record_history_change(db, [registration.student_id])
     db.commit()
     return {"message": "Registration deleted successfully"}
 
@@ -217,7 +207,7 @@ async def bulk_upload_grades(
     semester_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Bulk upload grades from CSV.
@@ -240,18 +230,26 @@ async def bulk_upload_grades(
     if not offering:
         raise HTTPException(status_code=404, detail="Course offering not found")
 
+    timings = {}
+    started = time.perf_counter()
     content = await file.read()
     decoded_content = content.decode('utf-8')
     csv_reader = csv.DictReader(io.StringIO(decoded_content))
-    
-    grades_updated = 0
-    errors = []
-    
-    # Cache mappings
-    mappings = {m.grade: m.points for m in db.query(GradeMapping).all()}
-    
-    for row_idx, row in enumerate(csv_reader):
-        try:
+    timings["parse_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    
+    def ingest():
+        grades_updated = 0
+        errors = []
+        updated_students = set()
+        # registration id -> (grade, grade_point); a later row for the same student wins
+        grades = {}
+        
+        started = time.perf_counter()
+        table = grade_tables.current_for_write(db)
+        mappings = table.points if table else {}
+        registrations = load_registrations(db, offering.id)
+        
+        for row_idx, row in enumerate(csv_reader):
             student_id = row.get('student_id')
             grade = row.get('grade')
             
@@ -262,28 +260,33 @@ async def bulk_upload_grades(
             if grade not in mappings:
                 errors.append(f"Row {row_idx}: Invalid grade {grade}")
                 continue
-                
-            registration = db.query(Registration).filter(
-                Registration.student_id == student_id,
-                Registration.course_offering_id == offering.id
-            ).first()
             
-            if registration:
-                registration.grade = grade
-                registration.grade_point = mappings[grade]
-                db.add(registration)
-                grades_updated += 1
-            else:
+            registration_id = registrations.get(student_id)
+            if registration_id is None:
                 errors.append(f"Row {row_idx}: Registration not found for student {student_id}")
-
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
+                continue
             
-    db.commit()
+            grades[registration_id] = (grade, mappings[grade])
+            grades_updated += 1
+            updated_students.add(student_id)
+        timings["validate_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        
+        started = time.perf_counter()
+        apply_grades(db, Registration, grades, table.version_id if table else None)
+        timings["update_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        
+        started = time.perf_counter()
+        record_history_change(db, updated_students)
+        db.commit()
+        timings["history_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return grades_updated, errors
+    
+    grades_updated, errors = await run_in_threadpool(ingest)
     
     return {
         "grades_updated": grades_updated,
-        "errors": errors
+        "errors": errors,
+        "timings": timings
     }
 
 from app.schemas.report import StudentGradeReportItem, ExamMarksReport, CourseInfo
@@ -291,7 +294,7 @@ from app.schemas.report import StudentGradeReportItem, ExamMarksReport, CourseIn
 @router.get("/my-report", response_model=List[StudentGradeReportItem])
 def get_my_report(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get comprehensive grade report for the current student.
@@ -360,7 +363,7 @@ def read_compartment_details(
     semester_id: int,
     course_code: str,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve students registered for compartment exam for a specific course offering.
@@ -422,7 +425,7 @@ def register_compartment(
     *,
     db: Session = Depends(deps.get_db),
     registration_in: CompartmentRegistrationCreate,
-    current_user: User = Depends(deps.get_current_active_admin), # Or teacher? Usually admin/student. Let's say admin for now as per "registering students"
+    current_user: Principal = Depends(deps.get_current_active_admin), # Or teacher? Usually admin/student. Let's say admin for now as per "registering students"
 ) -> Any:
     """
     Register a student for compartment examination.
@@ -450,6 +453,7 @@ def register_compartment(
         course_offering_id=registration_in.course_offering_id
     )
     db.add(compartment_reg)
+    record_history_change(db, [compartment_reg.student_id])
     db.commit()
     db.refresh(compartment_reg)
     return compartment_reg
@@ -459,14 +463,13 @@ def bulk_register_compartment(
     *,
     db: Session = Depends(deps.get_db),
     file: UploadFile = File(...),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Bulk register students for compartment examination via CSV.
     CSV Format: student_id, course_offering_id
     """
-    contents = file.file.read().decode("utf-8")
-    csv_reader = csv.DictReader(io.StringIO(contents))
+    csv_reader = _csv_upload_reader(file)
     
     # Validate headers
     fieldnames = csv_reader.fieldnames
@@ -481,84 +484,70 @@ def bulk_register_compartment(
     if 'semester' not in fieldnames:
          raise HTTPException(status_code=400, detail="Missing required column: semester")
 
-    registered_count = 0
-    errors = []
-    
-    from app.models.academic import Semester
-    from app.models.course import CourseOffering
-    
+    # Rows with missing fields are rejected here; the rest are resolved in bulk
+    row_errors = []
+    rows = []
     for row_idx, row in enumerate(csv_reader):
-        try:
-            student_id = row.get("student_id", "").strip() if row.get("student_id", "") else None
-            course_code = row.get("course_code", "").strip() if row.get("course_code", "") else None
-            semester_name = row.get("semester", "").strip() if row.get("semester", "") else None
-            
-            if not student_id or not course_code or not semester_name:
-                errors.append(f"Row {row_idx}: Missing required fields")
-                continue
-            
-            # Lookup semester
-            semester = db.query(Semester).filter(Semester.name == semester_name).first()
-            if not semester:
-                errors.append(f"Row {row_idx}: Semester '{semester_name}' not found")
-                continue
-            
-            # Lookup offering
-            offering = db.query(CourseOffering).filter(
-                CourseOffering.course_code == course_code,
-                CourseOffering.semester_id == semester.id
-            ).first()
-            
-            if not offering:
-                errors.append(f"Row {row_idx}: Course offering not found for {course_code} in semester {semester_name}")
-                continue
-            
-            course_offering_id = offering.id
-            
-            # Verify registration
-            reg = db.query(Registration).filter(
-                Registration.student_id == student_id,
-                Registration.course_offering_id == course_offering_id
-            ).first()
-            
-            if not reg:
-                errors.append(f"Row {row_idx}: Student {student_id} not registered for course {course_code}")
-                continue
-                
-            # Check existing
-            existing = db.query(CompartmentRegistration).filter(
-                CompartmentRegistration.student_id == student_id,
-                CompartmentRegistration.course_offering_id == course_offering_id
-            ).first()
-            
-            if existing:
-                errors.append(f"Row {row_idx}: Student {student_id} already registered for compartment in {course_code}")
-                continue
-                
-            compartment_reg = CompartmentRegistration(
-                student_id=student_id,
-                course_offering_id=course_offering_id
-            )
-            db.add(compartment_reg)
-            registered_count += 1
-            
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
-            
+        student_id = (row.get("student_id") or "").strip()
+        course_code = (row.get("course_code") or "").strip()
+        semester_name = (row.get("semester") or "").strip()
+        
+        if not student_id or not course_code or not semester_name:
+            row_errors.append((row_idx, "Missing required fields"))
+        else:
+            rows.append((row_idx, student_id, course_code, semester_name))
+    
+    created, bulk_errors = register_compartments(db, rows)
+    record_history_change(db, created)
     db.commit()
+    errors = [f"Row {row_idx}: {message}" for row_idx, message in sorted(row_errors + bulk_errors)]
     
     return {
-        "registered_count": registered_count,
+        "registered_count": len(created),
         "errors": errors
     }
 
+@router.post("/compartment/auto-enroll", response_model=Any)
+def auto_enroll_compartment(
+    *,
+    db: Session = Depends(deps.get_db),
+    semester_id: int,
+    course_codes: Optional[List[str]] = Query(None),
+    threshold: Optional[float] = None,
+    dry_run: bool = False,
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Register every student whose grade point in the semester is below the
+    threshold (COMPARTMENT_FAIL_THRESHOLD by default) for compartment
+    examination. With dry_run, only report how many would be registered.
+    """
+    from app.models.academic import Semester
+    
+    if not db.query(Semester).filter(Semester.id == semester_id).first():
+        raise HTTPException(status_code=404, detail="Semester not found")
+    
+    if threshold is None:
+        threshold = settings.COMPARTMENT_FAIL_THRESHOLD
+    
+    enrolled = enroll_failing_students(db, semester_id, threshold, course_codes, dry_run=dry_run)
+    if not dry_run:
+        record_history_change(db, set(enrolled))
+        db.commit()
+    
+    return {
+        "registered_count": len(enrolled),
+        "threshold": threshold,
+        "dry_run": dry_run
+    }
+
 @router.put("/compartment/{compartment_id}/grade", response_model=CompartmentRegistrationSchema)
 def update_compartment_grade(
     *,
     db: Session = Depends(deps.get_db),
     compartment_id: int,
     grade_in: CompartmentGradeUpdate,
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Update grade for a compartment registration.
@@ -576,13 +565,15 @@ def update_compartment_grade(
     compartment_reg.grade = grade_in.grade
     
     # Auto calculate grade point
-    mapping = db.query(GradeMapping).filter(GradeMapping.grade == grade_in.grade).first()
-    if mapping:
-        compartment_reg.grade_point = mapping.points
+    table = grade_tables.current_for_write(db)
+    if table and grade_in.grade in table.points:
+        compartment_reg.grade_point = table.points[grade_in.grade]
+        compartment_reg.grade_mapping_version_id = table.version_id
     else:
          raise HTTPException(status_code=400, detail=f"Grade mapping not found for grade {grade_in.grade}")
          
     db.add(compartment_reg)
+    record_history_change(db, [compartment_reg.student_id])
     db.commit()
     db.refresh(compartment_reg)
     return compartment_reg
@@ -593,7 +584,7 @@ def bulk_upload_compartment_grades(
     semester_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Bulk upload grades for compartment examination via CSV.
@@ -617,8 +608,7 @@ def bulk_upload_compartment_grades(
     if not offering:
         raise HTTPException(status_code=404, detail="Course offering not found")
 
-    contents = file.file.read().decode("utf-8")
-    csv_reader = csv.DictReader(io.StringIO(contents))
+    csv_reader = _csv_upload_reader(file)
     
     # Validate headers
     fieldnames = csv_reader.fieldnames
@@ -632,41 +622,43 @@ def bulk_upload_compartment_grades(
     
     updated_count = 0
     errors = []
-    
-    # Cache mappings
-    mappings = {m.grade: m.points for m in db.query(GradeMapping).all()}
+    updated_students = set()
+    # compartment id -> (grade, grade_point); a later row for the same student wins
+    grades = {}
+    
+    table = grade_tables.current_for_write(db)
+    mappings = table.points if table else {}
+    # Ascending, so each student keeps the row latest_compartment_clause() reads
+    compartments = dict(
+        db.query(CompartmentRegistration.student_id, CompartmentRegistration.id)
+        .filter(CompartmentRegistration.course_offering_id == offering.id)
+        .order_by(CompartmentRegistration.id)
+        .all()
+    )
     
     for row_idx, row in enumerate(csv_reader):
-        try:
-            student_id = row.get("student_id", "").strip()
-            grade = row.get("grade", "").strip()
-            
-            if not student_id or not grade:
-                errors.append(f"Row {row_idx}: Missing student_id or grade")
-                continue
-            
-            # Find compartment registration using offering Context
-            compartment_reg = db.query(CompartmentRegistration).filter(
-                CompartmentRegistration.student_id == student_id,
-                CompartmentRegistration.course_offering_id == offering.id
-            ).first()
-            
-            if not compartment_reg:
-                errors.append(f"Row {row_idx}: Compartment registration not found for student {student_id}")
-                continue
-            
-            if grade not in mappings:
-                errors.append(f"Row {row_idx}: Invalid grade {grade} for student {student_id}")
-                continue
-                
-            compartment_reg.grade = grade
-            compartment_reg.grade_point = mappings[grade]
-            db.add(compartment_reg)
-            updated_count += 1
-            
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
-            
+        student_id = (row.get("student_id") or "").strip()
+        grade = (row.get("grade") or "").strip()
+        
+        if not student_id or not grade:
+            errors.append(f"Row {row_idx}: Missing student_id or grade")
+            continue
+        
+        compartment_id = compartments.get(student_id)
+        if compartment_id is None:
+            errors.append(f"Row {row_idx}: Compartment registration not found for student {student_id}")
+            continue
+        
+        if grade not in mappings:
+            errors.append(f"Row {row_idx}: Invalid grade {grade} for student {student_id}")
+            continue
+        
+        grades[compartment_id] = (grade, mappings[grade])
+        updated_count += 1
+        updated_students.add(student_id)
+    
+    apply_grades(db, CompartmentRegistration, grades, table.version_id if table else None)
+    record_history_change(db, updated_students)
     db.commit()
     
     return {
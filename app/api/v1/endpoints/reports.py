@@ -1,25 +1,30 @@
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional
 from datetime import datetime, date
 import logging
 from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, tuple_
 
 from app.api import deps
+from app.core.principal import Principal
 from app.models.user import User, UserRole
 from app.models.discipline import Discipline
 from app.schemas.user import User as UserSchema
 from app.utils.pdf_generator import pdf_generator
 from app.api.v1.endpoints.users import get_user_academic_history
+from app.services.gpa import get_cgpa_map, rankings_query
 
-from app.schemas.report import GradeCardRequest, TranscriptRequest
+from app.schemas.report import GradeCardRequest, TranscriptRequest, RankingPage
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # In-memory task store (Use Celery/Redis in production)
-# Format: {task_id: {"status": "processing"|"completed"|"failed", "progress": 0-100, "result": None|bytes, "error": None}}
+# Format: {task_id: {"status": "processing"|"completed"|"failed", "progress": 0-100, "result": None|bytes, "error": None,
+#                    "skipped": [unknown student ids], "failed": {student_id: error}}}
 tasks = {}
 
 def process_grade_cards(task_id: str, student_ids: List[str], semester_id: int, db: Session):
@@ -38,13 +43,19 @@ def process_grade_cards(task_id: str, student_ids: List[str], semester_id: int,
 
         semester_data = {"name": semester.name, "id": semester.id}
 
-        for i, student_id in enumerate(student_ids):
+        from app.services.academic import iter_student_academic_histories
+        # Histories for the whole batch are loaded a chunk of students at a time
+        for i, (student_id, academic_history, error) in enumerate(iter_student_academic_histories(db, student_ids)):
+            # Progress counts every requested id, including the ones without a grade card
+            tasks[task_id]["progress"] = int(((i + 1) / total) * 100)
+            if error is not None:
+                logger.warning("Error loading academic history for %s: %s", student_id, error)
+                tasks[task_id]["failed"][student_id] = str(error)
+                continue
+            if academic_history is None:
+                tasks[task_id]["skipped"].append(student_id)
+                continue
             try:
-                from app.services.academic import get_student_academic_history
-                # Fetch Academic History using Service
-                academic_history = get_student_academic_history(db, student_id)
-                if not academic_history: continue
-                
                 # Filter/Find Target Semester Courses from History
                 # We need to reconstruct the data structure for PDF generator
                 # The service returns AcademicHistory object
@@ -79,11 +90,8 @@ def process_grade_cards(task_id: str, student_ids: List[str], semester_id: int,
                 files[f"{student_id}_GradeCard.pdf"] = pdf_bytes
                 
             except Exception as e:
-                print(f"Error generating for {student_id}: {e}")
-                # Log usage
-            
-            # Update Progress
-            tasks[task_id]["progress"] = int(((i + 1) / total) * 100)
+                logger.warning("Error generating grade card for %s: %s", student_id, e)
+                tasks[task_id]["failed"][student_id] = str(e)
 
         # Create Zip
         zip_bytes = pdf_generator.create_zip(files)
@@ -101,13 +109,17 @@ def process_transcripts(task_id: str, student_ids: List[str], db: Session):
         total = len(student_ids)
         files = {}
         
-        for i, student_id in enumerate(student_ids):
+        from app.services.academic import iter_student_academic_histories
+        for i, (student_id, academic_history, error) in enumerate(iter_student_academic_histories(db, student_ids)):
+            tasks[task_id]["progress"] = int(((i + 1) / total) * 100)
+            if error is not None:
+                logger.warning("Error loading academic history for %s: %s", student_id, error)
+                tasks[task_id]["failed"][student_id] = str(error)
+                continue
+            if academic_history is None:
+                tasks[task_id]["skipped"].append(student_id)
+                continue
             try:
-                from app.services.academic import get_student_academic_history
-                # Fetch Academic History using Service
-                academic_history = get_student_academic_history(db, student_id)
-                if not academic_history: continue
-                
                 student_info = {
                     "id": academic_history.student_id,
                     "name": academic_history.student_name,
@@ -136,9 +148,8 @@ def process_transcripts(task_id: str, student_ids: List[str], db: Session):
                 files[f"{student_id}_Transcript.pdf"] = pdf_bytes
                 
             except Exception as e:
-                print(f"Error generating transcript for {student_id}: {e}")
-
-            tasks[task_id]["progress"] = int(((i + 1) / total) * 100)
+                logger.warning("Error generating transcript for %s: %s", student_id, e)
+                tasks[task_id]["failed"][student_id] = str(e)
 
         zip_bytes = pdf_generator.create_zip(files)
         tasks[task_id]["result"] = zip_bytes
@@ -157,7 +168,7 @@ def get_students_report(
     search: Optional[str] = None,
     sort_by: Optional[str] = "id",
     sort_desc: bool = False,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Get students report data with filtering and sorting.
@@ -185,10 +196,80 @@ def get_students_report(
         
     total = query.count()
     users = query.offset(skip).limit(limit).all()
+    # CGPA comes from the materialized GPA table rather than each student's history
+    cgpa_map = get_cgpa_map(db, [u.id for u in users])
+    
+    items = []
+    for u in users:
+        cgpa = cgpa_map.get(u.id)
+        items.append({
+            **UserSchema.from_orm(u).dict(),
+            "cgpa": round(cgpa, 2) if cgpa is not None else None
+        })
     
     return {
         "total": total,
-        "items": [UserSchema.from_orm(u) for u in users]
+        "items": items
+    }
+
+@router.get("/rankings", response_model=RankingPage)
+def get_rankings(
+    db: Session = Depends(deps.get_db),
+    metric: Literal["cgpa", "sgpa"] = "cgpa",
+    semester_id: Optional[int] = None,
+    discipline_code: Optional[str] = None,
+    admission_year: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    Merit list ranked by CGPA or SGPA within a discipline, semester or admission year.
+    Ties share a rank. Pages are keyset-paginated on (rank, student_id).
+    """
+    from app.models.academic import Semester
+    semester = None
+    if semester_id is not None:
+        semester = db.query(Semester).filter(Semester.id == semester_id).first()
+        if not semester:
+            raise HTTPException(status_code=404, detail="Semester not found")
+    elif metric == "sgpa":
+        raise HTTPException(status_code=400, detail="semester_id is required for SGPA rankings")
+
+    ranked = rankings_query(metric, semester, discipline_code, admission_year)
+    total = db.scalar(select(func.count()).select_from(ranked))
+
+    query = select(ranked).order_by(ranked.c.rank, ranked.c.student_id).limit(limit)
+    if cursor:
+        # Cursor is "<rank>:<student_id>" of the last row of the previous page
+        try:
+            after_rank, after_student_id = cursor.split(":", 1)
+            after_rank = int(after_rank)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(ranked.c.rank, ranked.c.student_id) > tuple_(after_rank, after_student_id))
+
+    rows = db.execute(query).all()
+    items = [
+        {
+            "rank": row.rank,
+            "percentile": round((1 - row.percent_rank) * 100, 2),
+            "student_id": row.student_id,
+            "student_name": row.student_name,
+            "discipline_code": row.discipline_code,
+            "gpa": round(row.gpa, 2),
+            "credits": row.credits,
+        }
+        for row in rows
+    ]
+    next_cursor = f"{rows[-1].rank}:{rows[-1].student_id}" if len(rows) == limit else None
+
+    return {
+        "metric": metric,
+        "semester_id": semester_id,
+        "total": total,
+        "items": items,
+        "next_cursor": next_cursor
     }
 
 @router.post("/generate-grade-cards")
@@ -196,10 +277,10 @@ def generate_grade_cards(
     request: GradeCardRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     task_id = str(uuid4())
-    tasks[task_id] = {"status": "pending", "progress": 0, "result": None}
+    tasks[task_id] = {"status": "pending", "progress": 0, "result": None, "skipped": [], "failed": {}}
     background_tasks.add_task(process_grade_cards, task_id, request.student_ids, request.semester_id, db)
     return {"task_id": task_id}
 
@@ -208,17 +289,17 @@ def generate_transcripts(
     request: TranscriptRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     task_id = str(uuid4())
-    tasks[task_id] = {"status": "pending", "progress": 0, "result": None}
+    tasks[task_id] = {"status": "pending", "progress": 0, "result": None, "skipped": [], "failed": {}}
     background_tasks.add_task(process_transcripts, task_id, request.student_ids, db)
     return {"task_id": task_id}
 
 @router.get("/tasks/{task_id}")
 def get_task_status(
     task_id: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     task = tasks.get(task_id)
     if not task:
@@ -228,7 +309,9 @@ def get_task_status(
     response = {
         "status": task["status"],
         "progress": task["progress"],
-        "error": task.get("error")
+        "error": task.get("error"),
+        "skipped": task.get("skipped", []),
+        "failed": task.get("failed", {})
     }
     return response
 
@@ -237,7 +320,7 @@ from fastapi.responses import Response
 @router.get("/tasks/{task_id}/download")
 def download_task_result(
     task_id: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     task = tasks.get(task_id)
     if not task or task["status"] != "completed":
@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.api import deps
-from app.models.user import User, UserRole
+from app.core.principal import Principal
+from app.models.user import UserRole
 from app.models.setting import SystemSetting
 from app.models.academic import Semester
 
@@ -17,7 +18,7 @@ class SettingUpdate(BaseModel):
 @router.get("/", response_model=Dict[str, str])
 def get_settings(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Get all system settings.
@@ -29,7 +30,7 @@ def get_settings(
 def update_settings(
     settings_in: List[SettingUpdate],
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update system settings.
@@ -68,7 +69,7 @@ def get_public_settings(
     # Usually settings like current semester might be needed by everyone.
     # But for now let's reuse authenticated user logic or open it if needed.
     # The prompt implies "admin can set", implies internal use.
-    current_user: User = Depends(deps.get_current_user), 
+    current_user: Principal = Depends(deps.get_current_user), 
 ) -> Any:
     """
     Get settings relevant for general users/teachers.
@@ -1,11 +1,14 @@
 
 from typing import Any, List
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app.api import deps
 from app.core import security
+from app.core.principal import Principal, principal_cache
+from app.core.hashing import password_hasher
+from app.services.history import academic_history_cache, bump_history_version
 from app.models.user import User, UserRole
 from app.schemas.user import User as UserSchema, UserCreate, UserUpdate
 from app.schemas.academic import AcademicHistory, AcademicHistorySemester, AcademicHistoryCourse
@@ -19,19 +22,22 @@ router = APIRouter()
 @router.get("/me", response_model=UserSchema)
 def read_user_me(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get current user.
     """
-    return current_user
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @router.get("/", response_model=List[UserSchema])
 def read_users(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Retrieve users.
@@ -44,7 +50,7 @@ def create_user(
     *,
     db: Session = Depends(deps.get_db),
     user_in: UserCreate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Create new user.
@@ -59,7 +65,7 @@ def create_user(
         id=user_in.id,
         name=user_in.name,
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=password_hasher.hash_sync(user_in.password),
         gender=user_in.gender,
         address=user_in.address,
         phone_number=user_in.phone_number,
@@ -82,7 +88,7 @@ def create_user(
 @router.get("/{user_id}", response_model=UserSchema)
 def read_user_by_id(
     user_id: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
     db: Session = Depends(deps.get_db),
 ) -> Any:
     """
@@ -96,17 +102,24 @@ def read_user_by_id(
 @router.get("/{user_id}/academic-history", response_model=AcademicHistory)
 def get_user_academic_history(
     user_id: str,
+    request: Request,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_teacher),
+    current_user: Principal = Depends(deps.get_current_active_teacher),
 ) -> Any:
     """
     Get academic history of a student/alumni.
+    Supports conditional requests: send the returned ETag as If-None-Match to get a 304.
     """
-    """
-    Get academic history of a student/alumni.
-    """
-    from app.services.academic import get_student_academic_history
-    return get_student_academic_history(db, user_id)
+    etag, body = academic_history_cache.get(db, user_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.put("/{user_id}/role", response_model=UserSchema)
 def update_user_role(
@@ -114,7 +127,7 @@ def update_user_role(
     db: Session = Depends(deps.get_db),
     user_id: str,
     role: UserRole = Body(..., embed=True),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Add a role to user (if not already present).
@@ -135,6 +148,7 @@ def update_user_role(
         role_entry = UserRoleEntry(user_id=user_id, role=role)
         db.add(role_entry)
         db.commit()
+        principal_cache.invalidate(user_id)
     
     db.refresh(user)
     return user
@@ -142,6 +156,7 @@ def update_user_role(
 from app.schemas.user import UserPasswordUpdate
 
 from app.models.token import UserGlobalRevocation
+from app.core.revocation import revocation_cache
 from datetime import datetime
 
 @router.put("/me/password", response_model=Any)
@@ -149,7 +164,7 @@ async def change_password(
     *,
     db: Session = Depends(deps.get_db),
     password_in: UserPasswordUpdate,
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ) -> Any:
     """
     Change current user password.
@@ -158,26 +173,31 @@ async def change_password(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    if not security.verify_password(password_in.current_password, user.hashed_password):
+    if not await password_hasher.verify(password_in.current_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect password")
         
-    user.hashed_password = security.get_password_hash(password_in.new_password)
+    user.hashed_password = await password_hasher.hash(password_in.new_password)
     db.add(user)
     db.commit()
     
     # Revoke all tokens
+    revoked_at = datetime.utcnow()
     revocation = await UserGlobalRevocation.find_one(UserGlobalRevocation.user_id == user.id)
     if revocation:
-        revocation.revoked_at = datetime.utcnow()
+        revocation.revoked_at = revoked_at
         await revocation.save()
     else:
-        await UserGlobalRevocation(user_id=user.id, revoked_at=datetime.utcnow()).insert()
+        await UserGlobalRevocation(user_id=user.id, revoked_at=revoked_at).insert()
+    revocation_cache.revoke_user(user.id, revoked_at)
     
     return {"message": "Password updated successfully"}
 
 from fastapi import UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 import csv
 import io
+import time
 from app.models.discipline import Discipline
 
 @router.post("/bulk-upload")
@@ -185,16 +205,21 @@ async def bulk_upload_users(
     *,
     db: Session = Depends(deps.get_db),
     file: UploadFile = File(...),
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Bulk upload users from CSV.
     CSV Format: id, name, email, password, gender, address, phone_number, discipline_code, roles
     Roles should be semicolon separated.
+    Runs in phases (parse, validate, hash, insert); bcrypt hashing is spread across
+    all cores and per-phase timings are returned.
     """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
 
+    timings = {}
+    started = time.perf_counter()
+
     content = await file.read()
     decoded_content = content.decode('utf-8')
     csv_reader = csv.DictReader(io.StringIO(decoded_content))
@@ -205,76 +230,113 @@ async def bulk_upload_users(
          missing = required_fields - set(csv_reader.fieldnames or [])
          raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
 
-    users_created = 0
+    rows = list(csv_reader)
+    timings["parse_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # (row_idx, message), sorted at the end so errors stay in row order across phases
     errors = []
     
     from app.models.user import UserRoleEntry
     
-    for row_idx, row in enumerate(csv_reader):
-        try:
-            user_id = row.get('id', '').strip() if row.get('id', '') else None
+    # Validate against existing ids and disciplines loaded with one query each
+    def validate():
+        file_ids = {(row.get('id') or '').strip() for row in rows} - {''}
+        existing_ids = {
+            user_id for (user_id,) in db.query(User.id).filter(User.id.in_(file_ids))
+        } if file_ids else set()
+        discipline_codes = {(row.get('discipline_code') or '').strip() for row in rows} - {''}
+        valid_disciplines = {
+            code for (code,) in db.query(Discipline.code).filter(Discipline.code.in_(discipline_codes))
+        } if discipline_codes else set()
+        
+        pending = []
+        seen_ids = set()
+        for row_idx, row in enumerate(rows):
+            user_id = (row.get('id') or '').strip()
             if not user_id:
-                errors.append(f"Row {row_idx}: Missing user id")
+                errors.append((row_idx, f"Row {row_idx}: Missing user id"))
                 continue
-                
-            # Check if user exists
-            existing_user = db.query(User).filter(User.id == user_id).first()
-            if existing_user:
-                errors.append(f"Row {row_idx}: User {user_id} already exists")
+            
+            if user_id in existing_ids:
+                errors.append((row_idx, f"Row {row_idx}: User {user_id} already exists"))
                 continue
-                
+            
+            if user_id in seen_ids:
+                errors.append((row_idx, f"Row {row_idx}: Duplicate user id {user_id} in file"))
+                continue
+            
             # Validate discipline if provided
-            discipline_code = row.get('discipline_code', '').strip() if row.get('discipline_code', '') else None
-            if discipline_code:
-                discipline = db.query(Discipline).filter(Discipline.code == discipline_code).first()
-                if not discipline:
-                    errors.append(f"Row {row_idx}: Discipline {discipline_code} not found")
-                    continue
-            else:
-                discipline_code = None
+            discipline_code = (row.get('discipline_code') or '').strip() or None
+            if discipline_code and discipline_code not in valid_disciplines:
+                errors.append((row_idx, f"Row {row_idx}: Discipline {discipline_code} not found"))
+                continue
             
-            roles_str = row.get('roles', '').strip() if row.get('roles', '') else None
+            roles_str = (row.get('roles') or '').strip()
             if not roles_str:
-                errors.append(f"Row {row_idx}: Missing roles")
+                errors.append((row_idx, f"Row {row_idx}: Missing roles"))
                 continue
             
-            # Create user
-            user = User(
-                id=user_id,
-                name=row.get('name', '').strip(),
-                email=row.get('email', '').strip(),
-                hashed_password=security.get_password_hash(row.get('password', 'password123').strip()),
-                gender=row.get('gender', '').strip(),
-                address=row.get('address', '').strip(),
-                phone_number=row.get('phone_number', '').strip(),
-                is_active=True,
-                discipline_code=discipline_code,
-            )
-            db.add(user)
-            db.flush()
-            print("User created")
-            # Add roles
-            if roles_str:
-                print("Trying inside roles")
-                roles = [r.strip() for r in roles_str.split(';') if r.strip()]
-                for role_name in roles:
-                    try:
-                        role_enum = UserRole(role_name)
-                        role_entry = UserRoleEntry(user_id=user.id, role=role_enum)
-                        db.add(role_entry)
-                    except ValueError:
-                        errors.append(f"Row {row_idx}: Invalid role {role_name}")
-            
-            users_created += 1
+            # Invalid roles are reported but the user is still created with the valid ones
+            roles = []
+            for role_name in (r.strip() for r in roles_str.split(';')):
+                if not role_name:
+                    continue
+                try:
+                    roles.append(UserRole(role_name))
+                except ValueError:
+                    errors.append((row_idx, f"Row {row_idx}: Invalid role {role_name}"))
             
-        except Exception as e:
-            errors.append(f"Row {row_idx}: {str(e)}")
+            password = (row.get('password') or 'password123').strip()
             
-    db.commit()
+            seen_ids.add(user_id)
+            pending.append((row, user_id, discipline_code, roles, password))
+        return pending
+    
+    started = time.perf_counter()
+    pending = await run_in_threadpool(validate)
+    timings["validate_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # Hash
+    started = time.perf_counter()
+    hashed_passwords = await password_hasher.hash_many(
+        [password for _, _, _, _, password in pending]
+    )
+    timings["hash_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    # Insert users and their roles with one bulk insert each
+    def insert_users():
+        user_rows = []
+        role_rows = []
+        for (row, user_id, discipline_code, roles, _), hashed_password in zip(pending, hashed_passwords):
+            user_rows.append({
+                "id": user_id,
+                "name": (row.get('name') or '').strip(),
+                "email": (row.get('email') or '').strip(),
+                "hashed_password": hashed_password,
+                "gender": (row.get('gender') or '').strip(),
+                "address": (row.get('address') or '').strip(),
+                "phone_number": (row.get('phone_number') or '').strip(),
+                "is_active": True,
+                "discipline_code": discipline_code,
+            })
+            role_rows.extend({"user_id": user_id, "role": role} for role in roles)
+        if user_rows:
+            db.execute(insert(User), user_rows)
+        if role_rows:
+            db.execute(insert(UserRoleEntry), role_rows)
+        db.commit()
+    
+    started = time.perf_counter()
+    await run_in_threadpool(insert_users)
+    timings["insert_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    created_ids = [user_id for _, user_id, _, _, _ in pending]
+    for user_id in created_ids:
+        principal_cache.invalidate(user_id)
     
     return {
-        "users_created": users_created,
-        "errors": errors
+        "users_created": len(created_ids),
+        "errors": [message for _, message in sorted(errors, key=lambda e: e[0])],
+        "timings": timings
     }
 
 
@@ -284,7 +346,7 @@ def update_user(
     db: Session = Depends(deps.get_db),
     user_id: str,
     user_in: UserUpdate,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Update a user.
@@ -295,7 +357,7 @@ def update_user(
     
     update_data = user_in.dict(exclude_unset=True)
     if update_data.get("password"):
-        hashed_password = security.get_password_hash(update_data["password"])
+        hashed_password = password_hasher.hash_sync(update_data["password"])
         del update_data["password"]
         update_data["hashed_password"] = hashed_password
         
@@ -313,7 +375,10 @@ def update_user(
         user.roles = [UserRoleEntry(role=r) for r in roles_enums]
         
     db.add(user)
+    # Name and discipline appear in the academic history
+    bump_history_version(db, [user_id])
     db.commit()
+    principal_cache.invalidate(user_id)
     db.refresh(user)
     return user
 
@@ -322,7 +387,7 @@ def delete_user(
     *,
     db: Session = Depends(deps.get_db),
     user_id: str,
-    current_user: User = Depends(deps.get_current_active_admin),
+    current_user: Principal = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     Deactivate a user.
@@ -334,4 +399,5 @@ def delete_user(
     user.is_active = False
     db.add(user)
     db.commit()
+    principal_cache.invalidate(user_id)
     return {"message": "User deactivated successfully"}
@@ -0,0 +1,65 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from jose import jwt, JWTError
+from pydantic import ValidationError
+
+from app.core import security
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.token import TokenPayload
+
+@dataclass(frozen=True)
+class AuthContext:
+    """
+    A verified bearer token together with its decoded claims.
+    """
+    token: str
+    payload: Dict[str, Any]
+    token_data: TokenPayload
+
+# Recently verified tokens, so repeat requests skip HMAC verification
+# and TokenPayload construction.
+_verified_tokens = TTLCache(
+    maxsize=settings.AUTH_CONTEXT_CACHE_SIZE,
+    ttl=settings.AUTH_CONTEXT_CACHE_TTL_SECONDS,
+)
+
+def verify_token(token: str) -> AuthContext:
+    """
+    Verify and parse a JWT. Raises JWTError or ValidationError if it is invalid.
+    """
+    auth = _verified_tokens.get(token)
+    if auth is None:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        auth = AuthContext(token=token, payload=payload, token_data=TokenPayload(**payload))
+        # Never keep a token cached past its own expiry
+        ttl = settings.AUTH_CONTEXT_CACHE_TTL_SECONDS
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            _verified_tokens.set(token, auth, ttl=ttl)
+    return auth
+
+def get_auth_context(request: Request) -> Optional[AuthContext]:
+    """
+    Resolve the bearer token of a request once and store it on request.state.
+    Returns None for anonymous requests or invalid tokens.
+    """
+    if not hasattr(request.state, "auth_context"):
+        auth = None
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            try:
+                auth = verify_token(auth_header.split(" ")[1])
+            except (JWTError, ValidationError):
+                pass # Invalid token, treat as anonymous
+        request.state.auth_context = auth
+    return request.state.auth_context
+
+def stats() -> Dict[str, Any]:
+    return _verified_tokens.stats()
@@ -1,6 +1,6 @@
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "eBodha"
@@ -12,15 +12,71 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "password"
     POSTGRES_DB: str = "ebodha"
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    # Same statement executed this many times in one request is logged as a suspected N+1
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10
+    # Dev/test only: make lazy relationship loads raise instead of querying
+    SQLALCHEMY_RAISE_ON_LAZY_LOAD: bool = False
+
+    # Slow-query log (slow_queries collection)
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1 # Fraction of slow SELECTs re-run under EXPLAIN ANALYZE
+    SLOW_QUERY_QUEUE_SIZE: int = 1000
 
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "ebodha_logs"
 
+    # API log writer
+    API_LOG_QUEUE_SIZE: int = 10000
+    API_LOG_BATCH_SIZE: int = 200
+    API_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    API_LOG_OVERFLOW_POLICY: Literal["drop_oldest", "block", "spill"] = "drop_oldest"
+    API_LOG_SPOOL_DIR: str = "api_log_spool"
+    API_LOG_SPOOL_SEGMENT_BYTES: int = 8 * 1024 * 1024
+    API_LOG_SPOOL_MAX_BYTES: int = 512 * 1024 * 1024
+    API_LOG_MONGO_TIMEOUT_SECONDS: float = 2.0
+    API_LOG_SLOW_FLUSH_SECONDS: float = 0.5 # Slower flushes divert logs to the spool
+    API_LOG_MONGO_RETRY_SECONDS: float = 30.0
+    API_LOG_REPLAY_INTERVAL_SECONDS: float = 10.0
+    API_LOG_REPLAY_BATCH_SIZE: int = 1000
+
     # Security
     SECRET_KEY: str = "YOUR_SUPER_SECRET_KEY_CHANGE_IN_PRODUCTION"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8 # 8 days
 
+    # Revocation cache
+    REVOCATION_POLL_SECONDS: float = 5.0
+    REVOCATION_REBUILD_SECONDS: float = 3600.0
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.01
+    REVOCATION_USER_CACHE_SIZE: int = 10000
+    REVOCATION_USER_CACHE_TTL_SECONDS: float = 300.0
+
+    # Principal cache
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    # Verified token cache
+    AUTH_CONTEXT_CACHE_SIZE: int = 10000
+    AUTH_CONTEXT_CACHE_TTL_SECONDS: float = 300.0
+
+    # Academic history response cache
+    HISTORY_VERSION_CACHE_SIZE: int = 10000
+    HISTORY_VERSION_CACHE_TTL_SECONDS: float = 5.0 # Staleness bound for writes made by other workers
+    HISTORY_BODY_CACHE_SIZE: int = 2000
+    HISTORY_BODY_CACHE_TTL_SECONDS: float = 3600.0
+
+    # Grade mapping versions
+    GRADE_VERSION_REFRESH_SECONDS: float = 30.0 # How soon other workers see a new mapping version
+    COMPARTMENT_FAIL_THRESHOLD: float = 4.0 # Grade points below this make a registration eligible for compartment
+
+    # Password hashing executor
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    BULK_HASH_PROCESSES: Optional[int] = None # Defaults to the CPU count
+    BULK_HASH_BATCH_SIZE: int = 50
+
     class Config:
         case_sensitive = True
 
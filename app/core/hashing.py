@@ -0,0 +1,126 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.config import settings
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, bounded thread pool.
+
+    bcrypt releases the GIL, so hashing here neither blocks the event loop nor
+    competes with the request threadpool. When more than max_workers + max_queue
+    operations are outstanding, new ones are rejected with a 503 instead of
+    queueing behind a login surge.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._hash_total = 0.0
+        self._hash_max = 0.0
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def _submit(self, fn: Callable, *args: Any) -> Future:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy, please try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        queued_at = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._record(started - queued_at, time.perf_counter() - started)
+
+        return self._executor.submit(run)
+
+    def _record(self, wait: float, duration: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._hash_total += duration
+            self._hash_max = max(self._hash_max, duration)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit(security.verify_password, plain_password, hashed_password))
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(security.get_password_hash, password))
+
+    # Sync endpoints already run in the request threadpool; they wait on the future directly.
+    def verify_sync(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit(security.verify_password, plain_password, hashed_password).result()
+
+    def hash_sync(self, password: str) -> str:
+        return self._submit(security.get_password_hash, password).result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a large batch of passwords across all cores, e.g. for bulk user upload.
+        Results are returned in input order.
+        """
+        if not passwords:
+            return []
+        if self._process_pool is None:
+            # spawn rather than fork: the server process already runs threads
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=settings.BULK_HASH_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        size = settings.BULK_HASH_BATCH_SIZE
+        batches = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._process_pool, security.hash_password_batch, batch)
+            for batch in batches
+        ))
+        return [hashed for batch in results for hashed in batch]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": completed,
+                "rejected": self._rejected,
+                "wait_avg_ms": round(self._wait_total / completed * 1000, 2) if completed else None,
+                "wait_max_ms": round(self._wait_max * 1000, 2),
+                "hash_avg_ms": round(self._hash_total / completed * 1000, 2) if completed else None,
+                "hash_max_ms": round(self._hash_max * 1000, 2),
+            }
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
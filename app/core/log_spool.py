@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+class LogSpool:
+    """
+    Local append-only spool of JSON-lines segment files.
+
+    Records are appended to the newest segment until it reaches segment_bytes,
+    then a new segment is started. When the spool grows past max_bytes the
+    oldest segments are deleted, so a long outage cannot fill the disk.
+    Segment names sort in creation order.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.discarded = 0
+        self._current: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _new_segment(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{time.time_ns():020d}.jsonl")
+
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        with self._lock:
+            if self._current is None or not os.path.exists(self._current) or os.path.getsize(self._current) >= self.segment_bytes:
+                self._current = self._new_segment()
+            with open(self._current, "a", encoding="utf-8") as f:
+                f.write(data)
+            self._enforce_cap()
+
+    def _enforce_cap(self) -> None:
+        segments = self._list_segments()
+        total = sum(os.path.getsize(path) for path in segments)
+        # Never delete the segment currently being written
+        while total > self.max_bytes and len(segments) > 1:
+            oldest = segments.pop(0)
+            total -= os.path.getsize(oldest)
+            with open(oldest, encoding="utf-8") as f:
+                self.discarded += sum(1 for _ in f)
+            os.remove(oldest)
+
+    def _list_segments(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            os.path.join(self.directory, name)
+            for name in sorted(os.listdir(self.directory))
+            if name.endswith(".jsonl")
+        ]
+
+    def seal(self) -> List[str]:
+        """
+        Close the current segment and return all segments, oldest first, for replay.
+        """
+        with self._lock:
+            self._current = None
+            return self._list_segments()
+
+    def read(self, path: str) -> List[Dict[str, Any]]:
+        with open(path, encoding="utf-8") as f:
+            # A crash mid-write can leave a truncated last line; skip it.
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+            return records
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            segments = self._list_segments()
+            return {
+                "segments": len(segments),
+                "bytes": sum(os.path.getsize(path) for path in segments),
+                "discarded": self.discarded,
+            }
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.log_spool import LogSpool
+from app.models.log import APILog
+
+logger = logging.getLogger(__name__)
+
+class APILogWriter:
+    """
+    Buffers API log entries in memory and writes them to MongoDB in batches.
+
+    Requests only append to a bounded queue; a background task flushes it with
+    insert_many whenever batch_size entries are waiting or flush_interval has
+    passed. When the queue is full the overflow policy decides what happens:
+    "drop_oldest" discards the oldest entry, "block" makes the request wait for
+    space, and "spill" appends the entry to the disk spool.
+
+    If a flush fails or MongoDB is slower than slow_flush, the writer stops
+    talking to MongoDB for retry_after seconds and sends batches to the disk
+    spool instead. The spool is replayed into api_logs once MongoDB responds again.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        overflow_policy: str,
+        spool: LogSpool,
+        mongo_timeout: float,
+        slow_flush: float,
+        retry_after: float,
+        replay_interval: float,
+        replay_batch_size: int,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spool = spool
+        self.mongo_timeout = mongo_timeout
+        self.slow_flush = slow_flush
+        self.retry_after = retry_after
+        self.replay_interval = replay_interval
+        self.replay_batch_size = replay_batch_size
+        self._buffer: Deque[APILog] = deque()
+        self._batch_ready = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._mongo_unavailable_until = 0.0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.failed = 0
+        self.flushes = 0
+        self._flush_total = 0.0
+        self._flush_max = 0.0
+        self._flush_last = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Flush whatever is still queued before the process exits
+        await self._drain()
+
+    async def submit(self, entry: APILog) -> None:
+        if len(self._buffer) >= self.max_queue:
+            if self.overflow_policy == "block":
+                while len(self._buffer) >= self.max_queue:
+                    self._space_available.clear()
+                    await self._space_available.wait()
+            elif self.overflow_policy == "spill":
+                await self._spool([entry])
+                return
+            else:
+                self._buffer.popleft()
+                self.dropped += 1
+        self._buffer.append(entry)
+        self.enqueued += 1
+        if len(self._buffer) >= self.batch_size:
+            self._batch_ready.set()
+
+    @property
+    def mongo_available(self) -> bool:
+        return time.monotonic() >= self._mongo_unavailable_until
+
+    async def _run(self) -> None:
+        last_replay = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            try:
+                await self._drain()
+                if time.monotonic() - last_replay >= self.replay_interval:
+                    last_replay = time.monotonic()
+                    await self._replay()
+            except Exception as e:
+                logger.warning("API log writer iteration failed: %s", e)
+
+    async def _drain(self) -> None:
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            self._space_available.set()
+            await self._flush(batch)
+
+    async def _insert(self, batch: List[APILog]) -> bool:
+        """
+        Insert a batch into MongoDB, marking it unavailable on errors or slow writes.
+        """
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(APILog.insert_many(batch), self.mongo_timeout)
+            ok = True
+        except Exception as e:
+            ok = False
+            logger.warning("Failed to write %d API log entries, spooling to disk: %s", len(batch), e)
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self._flush_last = elapsed
+        self._flush_total += elapsed
+        self._flush_max = max(self._flush_max, elapsed)
+        if not ok or elapsed > self.slow_flush:
+            self._mongo_unavailable_until = time.monotonic() + self.retry_after
+        return ok
+
+    async def _flush(self, batch: List[APILog]) -> None:
+        if self.mongo_available and await self._insert(batch):
+            self.written += len(batch)
+        else:
+            await self._spool(batch)
+
+    async def _spool(self, entries: List[APILog]) -> None:
+        records = [entry.model_dump(mode="json", exclude={"id", "revision_id"}) for entry in entries]
+        try:
+            await asyncio.to_thread(self.spool.append, records)
+            self.spooled += len(entries)
+        except OSError as e:
+            self.failed += len(entries)
+            logger.warning("Failed to spool %d API log entries: %s", len(entries), e)
+
+    async def _replay(self) -> None:
+        if not self.mongo_available:
+            return
+        for path in await asyncio.to_thread(self.spool.seal):
+            try:
+                records = await asyncio.to_thread(self.spool.read, path)
+            except FileNotFoundError:
+                continue # Discarded by the size cap meanwhile
+            for i in range(0, len(records), self.replay_batch_size):
+                batch = [APILog(**record) for record in records[i:i + self.replay_batch_size]]
+                if not await self._insert(batch):
+                    # Leave the segment in place; earlier chunks may be replayed twice.
+                    return
+                self.replayed += len(batch)
+            await asyncio.to_thread(self.spool.remove, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._buffer),
+            "max_queue": self.max_queue,
+            "overflow_policy": self.overflow_policy,
+            "mongo_available": self.mongo_available,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "flush_last_ms": round(self._flush_last * 1000, 2),
+            "flush_avg_ms": round(self._flush_total / self.flushes * 1000, 2) if self.flushes else None,
+            "flush_max_ms": round(self._flush_max * 1000, 2),
+            "spool": self.spool.stats(),
+        }
+
+api_log_writer = APILogWriter(
+    max_queue=settings.API_LOG_QUEUE_SIZE,
+    batch_size=settings.API_LOG_BATCH_SIZE,
+    flush_interval=settings.API_LOG_FLUSH_INTERVAL_SECONDS,
+    overflow_policy=settings.API_LOG_OVERFLOW_POLICY,
+    spool=LogSpool(
+        directory=settings.API_LOG_SPOOL_DIR,
+        segment_bytes=settings.API_LOG_SPOOL_SEGMENT_BYTES,
+        max_bytes=settings.API_LOG_SPOOL_MAX_BYTES,
+    ),
+    mongo_timeout=settings.API_LOG_MONGO_TIMEOUT_SECONDS,
+    slow_flush=settings.API_LOG_SLOW_FLUSH_SECONDS,
+    retry_after=settings.API_LOG_MONGO_RETRY_SECONDS,
+    replay_interval=settings.API_LOG_REPLAY_INTERVAL_SECONDS,
+    replay_batch_size=settings.API_LOG_REPLAY_BATCH_SIZE,
+)
@@ -0,0 +1,111 @@
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect and three increments.
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # One slot per bucket plus the implicit +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "response_bytes", "db_queries", "mongo_calls", "status_classes")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.db_queries = Histogram(COUNT_BUCKETS)
+        self.mongo_calls = Histogram(COUNT_BUCKETS)
+        self.status_classes: Dict[str, int] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+class MetricsRegistry:
+    """
+    In-process request metrics keyed by (method, route template).
+
+    Only touched from the event loop (LoggingMiddleware and the async metrics
+    endpoint), so no locking is needed.
+    """
+
+    HISTOGRAMS = (
+        ("latency", "http_request_duration_seconds", "Request latency in seconds"),
+        ("response_bytes", "http_response_size_bytes", "Response body size in bytes"),
+        ("db_queries", "http_request_db_queries", "SQL statements executed per request"),
+        ("mongo_calls", "http_request_mongo_calls", "MongoDB calls made per request"),
+    )
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.api_log_failures = 0
+
+    def observe(self, method: str, route: str, status_code: int, duration: float, response_bytes: int, db_queries: int, mongo_calls: int) -> None:
+        metrics = self._routes.get((method, route))
+        if metrics is None:
+            metrics = self._routes[(method, route)] = RouteMetrics()
+        metrics.latency.observe(duration)
+        metrics.response_bytes.observe(response_bytes)
+        metrics.db_queries.observe(db_queries)
+        metrics.mongo_calls.observe(mongo_calls)
+        status_class = f"{status_code // 100}xx"
+        metrics.status_classes[status_class] = metrics.status_classes.get(status_class, 0) + 1
+
+    def record_api_log_failure(self) -> None:
+        self.api_log_failures += 1
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        routes = sorted(self._routes.items())
+        lines: List[str] = [
+            "# HELP http_requests_total Requests by route template and status class",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), metrics in routes:
+            labels = f'method="{_escape(method)}",route="{_escape(route)}"'
+            for status_class, count in sorted(metrics.status_classes.items()):
+                lines.append(f'http_requests_total{{{labels},status="{status_class}"}} {count}')
+
+        for attr, name, help_text in self.HISTOGRAMS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), metrics in routes:
+                labels = f'method="{_escape(method)}",route="{_escape(route)}"'
+                histogram: Histogram = getattr(metrics, attr)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        lines.append("# HELP api_log_failures_total Requests whose API log entry could not be queued")
+        lines.append("# TYPE api_log_failures_total counter")
+        lines.append(f"api_log_failures_total {self.api_log_failures}")
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
@@ -1,48 +1,102 @@
-
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from jose import jwt
+import logging
+import time
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.auth_context import get_auth_context
 from app.core.config import settings
+from app.core.log_writer import api_log_writer
+from app.core.metrics import metrics_registry
+from app.core.request_context import RequestStats, request_stats
 from app.models.log import APILog
-from app.schemas.token import TokenPayload
-from app.core import security
-from app.models.user import User
-from app.db.session import SessionLocal
-import json
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Skip logging for OPTIONS and static files if any (or specific paths)
-        if request.method == "OPTIONS":
-            return response
 
+logger = logging.getLogger(__name__)
+
+class LoggingMiddleware:
+    """
+    Pure ASGI middleware that logs every request to MongoDB.
+
+    Response messages are passed straight through; only the status code and
+    body sizes are observed, so streaming responses and large downloads are
+    never buffered here.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip logging for OPTIONS and non-HTTP traffic
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        # Verify the token once; dependencies read the result from request.state
+        auth = get_auth_context(request)
+
+        stats = RequestStats(endpoint=f"{request.method} {request.url.path}")
+        token = request_stats.set(stats)
+        status_code = 500
+        response_bytes = 0
+        # Background tasks run after the body is sent; don't count them
+        finished = None
+        db_time = None
+        db_queries = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_bytes, finished, db_time, db_queries
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished = time.perf_counter()
+                    db_time = stats.db_time
+                    db_queries = stats.db_queries
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            if finished is None:
+                finished = time.perf_counter()
+                db_time = stats.db_time
+                db_queries = stats.db_queries
+            # Route template (e.g. /api/v1/users/{user_id}) is set on the scope by the router
+            route = scope.get("route")
+            metrics_registry.observe(
+                request.method,
+                getattr(route, "path", "unmatched"),
+                status_code,
+                finished - stats.started,
+                response_bytes,
+                db_queries,
+                stats.mongo_calls,
+            )
+            n_plus_one = stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD)
+            if n_plus_one:
+                logger.warning(
+                    "Suspected N+1 in %s %s: %d statement(s) repeated, worst %dx: %s",
+                    request.method, request.url.path, len(n_plus_one),
+                    n_plus_one[0]["count"], n_plus_one[0]["statement"][:200],
+                )
+            await self._log(request, auth, status_code, response_bytes, finished - stats.started, db_time, db_queries, n_plus_one)
+
+    async def _log(self, request: Request, auth, status_code: int, response_bytes: int, duration: float, db_time: float, db_queries: int, n_plus_one):
         # Extract User Info
         user_id = None
         role = None
         
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(
-                    token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-                )
-                token_data = TokenPayload(**payload)
-                user_id = token_data.sub
-                role = token_data.role
-                    
-            except Exception:
-                pass # Invalid token or other error, treat as anonymous
+        if auth:
+            user_id = auth.token_data.sub
+            role = auth.token_data.role
 
         # Extract Remark (Query params + Body snippet?)
         # Body is consumed, so we can't easily read it in middleware without tricks.
         # For now, let's log query params and path.
         remark = f"Path: {request.url.path}, Query: {request.query_params}"
         
-        # Log to MongoDB
-        # Since middleware is async, we can await Beanie
+        # Queue for the batched MongoDB writer
         try:
             log_entry = APILog(
                 endpoint=request.url.path,
@@ -50,10 +104,14 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                 user_id=user_id,
                 role=role,
                 remark=remark,
-                status_code=response.status_code
+                status_code=status_code,
+                duration_ms=round(duration * 1000, 2),
+                db_time_ms=round(db_time * 1000, 2),
+                response_bytes=response_bytes,
+                db_queries=db_queries,
+                n_plus_one=n_plus_one or None
             )
-            await log_entry.create()
-        except Exception as e:
-            print(f"Failed to log request: {e}")
-
-        return response
+            await api_log_writer.submit(log_entry)
+        except Exception:
+            metrics_registry.record_api_log_failure()
+            logger.warning("Failed to queue API log for %s %s", request.method, request.url.path, exc_info=True)
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User, UserRole
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The subset of a User row needed to authenticate and authorize a request.
+    """
+    id: str
+    name: str
+    is_active: bool
+    discipline_code: Optional[str]
+    roles: Tuple[UserRole, ...]
+    current_role: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            name=user.name,
+            is_active=user.is_active,
+            discipline_code=user.discipline_code,
+            roles=tuple(r.role for r in user.roles),
+        )
+
+    def with_role(self, role: Optional[str]) -> "Principal":
+        # Cached instances are shared between requests, so never mutate them.
+        return replace(self, current_role=role)
+
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of principals keyed by user id.
+    Writes to a user in this process invalidate its entry; other workers
+    pick up changes once the TTL expires.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            maxsize=settings.PRINCIPAL_CACHE_SIZE,
+            ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+        )
+
+    def get(self, db: Session, user_id: str) -> Optional[Principal]:
+        principal = self._cache.get(user_id)
+        if principal is None:
+            user = db.query(User).options(joinedload(User.roles)).filter(User.id == user_id).first()
+            if not user:
+                return None
+            principal = self.put(user)
+        return principal
+
+    def put(self, user: User) -> Principal:
+        principal = Principal.from_user(user)
+        self._cache.set(user.id, principal)
+        return principal
+
+    def invalidate(self, user_id: str) -> None:
+        self._cache.invalidate(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+principal_cache = PrincipalCache()
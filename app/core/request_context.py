@@ -0,0 +1,40 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+@dataclass
+class RequestStats:
+    """
+    Per-request counters filled in by instrumentation hooks while a request runs.
+    """
+    started: float = field(default_factory=time.perf_counter)
+    db_time: float = 0.0
+    db_queries: int = 0
+    mongo_calls: int = 0
+    endpoint: Optional[str] = None
+    # Executions per distinct SQL statement; parameters are bound separately,
+    # so the text is the statement's shape.
+    statements: Dict[str, int] = field(default_factory=dict)
+
+    def repeated_statements(self, threshold: int) -> List[Dict[str, object]]:
+        """
+        Statements executed at least threshold times, most frequent first.
+        """
+        return [
+            {"statement": statement, "count": count}
+            for statement, count in sorted(self.statements.items(), key=lambda item: -item[1])
+            if count >= threshold
+        ]
+
+# Set by LoggingMiddleware. Sync endpoints run in a threadpool with a copy of the
+# context, which still points at the same RequestStats object.
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return request_stats.get()
+
+def count_mongo_call(calls: int = 1) -> None:
+    stats = request_stats.get()
+    if stats is not None:
+        stats.mongo_calls += calls
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.token import RevokedToken, UserGlobalRevocation
+
+logger = logging.getLogger(__name__)
+
+# Overlap between consecutive polls so documents written with a slightly
+# skewed clock on another worker are not missed.
+POLL_OVERLAP = timedelta(seconds=60)
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. May report false positives, never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationCache:
+    """
+    In-process view of the revoked_tokens and user_global_revocations collections.
+
+    Revoked tokens are kept in a Bloom filter, so MongoDB is only consulted when the
+    filter reports a possible match. Per-user global revocation timestamps live in a
+    TTL-bound LRU. Both are refreshed by polling; writes made in this process
+    (logout, password change) are applied immediately.
+    """
+
+    def __init__(self):
+        self._tokens: Optional[BloomFilter] = None
+        self._users = TTLCache(
+            maxsize=settings.REVOCATION_USER_CACHE_SIZE,
+            ttl=settings.REVOCATION_USER_CACHE_TTL_SECONDS,
+        )
+        self._tokens_since: Optional[datetime] = None
+        self._users_since: Optional[datetime] = None
+        self._last_rebuild = 0.0
+        self._local_tokens: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self.mongo_lookups = 0
+        self.filter_negatives = 0
+
+    async def start(self) -> None:
+        try:
+            await self._rebuild_tokens()
+            await self._poll_users()
+        except Exception as e:
+            # Lookups fall back to MongoDB until the first successful refresh.
+            logger.warning("Revocation cache initial load failed: %s", e)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.REVOCATION_POLL_SECONDS)
+            try:
+                if time.monotonic() - self._last_rebuild >= settings.REVOCATION_REBUILD_SECONDS:
+                    await self._rebuild_tokens()
+                else:
+                    await self._poll_tokens()
+                await self._poll_users()
+            except Exception as e:
+                logger.warning("Revocation cache refresh failed: %s", e)
+
+    async def _rebuild_tokens(self) -> None:
+        # Rebuilding drops tokens whose TTL has already removed them from MongoDB.
+        started = datetime.utcnow()
+        self._local_tokens = []
+        tokens = [doc.token async for doc in RevokedToken.find(RevokedToken.expires_at > started)]
+        bloom = BloomFilter(
+            max(settings.REVOCATION_BLOOM_CAPACITY, 2 * len(tokens)),
+            settings.REVOCATION_BLOOM_ERROR_RATE,
+        )
+        for token in tokens + self._local_tokens:
+            bloom.add(token)
+        self._tokens = bloom
+        self._local_tokens = []
+        self._tokens_since = started - POLL_OVERLAP
+        self._last_rebuild = time.monotonic()
+
+    async def _poll_tokens(self) -> None:
+        if self._tokens is None:
+            await self._rebuild_tokens()
+            return
+        started = datetime.utcnow()
+        async for doc in RevokedToken.find(RevokedToken.revoked_at >= self._tokens_since):
+            self._tokens.add(doc.token)
+        self._tokens_since = started - POLL_OVERLAP
+
+    async def _poll_users(self) -> None:
+        started = datetime.utcnow()
+        query = UserGlobalRevocation.find_all()
+        if self._users_since is not None:
+            query = UserGlobalRevocation.find(UserGlobalRevocation.revoked_at >= self._users_since)
+        async for doc in query:
+            self._users.set(doc.user_id, doc.revoked_at.timestamp())
+        self._users_since = started - POLL_OVERLAP
+
+    async def is_token_revoked(self, token: str) -> bool:
+        if self._tokens is not None and token not in self._tokens:
+            self.filter_negatives += 1
+            return False
+        self.mongo_lookups += 1
+        return await RevokedToken.find_one(RevokedToken.token == token) is not None
+
+    async def get_user_revoked_at(self, user_id: str) -> Optional[float]:
+        """
+        Timestamp of the user's last global revocation, or None if there is none.
+        """
+        revoked_at = self._users.get(user_id)
+        if revoked_at is None:
+            self.mongo_lookups += 1
+            revocation = await UserGlobalRevocation.find_one(UserGlobalRevocation.user_id == user_id)
+            # 0.0 caches "never revoked" without another round trip.
+            revoked_at = revocation.revoked_at.timestamp() if revocation else 0.0
+            self._users.set(user_id, revoked_at)
+        return revoked_at or None
+
+    def revoke_token(self, token: str) -> None:
+        if self._tokens is not None:
+            self._tokens.add(token)
+        self._local_tokens.append(token)
+
+    def revoke_user(self, user_id: str, revoked_at: datetime) -> None:
+        self._users.set(user_id, revoked_at.timestamp())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokens_loaded": self._tokens is not None,
+            "tokens_in_filter": self._tokens.count if self._tokens else 0,
+            "filter_negatives": self.filter_negatives,
+            "mongo_lookups": self.mongo_lookups,
+            "users": self._users.stats(),
+        }
+
+revocation_cache = RevocationCache()
@@ -1,6 +1,6 @@
 
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, List, Union, Optional
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -24,3 +24,9 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+def hash_password_batch(passwords: List[str]) -> List[str]:
+    """
+    Hash a batch of passwords. Module-level so it can run in a worker process.
+    """
+    return [pwd_context.hash(password) for password in passwords]
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import random
+import re
+from typing import Any, Dict, Optional
+
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.models.slow_query import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+def parameter_types(parameters: Any) -> Any:
+    """
+    Type names of bound parameters, never their values.
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+# Calls that act beyond the statement's own result, and row-locking clauses:
+# EXPLAIN ANALYZE would repeat them, or block on the lock the original
+# transaction still holds.
+_SIDE_EFFECTS = re.compile(
+    r"\b(?:pg_(?:try_)?advisory\w*|nextval|setval|pg_sleep\w*|pg_notify|set_config"
+    r"|pg_cancel_backend|pg_terminate_backend|lo_\w+|dblink\w*)\s*\("
+    r"|\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b",
+    re.IGNORECASE,
+)
+
+def explainable(statement: str) -> bool:
+    """
+    Whether EXPLAIN ANALYZE, which executes the statement again, is safe: only
+    plain SELECTs without side-effecting calls or row locks.
+    """
+    return statement.lstrip().upper().startswith("SELECT") and not _SIDE_EFFECTS.search(statement)
+
+
+class SlowQueryRecorder:
+    """
+    Records SQL statements slower than a threshold to the slow_queries collection.
+
+    Engine hooks call record() from whichever thread ran the statement; the entry
+    is handed to a background task on the event loop, which runs EXPLAIN for a
+    sample of SELECTs on its own connection and writes the result to MongoDB.
+    Nothing is done on the request path beyond a queue put.
+    """
+
+    def __init__(self, threshold: float, explain_sample_rate: float, max_queue: int):
+        self.threshold = threshold
+        self.explain_sample_rate = explain_sample_rate
+        self.max_queue = max_queue
+        self._engine: Optional[Engine] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.explained = 0
+        self.dropped = 0
+
+    def start(self, engine: Engine) -> None:
+        self._engine = engine
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    def record(self, statement: str, parameters: Any, duration: float, executemany: bool, endpoint: Optional[str]) -> None:
+        if self._loop is None or duration < self.threshold:
+            return
+        entry = {
+            "statement": statement,
+            "parameters": parameters,
+            "executemany": executemany,
+            "duration": duration,
+            "endpoint": endpoint,
+        }
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, entry)
+        except RuntimeError:
+            pass # Loop already closed during shutdown
+
+    def _enqueue(self, entry: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        while True:
+            entry = await self._queue.get()
+            try:
+                await self._store(entry)
+            except Exception as e:
+                logger.warning("Failed to record slow query: %s", e)
+
+    async def _store(self, entry: Dict[str, Any]) -> None:
+        parameters = entry["parameters"]
+        plan = None
+        if (
+            not entry["executemany"]
+            and explainable(entry["statement"])
+            and random.random() < self.explain_sample_rate
+        ):
+            plan = await asyncio.to_thread(self._explain, entry["statement"], parameters)
+        await SlowQuery(
+            statement=entry["statement"],
+            parameter_types=parameter_types(parameters[0] if entry["executemany"] and parameters else parameters),
+            executemany=entry["executemany"],
+            endpoint=entry["endpoint"],
+            duration_ms=round(entry["duration"] * 1000, 2),
+            plan=plan,
+        ).insert()
+        self.recorded += 1
+
+    def _explain(self, statement: str, parameters: Any) -> Optional[Any]:
+        if self._engine.dialect.name != "postgresql":
+            return None
+        # A raw DBAPI connection bypasses the engine hooks, so EXPLAIN is not itself recorded
+        connection = self._engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            # Give up rather than queue behind locks held by the original transaction
+            cursor.execute("SET LOCAL lock_timeout = '1s'")
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0]
+            cursor.close()
+            self.explained += 1
+            return plan
+        except Exception as e:
+            logger.warning("EXPLAIN failed for slow query: %s", e)
+            return None
+        finally:
+            connection.rollback()
+            connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._loop is not None,
+            "threshold_ms": round(self.threshold * 1000, 2),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "recorded": self.recorded,
+            "explained": self.explained,
+            "dropped": self.dropped,
+        }
+
+slow_query_recorder = SlowQueryRecorder(
+    threshold=settings.SLOW_QUERY_THRESHOLD_MS / 1000,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    max_queue=settings.SLOW_QUERY_QUEUE_SIZE,
+)
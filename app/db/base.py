@@ -3,5 +3,7 @@ from app.db.base_class import Base
 from app.models.user import User, UserRoleEntry
 from app.models.academic import Semester, CalendarEvent
 from app.models.course import Course, CourseOffering, TeacherCourse
-from app.models.examination import Registration, Examination, Marks, GradeMapping, Compartment
+from app.models.examination import Registration, Examination, Marks, GradeMapping, GradeMappingVersion, Compartment
 from app.models.discipline import Discipline
+from app.models.gpa import StudentSemesterGPA
+from app.models.history import AcademicHistoryVersion
@@ -0,0 +1,53 @@
+import csv
+import io
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+# Rows per multi-row statement for three-column payloads: three parameters per
+# row keeps a statement well under PostgreSQL's 65535 bind limit.
+ROWS_PER_STATEMENT = 10000
+
+class _RowStream(io.RawIOBase):
+    """
+    Read-only file object producing CSV text from an iterator of rows, so COPY
+    can stream rows without building the whole payload in memory.
+    """
+
+    def __init__(self, rows: Iterable[Sequence]):
+        self._rows: Iterator[Sequence] = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while len(self._pending) < len(b):
+            row: Optional[Sequence] = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue().encode("utf-8")
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+def copy_rows(db: Session, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> None:
+    """
+    COPY rows into a table (typically a temporary staging table) on the
+    session's own connection, inside its current transaction.
+    None is written as an empty unquoted field, which COPY reads as NULL.
+    """
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            io.BufferedReader(_RowStream(rows), buffer_size=64 * 1024),
+        )
+    finally:
+        cursor.close()
@@ -0,0 +1,84 @@
+import argparse
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.db.schema import _UNIQUE_INDEXES, _ensure_unique_index
+
+class DuplicateMarks(NamedTuple):
+    registration_id: int
+    examination_id: int
+    student_id: str
+    examination: str
+    # (marks id, marks_obtained), lowest id first
+    rows: List[Tuple[int, float]]
+
+    @property
+    def conflicting(self) -> bool:
+        return len({marks for _, marks in self.rows}) > 1
+
+def find_duplicate_marks(conn) -> List[DuplicateMarks]:
+    result = conn.execute(text("""
+        SELECT m.registration_id, m.examination_id, r.student_id, e.name,
+               array_agg(m.id ORDER BY m.id), array_agg(m.marks_obtained ORDER BY m.id)
+        FROM marks m
+        JOIN registration r ON r.id = m.registration_id
+        JOIN examination e ON e.id = m.examination_id
+        GROUP BY m.registration_id, m.examination_id, r.student_id, e.name
+        HAVING count(*) > 1
+        ORDER BY m.registration_id, m.examination_id
+    """))
+    return [
+        DuplicateMarks(registration_id, examination_id, student_id, examination, list(zip(ids, marks)))
+        for registration_id, examination_id, student_id, examination, ids, marks in result
+    ]
+
+def dedupe_marks(conn, keep: Optional[str] = None) -> Tuple[int, List[DuplicateMarks]]:
+    """
+    Delete duplicate marks rows and create the unique index once none remain.
+
+    Identical duplicates are always collapsed. Groups whose values disagree are
+    only resolved when keep is "lowest" or "highest" (by id); otherwise they are
+    returned untouched for an administrator to fix by hand.
+    Returns the number of rows deleted and the unresolved groups.
+    """
+    deleted = 0
+    unresolved: List[DuplicateMarks] = []
+    for group in find_duplicate_marks(conn):
+        ids = [marks_id for marks_id, _ in group.rows]
+        if group.conflicting and keep is None:
+            unresolved.append(group)
+            continue
+        kept = ids[-1] if keep == "highest" else ids[0]
+        deleted += conn.execute(
+            text("DELETE FROM marks WHERE id = ANY(:ids)"),
+            {"ids": [marks_id for marks_id in ids if marks_id != kept]},
+        ).rowcount
+    if not unresolved:
+        for name, table, columns, _ in _UNIQUE_INDEXES:
+            if table == "marks":
+                _ensure_unique_index(conn, name, table, columns, dedupe=False)
+    return deleted, unresolved
+
+if __name__ == "__main__":
+    # Admin command: python -m app.db.dedupe_marks [--apply] [--keep lowest|highest]
+    parser = argparse.ArgumentParser(description="Report and remove duplicate marks rows.")
+    parser.add_argument("--apply", action="store_true", help="delete duplicates and create the unique index")
+    parser.add_argument("--keep", choices=("lowest", "highest"), help="id to keep where duplicate values disagree")
+    args = parser.parse_args()
+
+    from app.db.session import engine
+
+    with engine.begin() as conn:
+        groups = find_duplicate_marks(conn)
+        for group in groups:
+            values = ", ".join(f"id {marks_id}: {marks}" for marks_id, marks in group.rows)
+            label = "CONFLICT" if group.conflicting else "identical"
+            print(f"{label} student {group.student_id}, examination {group.examination!r} "
+                  f"(registration {group.registration_id}, examination {group.examination_id}): {values}")
+        print(f"{len(groups)} duplicate groups, {sum(g.conflicting for g in groups)} with conflicting values")
+        if args.apply:
+            deleted, unresolved = dedupe_marks(conn, args.keep)
+            print(f"Deleted {deleted} rows")
+            if unresolved:
+                print(f"{len(unresolved)} conflicting groups left; delete the wrong rows by id or rerun with --keep")
@@ -0,0 +1,67 @@
+import re
+import time
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import raiseload, sessionmaker
+
+from app.core.request_context import count_mongo_call, current_request_stats
+from app.core.slow_query import slow_query_recorder
+
+# Expanded IN lists differ in placeholder count only; fold them into one shape.
+_IN_LIST = re.compile(r"IN \((?:%\([^)]+\)s(?:, )?)+\)")
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("IN (...)", " ".join(statement.split()))
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Attribute time and statements spent in SQL to the current request.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        stats = current_request_stats()
+        slow_query_recorder.record(statement, parameters, elapsed, executemany, stats.endpoint if stats else None)
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.db_queries += 1
+            shape = statement_shape(statement)
+            stats.statements[shape] = stats.statements.get(shape, 0) + 1
+
+def raise_on_lazy_load(session_factory: sessionmaker) -> None:
+    """
+    Make every ORM query default to raiseload("*"), so touching a relationship
+    that was not eagerly loaded raises instead of issuing a query per row.
+    Explicit joinedload/selectinload options still apply.
+    """
+    @event.listens_for(session_factory, "do_orm_execute")
+    def add_raiseload(orm_execute_state):
+        if (
+            orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+        ):
+            orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """
+    Count every MongoDB command sent by the client against the current request.
+
+    Motor runs operations on its executor with a copy of the caller's context,
+    so the request's RequestStats is visible here. Background tasks (log writer,
+    revocation polling) run outside any request and are not counted.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        count_mongo_call()
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
@@ -2,11 +2,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from app.core.config import settings
+from app.db.instrumentation import MongoCommandCounter
 
 from app.models.log import APILog
 from app.models.token import RevokedToken, UserGlobalRevocation
+from app.models.slow_query import SlowQuery
 
 async def init_mongodb():
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[MongoCommandCounter()])
     # We will add document models here later
-    await init_beanie(database=client[settings.MONGODB_DB_NAME], document_models=[APILog, RevokedToken, UserGlobalRevocation])
+    await init_beanie(database=client[settings.MONGODB_DB_NAME], document_models=[APILog, RevokedToken, UserGlobalRevocation, SlowQuery])
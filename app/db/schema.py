@@ -0,0 +1,98 @@
+import logging
+from typing import Sequence
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# create_all only creates missing tables. Columns and constraints added to
+# existing tables are applied here; every statement must be idempotent.
+_DDL = [
+    # Versioned grade mappings
+    "ALTER TABLE grademappingversion ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE grademapping ADD COLUMN IF NOT EXISTS version_id INTEGER REFERENCES grademappingversion(id)",
+    "ALTER TABLE grademapping DROP CONSTRAINT IF EXISTS grademapping_grade_key",
+    "CREATE UNIQUE INDEX IF NOT EXISTS grademapping_version_id_grade_key ON grademapping (version_id, grade)",
+    "ALTER TABLE registration ADD COLUMN IF NOT EXISTS grade_mapping_version_id INTEGER REFERENCES grademappingversion(id)",
+    "ALTER TABLE compartment ADD COLUMN IF NOT EXISTS grade_mapping_version_id INTEGER REFERENCES grademappingversion(id)",
+]
+
+def _backfill_grade_mapping_versions(conn) -> None:
+    """
+    Move unversioned mappings from before versioning into an initial version
+    effective since the epoch, and attribute existing grades to it.
+    """
+    if not conn.execute(text("SELECT 1 FROM grademapping WHERE version_id IS NULL LIMIT 1")).first():
+        return
+    version_id = conn.execute(text(
+        "INSERT INTO grademappingversion (effective_from, created_at) "
+        "VALUES ('1970-01-01T00:00:00+00:00', now()) RETURNING id"
+    )).scalar_one()
+    conn.execute(text("UPDATE grademapping SET version_id = :v WHERE version_id IS NULL"), {"v": version_id})
+    for table in ("registration", "compartment"):
+        conn.execute(
+            text(f"UPDATE {table} SET grade_mapping_version_id = :v WHERE grade IS NOT NULL AND grade_mapping_version_id IS NULL"),
+            {"v": version_id},
+        )
+
+# (index name, table, columns, dedupe) matching the UniqueConstraints on the models.
+# Duplicate compartments are removed keeping the highest id, which is the row
+# the GPA and reports already read (latest_compartment_clause), so nothing
+# visible changes. Duplicate marks may hold different values and registrations
+# have marks hanging off them; both are left for an administrator (see
+# app.db.dedupe_marks), and marks uploads fail until the index exists.
+_UNIQUE_INDEXES = [
+    ("registration_student_id_course_offering_id_key", "registration", ("student_id", "course_offering_id"), False),
+    ("marks_registration_id_examination_id_key", "marks", ("registration_id", "examination_id"), False),
+    ("compartment_student_id_course_offering_id_key", "compartment", ("student_id", "course_offering_id"), True),
+]
+
+def _ensure_unique_index(conn, name: str, table: str, columns: Sequence[str], dedupe: bool) -> None:
+    """
+    Create a unique index. Rows violating it are deleted, keeping the highest id
+    of each group, when dedupe is set; otherwise the index is skipped.
+    """
+    if conn.execute(text("SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() AND indexname = :name"), {"name": name}).first():
+        return
+    cols = ", ".join(columns)
+    duplicates = conn.execute(text(
+        f"SELECT count(*) FROM (SELECT 1 FROM {table} GROUP BY {cols} HAVING count(*) > 1) d"
+    )).scalar_one()
+    if duplicates and not dedupe:
+        logger.warning("Not creating unique index %s: %d duplicate (%s) groups in %s", name, duplicates, cols, table)
+        return
+    if duplicates:
+        deleted = conn.execute(text(
+            f"DELETE FROM {table} t WHERE t.id < (SELECT max(d.id) FROM {table} d WHERE "
+            + " AND ".join(f"d.{col} = t.{col}" for col in columns)
+            + ")"
+        )).rowcount
+        logger.warning("Deleted %d duplicate (%s) rows from %s to create unique index %s", deleted, cols, table, name)
+    conn.execute(text(f"CREATE UNIQUE INDEX {name} ON {table} ({cols})"))
+
+def _backfill_student_gpa(conn) -> None:
+    """
+    Fill the materialized GPA table the first time it exists next to graded
+    registrations; afterwards grade writes keep it up to date.
+    """
+    if conn.execute(text("SELECT 1 FROM studentsemestergpa LIMIT 1")).first():
+        return
+    if not conn.execute(text("SELECT 1 FROM registration LIMIT 1")).first():
+        return
+    from app.services.gpa import rebuild_all_gpa
+
+    with Session(bind=conn) as db:
+        count = rebuild_all_gpa(db)
+    logger.warning("Backfilled %d student semester GPA rows", count)
+
+def ensure_schema(engine: Engine) -> None:
+    with engine.begin() as conn:
+        # Serialize concurrent workers starting up at the same time
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('ensure_schema'))"))
+        for statement in _DDL:
+            conn.execute(text(statement))
+        _backfill_grade_mapping_versions(conn)
+        for name, table, columns, dedupe in _UNIQUE_INDEXES:
+            _ensure_unique_index(conn, name, table, columns, dedupe)
+        _backfill_student_gpa(conn)
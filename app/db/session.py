@@ -1,7 +1,10 @@
-
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.instrumentation import instrument_engine, raise_on_lazy_load
 
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if settings.SQLALCHEMY_RAISE_ON_LAZY_LOAD:
+    raise_on_lazy_load(SessionLocal)
@@ -5,6 +5,10 @@ from app.core.config import settings
 from app.db.mongodb import init_mongodb
 from app.api.v1.api import api_router
 from app.core.middleware import LoggingMiddleware
+from app.core.revocation import revocation_cache
+from app.core.hashing import password_hasher
+from app.core.log_writer import api_log_writer
+from app.core.slow_query import slow_query_recorder
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
 
@@ -25,11 +29,24 @@ app.add_middleware(
 async def startup_event():
     # Initialize MongoDB
     await init_mongodb()
+    await revocation_cache.start()
+    api_log_writer.start()
     
     # Create SQLAlchemy tables if they don't exist
     from app.db.session import engine
     from app.db.base import Base
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        slow_query_recorder.start(engine)
     Base.metadata.create_all(bind=engine)
+    from app.db.schema import ensure_schema
+    ensure_schema(engine)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await revocation_cache.stop()
+    password_hasher.shutdown()
+    await api_log_writer.stop()
+    await slow_query_recorder.stop()
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
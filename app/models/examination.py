@@ -1,22 +1,44 @@
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
+class GradeMappingVersion(Base):
+    """
+    An immutable set of grade mappings, in force from effective_from until the
+    next version takes effect.
+    """
+    id = Column(Integer, primary_key=True, index=True)
+    effective_from = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Bumped when points of this version are corrected after the fact
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    mappings = relationship("GradeMapping", back_populates="version")
+
 class GradeMapping(Base):
+    __table_args__ = (UniqueConstraint("version_id", "grade"),)
+
     id = Column(Integer, primary_key=True, index=True)
-    grade = Column(String, unique=True, nullable=False)
+    version_id = Column(Integer, ForeignKey("grademappingversion.id"), nullable=True)
+    grade = Column(String, nullable=False)
     points = Column(Float, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    version = relationship("GradeMappingVersion", back_populates="mappings")
+
 class Registration(Base):
+    __table_args__ = (UniqueConstraint("student_id", "course_offering_id"),)
+
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(String, ForeignKey("user.id"), nullable=False)
     course_offering_id = Column(Integer, ForeignKey("courseoffering.id"), nullable=False)
     grade = Column(String, nullable=True)
     grade_point = Column(Float, nullable=True)
+    # Mapping version the grade point was resolved under
+    grade_mapping_version_id = Column(Integer, ForeignKey("grademappingversion.id"), nullable=True)
     
     student = relationship("User")
     course_offering = relationship("CourseOffering", back_populates="registrations")
@@ -33,6 +55,8 @@ class Examination(Base):
     marks = relationship("Marks", back_populates="examination")
 
 class Marks(Base):
+    __table_args__ = (UniqueConstraint("registration_id", "examination_id"),)
+
     id = Column(Integer, primary_key=True, index=True)
     registration_id = Column(Integer, ForeignKey("registration.id"), nullable=False)
     examination_id = Column(Integer, ForeignKey("examination.id"), nullable=False)
@@ -42,11 +66,14 @@ class Marks(Base):
     examination = relationship("Examination", back_populates="marks")
 
 class Compartment(Base):
+    __table_args__ = (UniqueConstraint("student_id", "course_offering_id"),)
+
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(String, ForeignKey("user.id"), nullable=False)
     course_offering_id = Column(Integer, ForeignKey("courseoffering.id"), nullable=False)
     grade = Column(String, nullable=True)
     grade_point = Column(Float, nullable=True)
+    grade_mapping_version_id = Column(Integer, ForeignKey("grademappingversion.id"), nullable=True)
     
     student = relationship("User")
     course_offering = relationship("CourseOffering")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class StudentSemesterGPA(Base):
+    """
+    Materialized per-student, per-semester grade aggregates.
+    Maintained by app.services.gpa; never written directly.
+    """
+    student_id = Column(String, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    semester_id = Column(Integer, ForeignKey("semester.id", ondelete="CASCADE"), primary_key=True)
+    semester_start = Column(Date, nullable=False)
+    # Credits (L + T + 0.5 * P) of graded courses and the credit-weighted grade points
+    credits_attempted = Column(Float, nullable=False, default=0.0)
+    weighted_points = Column(Float, nullable=False, default=0.0)
+    sgpa = Column(Float, nullable=True)
+    # Running totals over this and all earlier semesters
+    cumulative_credits = Column(Float, nullable=False, default=0.0)
+    cumulative_points = Column(Float, nullable=False, default=0.0)
+    cgpa = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class AcademicHistoryVersion(Base):
+    # No foreign key: a deleted and re-created student must not reuse old versions
+    student_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
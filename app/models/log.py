@@ -1,5 +1,5 @@
 
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from beanie import Document
 from pydantic import Field
@@ -12,6 +12,12 @@ class APILog(Document):
     role: Optional[str] = None
     remark: Optional[str] = None
     status_code: int
+    duration_ms: Optional[float] = None
+    db_time_ms: Optional[float] = None
+    response_bytes: Optional[int] = None
+    db_queries: Optional[int] = None
+    # Statements repeated past SQL_N_PLUS_ONE_THRESHOLD, with their counts
+    n_plus_one: Optional[List[Dict[str, Any]]] = None
 
     class Settings:
         name = "api_logs"
@@ -0,0 +1,22 @@
+from typing import Any, Optional
+from datetime import datetime
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+class SlowQuery(Document):
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    statement: str
+    parameter_types: Optional[Any] = None
+    executemany: bool = False
+    endpoint: Optional[str] = None
+    duration_ms: float
+    # EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output; only sampled SELECTs have one
+    plan: Optional[Any] = None
+
+    class Settings:
+        name = "slow_queries"
+        indexes = [
+            IndexModel([("statement", ASCENDING)]),
+            IndexModel([("timestamp", DESCENDING)]),
+        ]
@@ -1,7 +1,7 @@
 
 from pydantic import BaseModel
-from typing import Optional
-from datetime import date
+from typing import List, Optional
+from datetime import date, datetime
 
 class GradeMappingBase(BaseModel):
     grade: str
@@ -12,6 +12,14 @@ class GradeMappingCreate(GradeMappingBase):
 
 class GradeMapping(GradeMappingBase):
     id: int
+    version_id: Optional[int] = None
+    class Config:
+        orm_mode = True
+
+class GradeMappingVersion(BaseModel):
+    id: int
+    effective_from: datetime
+    mappings: List[GradeMapping]
     class Config:
         orm_mode = True
 
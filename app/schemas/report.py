@@ -31,3 +31,19 @@ class GradeCardRequest(BaseModel):
 
 class TranscriptRequest(BaseModel):
     student_ids: List[str]
+
+class RankingItem(BaseModel):
+    rank: int
+    percentile: float # Share of the other students in the cohort with a GPA at or below this one, 0-100 (bottom 0, top 100)
+    student_id: str
+    student_name: str
+    discipline_code: Optional[str]
+    gpa: float
+    credits: float
+
+class RankingPage(BaseModel):
+    metric: str
+    semester_id: Optional[int]
+    total: int
+    items: List[RankingItem]
+    next_cursor: Optional[str] # Pass as cursor to fetch the next page
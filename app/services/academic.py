@@ -1,66 +1,94 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models.user import User
 from app.models.discipline import Discipline
+from app.models.academic import Semester
+from app.models.course import Course, CourseOffering
 from app.models.examination import Registration, Compartment as CompartmentRegistration
 from app.schemas.academic import AcademicHistory, AcademicHistorySemester, AcademicHistoryCourse
 
-def get_student_academic_history(db: Session, student_id: str) -> AcademicHistory:
+# One flat row per registration; see _registration_rows_query.
+RegistrationRow = Tuple
+# course_offering_id -> (grade, grade_point)
+CompartmentMap = Dict[int, Tuple[Optional[str], Optional[float]]]
+
+def _registration_rows_query():
+    return (
+        select(
+            Registration.student_id,
+            Registration.course_offering_id,
+            Registration.grade,
+            Registration.grade_point,
+            Semester.id,
+            Semester.name,
+            Semester.start_date,
+            Course.code,
+            Course.name,
+            Course.lecture_credits,
+            Course.tutorial_credits,
+            Course.practice_credits,
+        )
+        .join(CourseOffering, CourseOffering.id == Registration.course_offering_id)
+        .join(Semester, Semester.id == CourseOffering.semester_id)
+        .join(Course, Course.code == CourseOffering.course_code)
+        .order_by(Registration.id)
+    )
+
+def _compartments_query():
+    return (
+        select(
+            CompartmentRegistration.student_id,
+            CompartmentRegistration.course_offering_id,
+            CompartmentRegistration.grade,
+            CompartmentRegistration.grade_point,
+        )
+        .order_by(CompartmentRegistration.id)
+    )
+
+def build_academic_history(
+    student_id: str,
+    student_name: str,
+    discipline_code: Optional[str],
+    discipline_name: Optional[str],
+    registration_rows: Iterable[RegistrationRow],
+    compartment_map: CompartmentMap,
+) -> AcademicHistory:
     """
-    Calculate and return the academic history for a student.
+    Build the academic history from already-fetched rows. Does no I/O.
     """
-    user = db.query(User).filter(User.id == student_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    # Get all registrations
-    registrations = db.query(Registration).filter(Registration.student_id == student_id).all()
-    
-    # Get all compartment registrations
-    compartment_regs = db.query(CompartmentRegistration).filter(CompartmentRegistration.student_id == student_id).all()
-    compartment_map = {c.course_offering_id: c for c in compartment_regs}
-    
-    # Get Discipline Name
-    discipline_name = None
-    if user.discipline_code:
-        discipline = db.query(Discipline).filter(Discipline.code == user.discipline_code).first()
-        if discipline:
-            discipline_name = discipline.name
-    
     # Group by semester
     semesters_map = {}
     
-    for reg in registrations:
-        offering = reg.course_offering
-        semester = offering.semester
-        
-        if semester.id not in semesters_map:
-            semesters_map[semester.id] = {
-                "semester_id": semester.id,
-                "semester_name": semester.name,
-                "start_date": semester.start_date,
+    for (
+        _, offering_id, original_grade, original_points,
+        semester_id, semester_name, start_date,
+        course_code, course_name, lecture_credits, tutorial_credits, practice_credits,
+    ) in registration_rows:
+        if semester_id not in semesters_map:
+            semesters_map[semester_id] = {
+                "semester_id": semester_id,
+                "semester_name": semester_name,
+                "start_date": start_date,
                 "courses": [],
                 "total_credits": 0.0,
                 "total_points": 0.0
             }
             
         # Determine grades
-        original_grade = reg.grade
-        original_points = reg.grade_point
-        
-        comp_reg = compartment_map.get(offering.id)
-        compartment_grade = comp_reg.grade if comp_reg else None
-        compartment_points = comp_reg.grade_point if comp_reg else None
+        compartment_grade, compartment_points = compartment_map.get(offering_id, (None, None))
         
         effective_grade = compartment_grade if compartment_grade else original_grade
         effective_points = compartment_points if compartment_points is not None else original_points
         
         # Calculate Credits (L + T + 0.5 * P)
-        course_credits = float(offering.course.lecture_credits + offering.course.tutorial_credits + (0.5 * offering.course.practice_credits))
+        course_credits = float(lecture_credits + tutorial_credits + (0.5 * practice_credits))
         
         course_data = AcademicHistoryCourse(
-            code=offering.course.code,
-            name=offering.course.name,
+            code=course_code,
+            name=course_name,
             credits=course_credits,
             original_grade=original_grade,
             compartment_grade=compartment_grade,
@@ -68,12 +96,12 @@ def get_student_academic_history(db: Session, student_id: str) -> AcademicHistor
             grade_point=effective_points
         )
         
-        semesters_map[semester.id]["courses"].append(course_data)
+        semesters_map[semester_id]["courses"].append(course_data)
         
         # Add to semester totals if grade is present (passed/failed but graded)
         if effective_points is not None:
-             semesters_map[semester.id]["total_credits"] += course_credits
-             semesters_map[semester.id]["total_points"] += (effective_points * course_credits)
+             semesters_map[semester_id]["total_credits"] += course_credits
+             semesters_map[semester_id]["total_points"] += (effective_points * course_credits)
              
     # Calculate SGPA & CGPA
     total_credits_cumulative = 0.0
@@ -104,10 +132,99 @@ def get_student_academic_history(db: Session, student_id: str) -> AcademicHistor
         cgpa = total_points_cumulative / total_credits_cumulative
         
     return AcademicHistory(
-        student_id=user.id,
-        student_name=user.name,
-        discipline_code=user.discipline_code,
+        student_id=student_id,
+        student_name=student_name,
+        discipline_code=discipline_code,
         discipline_name=discipline_name,
         cgpa=round(cgpa, 2) if cgpa is not None else 0.0,
         semesters=semester_list
     )
+
+def get_student_academic_history(db: Session, student_id: str) -> AcademicHistory:
+    """
+    Calculate and return the academic history for a student.
+
+    Runs three statements regardless of how many courses the student has:
+    the user with their discipline, all registrations joined to offering,
+    semester and course, and all compartment registrations.
+    """
+    user_row = db.execute(
+        select(User.id, User.name, User.discipline_code, Discipline.name)
+        .outerjoin(Discipline, Discipline.code == User.discipline_code)
+        .where(User.id == student_id)
+    ).first()
+    if not user_row:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    registration_rows = db.execute(
+        _registration_rows_query().where(Registration.student_id == student_id)
+    ).all()
+    
+    # Later rows win, as before, if a course has several compartment registrations
+    compartment_map = {
+        offering_id: (grade, grade_point)
+        for _, offering_id, grade, grade_point in db.execute(
+            _compartments_query().where(CompartmentRegistration.student_id == student_id)
+        )
+    }
+    
+    return build_academic_history(*user_row, registration_rows, compartment_map)
+
+def _load_academic_histories(db: Session, student_ids: List[str]) -> Dict[str, AcademicHistory]:
+    """
+    Academic histories of the given students, keyed by id, using the same three
+    statements as get_student_academic_history. Unknown ids are absent.
+    """
+    users = {
+        row[0]: row
+        for row in db.execute(
+            select(User.id, User.name, User.discipline_code, Discipline.name)
+            .outerjoin(Discipline, Discipline.code == User.discipline_code)
+            .where(User.id.in_(student_ids))
+        )
+    }
+    
+    registrations: Dict[str, List[RegistrationRow]] = defaultdict(list)
+    for row in db.execute(_registration_rows_query().where(Registration.student_id.in_(student_ids))):
+        registrations[row[0]].append(row)
+    
+    compartments: Dict[str, CompartmentMap] = defaultdict(dict)
+    for student_id, offering_id, grade, grade_point in db.execute(
+        _compartments_query().where(CompartmentRegistration.student_id.in_(student_ids))
+    ):
+        compartments[student_id][offering_id] = (grade, grade_point)
+    
+    return {
+        student_id: build_academic_history(
+            *user_row, registrations.get(student_id, []), compartments.get(student_id, {})
+        )
+        for student_id, user_row in users.items()
+    }
+
+def iter_student_academic_histories(
+    db: Session, student_ids: List[str], chunk_size: int = 500
+) -> Iterator[Tuple[str, Optional[AcademicHistory], Optional[Exception]]]:
+    """
+    Yield (student_id, history, error) for every input id, in input order, for a
+    whole cohort. history is None for unknown ids and when loading failed.
+
+    Students are loaded chunk_size at a time, so a batch costs three round trips
+    per chunk rather than per student. If a chunk fails it is retried one
+    student at a time, so one bad student does not take the others down.
+    """
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        try:
+            histories = _load_academic_histories(db, chunk)
+        except Exception:
+            db.rollback()
+            for student_id in chunk:
+                try:
+                    yield student_id, _load_academic_histories(db, [student_id]).get(student_id), None
+                except Exception as e:
+                    db.rollback()
+                    yield student_id, None, e
+            continue
+        
+        for student_id in chunk:
+            yield student_id, histories.get(student_id), None
@@ -0,0 +1,223 @@
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select, insert, delete, func, case, extract, text
+from sqlalchemy.orm import Session
+from app.models.academic import Semester
+from app.models.course import Course, CourseOffering
+from app.models.examination import Registration, Compartment as CompartmentRegistration
+from app.models.gpa import StudentSemesterGPA
+from app.models.user import User
+
+def latest_compartment_clause():
+    """
+    Join condition from Registration to its latest compartment registration, if any.
+    Should a student have several for one offering, the highest id is the one in
+    effect; every reader and writer of compartment grades uses that row.
+    """
+    latest_compartment = (
+        select(func.max(CompartmentRegistration.id).label("id"))
+        .group_by(CompartmentRegistration.student_id, CompartmentRegistration.course_offering_id)
+    )
+    return (
+        (CompartmentRegistration.student_id == Registration.student_id)
+        & (CompartmentRegistration.course_offering_id == Registration.course_offering_id)
+        & CompartmentRegistration.id.in_(latest_compartment)
+    )
+
+def _semester_aggregates(student_ids: Optional[Iterable[str]] = None):
+    """
+    Per (student, semester) credits and weighted points, using the same rules as
+    the academic history: a compartment grade point overrides the original one,
+    and only graded courses count towards credits.
+    """
+    effective_points = func.coalesce(CompartmentRegistration.grade_point, Registration.grade_point)
+    course_credits = Course.lecture_credits + Course.tutorial_credits + 0.5 * Course.practice_credits
+    
+    query = (
+        select(
+            Registration.student_id.label("student_id"),
+            Semester.id.label("semester_id"),
+            Semester.start_date.label("semester_start"),
+            func.sum(case((effective_points.is_not(None), course_credits), else_=0.0)).label("credits_attempted"),
+            func.sum(func.coalesce(effective_points * course_credits, 0.0)).label("weighted_points"),
+        )
+        .join(CourseOffering, CourseOffering.id == Registration.course_offering_id)
+        .join(Semester, Semester.id == CourseOffering.semester_id)
+        .join(Course, Course.code == CourseOffering.course_code)
+        .outerjoin(CompartmentRegistration, latest_compartment_clause())
+        .group_by(Registration.student_id, Semester.id, Semester.start_date)
+    )
+    if student_ids is not None:
+        query = query.where(Registration.student_id.in_(student_ids))
+    return query.subquery()
+
+def _rows_query(student_ids: Optional[Iterable[str]] = None):
+    sem = _semester_aggregates(student_ids)
+    running = dict(
+        partition_by=sem.c.student_id,
+        order_by=(sem.c.semester_start, sem.c.semester_id),
+        rows=(None, 0),
+    )
+    cumulative_credits = func.sum(sem.c.credits_attempted).over(**running)
+    cumulative_points = func.sum(sem.c.weighted_points).over(**running)
+    return select(
+        sem.c.student_id,
+        sem.c.semester_id,
+        sem.c.semester_start,
+        sem.c.credits_attempted,
+        sem.c.weighted_points,
+        case((sem.c.credits_attempted > 0, sem.c.weighted_points / sem.c.credits_attempted)),
+        cumulative_credits,
+        cumulative_points,
+        case((cumulative_credits > 0, cumulative_points / cumulative_credits)),
+    )
+
+_COLUMNS = [
+    "student_id", "semester_id", "semester_start", "credits_attempted", "weighted_points",
+    "sgpa", "cumulative_credits", "cumulative_points", "cgpa",
+]
+
+def lock_student_gpa(db: Session, student_ids: Iterable[str]) -> None:
+    """
+    Serialize GPA rewrites per student until the end of the transaction.
+
+    Without this, two transactions refreshing the same student under READ
+    COMMITTED both delete before either commits, and the second insert fails on
+    the primary key. Locks are taken in a fixed order so overlapping student
+    sets cannot deadlock.
+    """
+    db.execute(
+        text("""
+            SELECT pg_advisory_xact_lock(k) FROM (
+                SELECT DISTINCT hashtext('student_gpa:' || id) AS k
+                FROM unnest(CAST(:ids AS text[])) AS id
+                ORDER BY k
+            ) keys
+        """),
+        {"ids": list(student_ids)},
+    )
+
+def refresh_student_gpa(db: Session, student_ids: Iterable[str]) -> None:
+    """
+    Recompute the materialized GPA rows of the given students inside the
+    caller's transaction. Call after changing grades, before commit.
+    """
+    student_ids = list(set(student_ids))
+    if not student_ids:
+        return
+    # The session does not autoflush; make pending grade changes visible first
+    db.flush()
+    # Once the lock is held, the statements below see grades committed by its previous holder
+    lock_student_gpa(db, student_ids)
+    db.execute(delete(StudentSemesterGPA).where(StudentSemesterGPA.student_id.in_(student_ids)))
+    db.execute(insert(StudentSemesterGPA).from_select(_COLUMNS, _rows_query(student_ids)))
+
+def registered_students(db: Session, *criteria) -> List[str]:
+    """
+    Students registered in any offering matching the CourseOffering criteria,
+    i.e. whose GPA depends on that offering's course and semester.
+    """
+    return db.scalars(
+        select(Registration.student_id)
+        .join(CourseOffering, CourseOffering.id == Registration.course_offering_id)
+        .where(*criteria)
+        .distinct()
+    ).all()
+
+def rebuild_all_gpa(db: Session) -> int:
+    """
+    Rebuild the whole table from registrations and compartments. Returns the row count.
+    """
+    db.execute(delete(StudentSemesterGPA))
+    db.execute(insert(StudentSemesterGPA).from_select(_COLUMNS, _rows_query()))
+    return db.scalar(select(func.count()).select_from(StudentSemesterGPA))
+
+def get_cgpa_map(db: Session, student_ids: Iterable[str]) -> Dict[str, Optional[float]]:
+    """
+    Current CGPA (as of each student's latest semester) for the given students.
+    Students without registrations are absent from the result.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+    latest = (
+        select(
+            StudentSemesterGPA.student_id,
+            StudentSemesterGPA.cgpa,
+            func.row_number().over(
+                partition_by=StudentSemesterGPA.student_id,
+                order_by=(StudentSemesterGPA.semester_start.desc(), StudentSemesterGPA.semester_id.desc()),
+            ).label("rn"),
+        )
+        .where(StudentSemesterGPA.student_id.in_(student_ids))
+        .subquery()
+    )
+    return {
+        student_id: cgpa
+        for student_id, cgpa in db.execute(select(latest.c.student_id, latest.c.cgpa).where(latest.c.rn == 1))
+    }
+
+def rankings_query(
+    metric: str,
+    semester: Optional[Semester] = None,
+    discipline_code: Optional[str] = None,
+    admission_year: Optional[int] = None,
+):
+    """
+    Cohort ranking computed in the database, one row per student with graded credits.
+
+    metric "sgpa" ranks on the given semester alone; "cgpa" ranks on everything up
+    to and including it, or on all semesters when none is given. A student's
+    admission year is the year of their first registered semester.
+    """
+    sem = _semester_aggregates()
+    per_student = select(
+        sem.c.student_id,
+        func.sum(sem.c.credits_attempted).label("credits"),
+        func.sum(sem.c.weighted_points).label("points"),
+    ).group_by(sem.c.student_id)
+    if semester is not None:
+        if metric == "sgpa":
+            per_student = per_student.where(sem.c.semester_id == semester.id)
+        else:
+            per_student = per_student.where(sem.c.semester_start <= semester.start_date)
+    per_student = per_student.having(func.sum(sem.c.credits_attempted) > 0).subquery()
+    
+    gpa = per_student.c.points / per_student.c.credits
+    query = (
+        select(
+            func.rank().over(order_by=gpa.desc()).label("rank"),
+            func.percent_rank().over(order_by=gpa.desc()).label("percent_rank"),
+            User.id.label("student_id"),
+            User.name.label("student_name"),
+            User.discipline_code,
+            gpa.label("gpa"),
+            per_student.c.credits,
+        )
+        .join(User, User.id == per_student.c.student_id)
+    )
+    if discipline_code:
+        query = query.where(User.discipline_code == discipline_code)
+    if admission_year is not None:
+        first_semester = (
+            select(sem.c.student_id, func.min(sem.c.semester_start).label("first_start"))
+            .group_by(sem.c.student_id)
+            .subquery()
+        )
+        query = (
+            query.join(first_semester, first_semester.c.student_id == User.id)
+            .where(extract("year", first_semester.c.first_start) == admission_year)
+        )
+    return query.subquery()
+
+if __name__ == "__main__":
+    # Repair command: python -m app.services.gpa
+    from app.db.session import SessionLocal
+    import app.db.base  # noqa: F401 - register all models
+
+    db = SessionLocal()
+    try:
+        count = rebuild_all_gpa(db)
+        db.commit()
+        print(f"Rebuilt {count} student semester GPA rows")
+    finally:
+        db.close()
@@ -0,0 +1,144 @@
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Type
+
+from sqlalchemy import Float, Integer, String, column, update, values
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.copy import ROWS_PER_STATEMENT
+from app.models.examination import GradeMapping, GradeMappingVersion
+
+@dataclass(frozen=True)
+class GradeTable:
+    """
+    Read-only grade -> points lookup for one mapping version.
+    """
+    version_id: int
+    revision: int
+    effective_from: datetime
+    points: Mapping[str, float]
+
+class GradeTableCache:
+    """
+    In-memory grade tables for resolving grade points without queries.
+
+    New grades always go into new versions, so a table is loaded once and kept
+    until its version's revision changes (a correction, see
+    app.services.recompute). Only the list of versions, with their revisions,
+    is re-read, every GRADE_VERSION_REFRESH_SECONDS or immediately when this
+    process changes them.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._tables: Dict[int, GradeTable] = {}
+        # (effective_from, version_id), ascending
+        self._versions: List[Tuple[datetime, int]] = []
+        self._revisions: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+
+    def _refresh(self, db: Session) -> None:
+        versions = db.query(
+            GradeMappingVersion.effective_from, GradeMappingVersion.id, GradeMappingVersion.revision
+        ).order_by(GradeMappingVersion.effective_from, GradeMappingVersion.id).all()
+        with self._lock:
+            self._versions = [(effective_from, version_id) for effective_from, version_id, _ in versions]
+            self._revisions = {version_id: revision for _, version_id, revision in versions}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def get(self, db: Session, version_id: int) -> Optional[GradeTable]:
+        table = self._tables.get(version_id)
+        if table is None or table.revision < self._revisions.get(version_id, table.revision):
+            version = db.query(GradeMappingVersion).filter(GradeMappingVersion.id == version_id).first()
+            if not version:
+                return None
+            mappings = db.query(GradeMapping.grade, GradeMapping.points).filter(GradeMapping.version_id == version_id).all()
+            table = GradeTable(
+                version_id=version.id,
+                revision=version.revision,
+                effective_from=version.effective_from,
+                points=MappingProxyType({grade: points for grade, points in mappings}),
+            )
+            with self._lock:
+                self._tables[version_id] = table
+        return table
+
+    def at(self, db: Session, when: datetime) -> Optional[GradeTable]:
+        """
+        The grade table in force at the given (timezone-aware) time.
+        """
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+            self._refresh(db)
+        versions = self._versions
+        i = bisect_right(versions, (when, float("inf")))
+        if i == 0:
+            return None
+        return self.get(db, versions[i - 1][1])
+
+    def current(self, db: Session) -> Optional[GradeTable]:
+        return self.at(db, datetime.now(timezone.utc))
+
+    def current_for_write(self, db: Session) -> Optional[GradeTable]:
+        """
+        The grade table in force now, checked against the database with one
+        indexed query. Use when recording grades: a version created or corrected
+        on another worker within the refresh interval would otherwise be missed,
+        and the grades written would keep the superseded points.
+        """
+        head = db.query(GradeMappingVersion.id, GradeMappingVersion.revision).filter(
+            GradeMappingVersion.effective_from <= datetime.now(timezone.utc)
+        ).order_by(GradeMappingVersion.effective_from.desc(), GradeMappingVersion.id.desc()).first()
+        table = self.current(db)
+        cached = (table.version_id, table.revision) if table else None
+        if cached != (tuple(head) if head else None):
+            self.invalidate()
+            table = self.current(db)
+        return table
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "versions": len(self._versions),
+            "tables_loaded": len(self._tables),
+            "refresh_interval_seconds": self.refresh_interval,
+        }
+
+grade_tables = GradeTableCache(refresh_interval=settings.GRADE_VERSION_REFRESH_SECONDS)
+
+def create_mapping_version(db: Session, points: Mapping[str, float], effective_from: Optional[datetime] = None) -> GradeMappingVersion:
+    """
+    Add a new mapping version. The caller commits, then calls grade_tables.invalidate().
+    """
+    version = GradeMappingVersion(effective_from=effective_from or datetime.now(timezone.utc))
+    version.mappings = [GradeMapping(grade=grade, points=value) for grade, value in points.items()]
+    db.add(version)
+    db.flush()
+    return version
+
+def apply_grades(db: Session, model: Type, grades: Mapping[int, Tuple[str, float]], version_id: Optional[int]) -> None:
+    """
+    Set grade, grade_point and grade_mapping_version_id on Registration or
+    Compartment rows from {id: (grade, grade_point)} with a single
+    UPDATE ... FROM (VALUES ...) statement.
+    """
+    table = model.__table__
+    rows = [(row_id, grade, grade_point) for row_id, (grade, grade_point) in grades.items()]
+    for i in range(0, len(rows), ROWS_PER_STATEMENT):
+        data = values(
+            column("id", Integer), column("grade", String), column("grade_point", Float),
+            name="grades",
+        ).data(rows[i:i + ROWS_PER_STATEMENT])
+        db.execute(
+            update(table)
+            .where(table.c.id == data.c.id)
+            .values(grade=data.c.grade, grade_point=data.c.grade_point, grade_mapping_version_id=version_id)
+        )
@@ -0,0 +1,90 @@
+from typing import Any, Dict, Iterable, Tuple
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.history import AcademicHistoryVersion
+from app.services.gpa import refresh_student_gpa
+
+class AcademicHistoryCache:
+    """
+    Serialized academic histories keyed by (student_id, version).
+
+    Every write path that can change a student's history bumps the student's row
+    in academichistoryversion. Versions are cached briefly per process so repeat
+    reads need no SQL at all; writes in this process drop the cached version on
+    commit, other workers see the new version once the version TTL expires.
+    """
+
+    def __init__(self):
+        self._versions = TTLCache(
+            maxsize=settings.HISTORY_VERSION_CACHE_SIZE,
+            ttl=settings.HISTORY_VERSION_CACHE_TTL_SECONDS,
+        )
+        self._bodies = TTLCache(
+            maxsize=settings.HISTORY_BODY_CACHE_SIZE,
+            ttl=settings.HISTORY_BODY_CACHE_TTL_SECONDS,
+        )
+
+    def get_version(self, db: Session, student_id: str) -> int:
+        version = self._versions.get(student_id)
+        if version is None:
+            row = db.get(AcademicHistoryVersion, student_id)
+            # Students never written since this table existed are at version 0
+            version = row.version if row else 0
+            self._versions.set(student_id, version)
+        return version
+
+    def get(self, db: Session, student_id: str) -> Tuple[str, bytes]:
+        """
+        ETag and JSON body of the student's academic history.
+        """
+        # Read the version before the history, so a concurrent write can only
+        # ever make the cached body newer than its version, never older.
+        version = self.get_version(db, student_id)
+        etag = f'"{student_id}-{version}"'
+        body = self._bodies.get((student_id, version))
+        if body is None:
+            from app.services.academic import get_student_academic_history
+            body = get_student_academic_history(db, student_id).model_dump_json().encode("utf-8")
+            self._bodies.set((student_id, version), body)
+        return etag, body
+
+    def invalidate(self, student_ids: Iterable[str]) -> None:
+        for student_id in student_ids:
+            self._versions.invalidate(student_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "versions": self._versions.stats(),
+            "bodies": self._bodies.stats(),
+        }
+
+academic_history_cache = AcademicHistoryCache()
+
+def bump_history_version(db: Session, student_ids: Iterable[str]) -> None:
+    """
+    Mark the students' academic histories as changed, inside the caller's transaction.
+    """
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return
+    stmt = pg_insert(AcademicHistoryVersion).values([
+        {"student_id": student_id, "version": 1} for student_id in student_ids
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[AcademicHistoryVersion.student_id],
+        set_={"version": AcademicHistoryVersion.version + 1, "updated_at": func.now()},
+    ))
+    event.listen(db, "after_commit", lambda session: academic_history_cache.invalidate(student_ids), once=True)
+
+def record_history_change(db: Session, student_ids: Iterable[str]) -> None:
+    """
+    Refresh the materialized GPA rows and bump the history version of students
+    whose registrations, grades or compartments, or the courses and semesters
+    behind them, changed. Call before commit.
+    """
+    student_ids = set(student_ids)
+    refresh_student_gpa(db, student_ids)
+    bump_history_version(db, student_ids)
@@ -0,0 +1,197 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, String, column, exists, func, select, text, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.copy import copy_rows
+from app.models.academic import Semester
+from app.models.course import CourseOffering
+from app.models.examination import Compartment, Registration
+
+# Semesters and offerings are resolved like semester_ids_by_name()
+_RESOLVED_REGISTRATIONS = """
+    SELECT s.row_idx, s.student_id, s.course_code, s.semester,
+           sem.id AS semester_id, o.id AS offering_id, u.id AS user_id
+    FROM registration_staging s
+    LEFT JOIN (SELECT name, min(id) AS id FROM semester GROUP BY name) sem
+           ON sem.name = s.semester
+    LEFT JOIN (SELECT course_code, semester_id, min(id) AS id FROM courseoffering GROUP BY course_code, semester_id) o
+           ON o.course_code = s.course_code AND o.semester_id = sem.id
+    LEFT JOIN "user" u ON u.id = s.student_id
+"""
+
+def semester_ids_by_name(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Map semester name -> id. Semester names, like (course, semester) offering
+    pairs, are not unique in the schema; should duplicates exist, the lowest id
+    is used everywhere uploads resolve them.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    return dict(db.execute(
+        select(Semester.name, func.min(Semester.id))
+        .where(Semester.name.in_(names))
+        .group_by(Semester.name)
+    ).all())
+
+def ingest_registrations(db: Session, rows: Iterable[Tuple[int, str, str, str]]) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """
+    Insert registrations for (row_idx, student_id, course_code, semester_name)
+    rows in a fixed number of statements: COPY into a temporary staging table,
+    one anti-join query for rows that cannot be resolved, and one
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING for the rest.
+
+    Returns the student ids of the registrations created (one per row inserted)
+    and (row_idx, message) errors. Already existing registrations are skipped
+    silently.
+    """
+    db.execute(text("""
+        CREATE TEMPORARY TABLE registration_staging (
+            row_idx integer NOT NULL,
+            student_id text NOT NULL,
+            course_code text NOT NULL,
+            semester text NOT NULL
+        ) ON COMMIT DROP
+    """))
+    copy_rows(db, "registration_staging", ("row_idx", "student_id", "course_code", "semester"), rows)
+    db.execute(text("ANALYZE registration_staging"))
+
+    errors: List[Tuple[int, str]] = []
+    unresolved = db.execute(text(
+        _RESOLVED_REGISTRATIONS + " WHERE sem.id IS NULL OR o.id IS NULL OR u.id IS NULL ORDER BY s.row_idx"
+    ))
+    for row in unresolved:
+        if row.semester_id is None:
+            errors.append((row.row_idx, f"Semester '{row.semester}' not found"))
+        elif row.offering_id is None:
+            errors.append((row.row_idx, f"Course offering not found for {row.course_code} in semester {row.semester_id}"))
+        else:
+            errors.append((row.row_idx, f"Student {row.student_id} not found"))
+
+    created = db.execute(text(f"""
+        INSERT INTO registration (student_id, course_offering_id)
+        SELECT DISTINCT r.student_id, r.offering_id
+        FROM ({_RESOLVED_REGISTRATIONS}) r
+        WHERE r.offering_id IS NOT NULL AND r.user_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM registration e
+              WHERE e.student_id = r.student_id AND e.course_offering_id = r.offering_id
+          )
+        ON CONFLICT DO NOTHING
+        RETURNING student_id
+    """)).scalars().all()
+    return created, errors
+
+def register_compartments(db: Session, rows: Iterable[Tuple[int, str, str, str]]) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """
+    Register (row_idx, student_id, course_code, semester_name) rows for
+    compartment examinations. Semesters and offerings are resolved from two
+    preloaded indexes, registration and existing compartment checks are one
+    query over all candidate pairs, and the compartments are created with one
+    INSERT ... ON CONFLICT DO NOTHING.
+
+    Returns the student ids of the compartments created and (row_idx, message)
+    errors, with the same messages as the per-row implementation.
+    """
+    rows = list(rows)
+    errors: List[Tuple[int, str]] = []
+
+    semesters = semester_ids_by_name(db, (semester_name for _, _, _, semester_name in rows))
+    course_codes = {course_code for _, _, course_code, _ in rows}
+    offerings: Dict[Tuple[str, int], int] = {
+        (course_code, semester_id): offering_id
+        for course_code, semester_id, offering_id in db.execute(
+            select(CourseOffering.course_code, CourseOffering.semester_id, func.min(CourseOffering.id))
+            .where(CourseOffering.course_code.in_(course_codes), CourseOffering.semester_id.in_(set(semesters.values())))
+            .group_by(CourseOffering.course_code, CourseOffering.semester_id)
+        )
+    } if semesters else {}
+
+    candidates: List[Tuple[int, str, str, int]] = []
+    for row_idx, student_id, course_code, semester_name in rows:
+        semester_id = semesters.get(semester_name)
+        if semester_id is None:
+            errors.append((row_idx, f"Semester '{semester_name}' not found"))
+            continue
+        offering_id = offerings.get((course_code, semester_id))
+        if offering_id is None:
+            errors.append((row_idx, f"Course offering not found for {course_code} in semester {semester_name}"))
+            continue
+        candidates.append((row_idx, student_id, course_code, offering_id))
+
+    status: Dict[Tuple[str, int], Tuple[bool, bool]] = {}
+    pairs = list({(student_id, offering_id) for _, student_id, _, offering_id in candidates})
+    if pairs:
+        pair_values = values(
+            column("student_id", String), column("course_offering_id", Integer), name="pairs",
+        ).data(pairs)
+        registered = exists().where(
+            Registration.student_id == pair_values.c.student_id,
+            Registration.course_offering_id == pair_values.c.course_offering_id,
+        )
+        has_compartment = exists().where(
+            Compartment.student_id == pair_values.c.student_id,
+            Compartment.course_offering_id == pair_values.c.course_offering_id,
+        )
+        for student_id, offering_id, is_registered, is_compartment in db.execute(select(
+            pair_values.c.student_id, pair_values.c.course_offering_id, registered, has_compartment,
+        )):
+            status[(student_id, offering_id)] = (is_registered, is_compartment)
+
+    new_pairs = set()
+    for row_idx, student_id, course_code, offering_id in candidates:
+        is_registered, is_compartment = status[(student_id, offering_id)]
+        if not is_registered:
+            errors.append((row_idx, f"Student {student_id} not registered for course {course_code}"))
+        elif is_compartment or (student_id, offering_id) in new_pairs:
+            errors.append((row_idx, f"Student {student_id} already registered for compartment in {course_code}"))
+        else:
+            new_pairs.add((student_id, offering_id))
+
+    created: List[str] = []
+    if new_pairs:
+        created = db.execute(
+            insert(Compartment)
+            .values([{"student_id": student_id, "course_offering_id": offering_id} for student_id, offering_id in new_pairs])
+            .on_conflict_do_nothing(index_elements=[Compartment.student_id, Compartment.course_offering_id])
+            .returning(Compartment.student_id)
+        ).scalars().all()
+    return created, sorted(errors)
+
+def enroll_failing_students(
+    db: Session,
+    semester_id: int,
+    threshold: float,
+    course_codes: Optional[Sequence[str]] = None,
+    dry_run: bool = False,
+) -> List[str]:
+    """
+    Register every registration in a semester (optionally only some courses)
+    with grade_point below threshold for its compartment examination, with one
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING. Students who already have a
+    compartment for the offering are skipped.
+
+    Returns the student ids enrolled, one per compartment; with dry_run, those
+    that would be enrolled, without writing anything.
+    """
+    failing = (
+        select(Registration.student_id, Registration.course_offering_id)
+        .join(CourseOffering, CourseOffering.id == Registration.course_offering_id)
+        .where(CourseOffering.semester_id == semester_id, Registration.grade_point < threshold)
+    )
+    if course_codes:
+        failing = failing.where(CourseOffering.course_code.in_(course_codes))
+
+    if dry_run:
+        return db.execute(failing.where(~exists().where(
+            Compartment.student_id == Registration.student_id,
+            Compartment.course_offering_id == Registration.course_offering_id,
+        ))).scalars().all()
+    return db.execute(
+        insert(Compartment)
+        .from_select(["student_id", "course_offering_id"], failing)
+        .on_conflict_do_nothing(index_elements=[Compartment.student_id, Compartment.course_offering_id])
+        .returning(Compartment.student_id)
+    ).scalars().all()
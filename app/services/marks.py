@@ -0,0 +1,104 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.copy import ROWS_PER_STATEMENT
+from app.models.examination import Examination, Marks, Registration
+
+
+def load_registrations(db: Session, offering_id: int, student_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Map student_id -> registration id for an offering in one query. A student
+    registered twice maps to the lower registration id.
+    """
+    query = select(Registration.student_id, Registration.id).where(Registration.course_offering_id == offering_id)
+    if student_ids is not None:
+        query = query.where(Registration.student_id.in_(list(student_ids)))
+    registrations: Dict[str, int] = {}
+    for student_id, registration_id in db.execute(query.order_by(Registration.id.desc())):
+        registrations[student_id] = registration_id
+    return registrations
+
+def load_examinations(db: Session, offering_id: int) -> Dict[str, Examination]:
+    exams = db.query(Examination).filter(Examination.course_offering_id == offering_id).all()
+    return {exam.name: exam for exam in exams}
+
+def upsert_marks(db: Session, cells: Mapping[Tuple[int, int], float]) -> None:
+    """
+    Write {(registration_id, examination_id): marks_obtained} with a multi-row
+    INSERT ... ON CONFLICT DO UPDATE on the (registration_id, examination_id)
+    unique constraint.
+    """
+    values = [
+        {"registration_id": registration_id, "examination_id": examination_id, "marks_obtained": marks_obtained}
+        for (registration_id, examination_id), marks_obtained in cells.items()
+    ]
+    for i in range(0, len(values), ROWS_PER_STATEMENT):
+        stmt = insert(Marks).values(values[i:i + ROWS_PER_STATEMENT])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Marks.registration_id, Marks.examination_id],
+            set_={"marks_obtained": stmt.excluded.marks_obtained},
+        )
+        db.execute(stmt)
+
+def apply_marks_sheet(db: Session, offering_id: int, rows: Iterable[Dict[str, Optional[str]]]) -> Dict[str, Any]:
+    """
+    Validate a marks sheet (one row per student, one column per examination name)
+    against the offering's registrations and examinations, all loaded up front,
+    then write every valid cell with upsert_marks().
+
+    Empty cells are skipped. When a student appears more than once, the last
+    value for each examination wins.
+    """
+    registrations = load_registrations(db, offering_id)
+    exams = load_examinations(db, offering_id)
+
+    cells: Dict[Tuple[int, int], float] = {}
+    marks_updated = 0
+    exams_processed = set()
+    errors: List[str] = []
+
+    for row_idx, row in enumerate(rows):
+        student_id = (row.get('student_id') or '').strip()
+        if not student_id:
+            errors.append(f"Row {row_idx}: Missing student_id")
+            continue
+
+        registration_id = registrations.get(student_id)
+        if registration_id is None:
+            errors.append(f"Row {row_idx}: Registration not found for student {student_id}")
+            continue
+
+        for key, value in row.items():
+            # Cells beyond the header row are collected under a None key by DictReader
+            if key == 'student_id' or not key or not isinstance(value, str):
+                continue
+
+            exam_name = key.strip()
+            val_str = value.strip()
+            if not val_str:
+                continue # Skip empty values
+
+            try:
+                marks_obtained = float(val_str)
+            except ValueError:
+                errors.append(f"Row {row_idx}: Invalid marks '{val_str}' for {exam_name}")
+                continue
+
+            exam = exams.get(exam_name)
+            if exam is None:
+                errors.append(f"Row {row_idx}: Examination {exam_name} not found")
+                continue
+
+            exams_processed.add(exam_name)
+            cells[(registration_id, exam.id)] = marks_obtained
+            marks_updated += 1
+
+    upsert_marks(db, cells)
+    return {
+        "marks_updated": marks_updated,
+        "exams_processed": list(exams_processed),
+        "errors": errors,
+    }
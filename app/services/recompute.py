@@ -0,0 +1,224 @@
+from typing import Any, Dict, List, Mapping
+
+import numpy as np
+from sqlalchemy import select, update, delete, insert, bindparam
+from sqlalchemy.orm import Session
+
+from app.models.academic import Semester
+from app.models.course import Course, CourseOffering
+from app.models.examination import GradeMapping, GradeMappingVersion, Registration, Compartment as CompartmentRegistration
+from app.models.gpa import StudentSemesterGPA
+from app.services.gpa import latest_compartment_clause, lock_student_gpa, refresh_student_gpa
+from app.services.history import bump_history_version
+
+class GradeRows:
+    """
+    Column arrays, one element per registration of the affected students.
+    Missing grade points are NaN.
+    """
+
+    def __init__(self, rows: List[tuple]):
+        (student_ids, semester_ids, semester_starts, credits,
+         reg_grades, reg_points, reg_versions,
+         comp_grades, comp_points, comp_versions) = zip(*rows) if rows else ([],) * 10
+        self.student_ids = np.array(student_ids, dtype=object)
+        self.semester_ids = np.array(semester_ids, dtype=np.int64)
+        self.semester_starts = np.array(semester_starts, dtype="datetime64[D]")
+        self.credits = np.array(credits, dtype=np.float64)
+        self.reg_grades = np.array(reg_grades, dtype=object)
+        self.reg_points = np.array(reg_points, dtype=np.float64)
+        self.reg_versions = np.array([v if v is not None else -1 for v in reg_versions], dtype=np.int64)
+        self.has_comp = np.array([g is not None or p is not None for g, p in zip(comp_grades, comp_points)], dtype=bool)
+        self.comp_grades = np.array(comp_grades, dtype=object)
+        self.comp_points = np.array(comp_points, dtype=np.float64)
+        self.comp_versions = np.array([v if v is not None else -1 for v in comp_versions], dtype=np.int64)
+
+def _corrected(points: np.ndarray, grades: np.ndarray, versions: np.ndarray, version_id: int, corrections: Mapping[str, float]) -> np.ndarray:
+    points = points.copy()
+    in_version = versions == version_id
+    for grade, value in corrections.items():
+        points[in_version & (grades == grade)] = value
+    return points
+
+def compute_gpa(rows: GradeRows, reg_points: np.ndarray, comp_points: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per (student, semester) credits, weighted points, SGPA and running CGPA,
+    with the same rules as the academic history. Groups come out sorted by
+    student, then semester start.
+    """
+    effective = np.where(np.isnan(comp_points), reg_points, comp_points)
+    graded = ~np.isnan(effective)
+    attempted = np.where(graded, rows.credits, 0.0)
+    weighted = np.where(graded, effective * rows.credits, 0.0)
+
+    students, student_idx = np.unique(rows.student_ids, return_inverse=True)
+    # Order semesters chronologically (ties broken by id) and number them
+    semester_keys, semester_idx = np.unique(
+        np.rec.fromarrays([rows.semester_starts, rows.semester_ids]), return_inverse=True
+    )
+    group_keys, group_idx = np.unique(student_idx * len(semester_keys) + semester_idx, return_inverse=True)
+
+    group_attempted = np.bincount(group_idx, weights=attempted, minlength=len(group_keys))
+    group_weighted = np.bincount(group_idx, weights=weighted, minlength=len(group_keys))
+    group_student = group_keys // len(semester_keys)
+    group_semester = semester_keys[group_keys % len(semester_keys)]
+
+    # Running sums restart at each student's first group
+    first = np.r_[True, group_student[1:] != group_student[:-1]]
+    first_idx = np.maximum.accumulate(np.where(first, np.arange(len(group_keys)), 0))
+    cum_attempted = np.cumsum(group_attempted)
+    cum_weighted = np.cumsum(group_weighted)
+    cum_attempted -= (cum_attempted - group_attempted)[first_idx]
+    cum_weighted -= (cum_weighted - group_weighted)[first_idx]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sgpa = np.where(group_attempted > 0, group_weighted / group_attempted, np.nan)
+        cgpa = np.where(cum_attempted > 0, cum_weighted / cum_attempted, np.nan)
+
+    return {
+        "student_id": students[group_student],
+        "semester_id": group_semester["f1"],
+        "semester_start": group_semester["f0"],
+        "credits_attempted": group_attempted,
+        "weighted_points": group_weighted,
+        "sgpa": sgpa,
+        "cumulative_credits": cum_attempted,
+        "cumulative_points": cum_weighted,
+        "cgpa": cgpa,
+        "is_last": np.r_[group_student[1:] != group_student[:-1], True] if len(group_keys) else np.zeros(0, dtype=bool),
+    }
+
+def _final_cgpa(gpa: Dict[str, np.ndarray]) -> Dict[str, float]:
+    last = gpa["is_last"]
+    return dict(zip(gpa["student_id"][last], gpa["cgpa"][last]))
+
+def _affected_students(db: Session, version_id: int, grades: List[str]) -> List[str]:
+    return db.scalars(
+        select(Registration.student_id)
+        .where(Registration.grade_mapping_version_id == version_id, Registration.grade.in_(grades))
+        .union(
+            select(CompartmentRegistration.student_id)
+            .where(CompartmentRegistration.grade_mapping_version_id == version_id, CompartmentRegistration.grade.in_(grades))
+        )
+    ).all()
+
+def _load_rows(db: Session, student_ids: List[str]) -> GradeRows:
+    query = (
+        select(
+            Registration.student_id,
+            Semester.id,
+            Semester.start_date,
+            Course.lecture_credits + Course.tutorial_credits + 0.5 * Course.practice_credits,
+            Registration.grade,
+            Registration.grade_point,
+            Registration.grade_mapping_version_id,
+            CompartmentRegistration.grade,
+            CompartmentRegistration.grade_point,
+            CompartmentRegistration.grade_mapping_version_id,
+        )
+        .join(CourseOffering, CourseOffering.id == Registration.course_offering_id)
+        .join(Semester, Semester.id == CourseOffering.semester_id)
+        .join(Course, Course.code == CourseOffering.course_code)
+        .outerjoin(CompartmentRegistration, latest_compartment_clause())
+        .where(Registration.student_id.in_(student_ids))
+    )
+    return GradeRows(db.execute(query).all())
+
+def correct_mapping_version(db: Session, version: GradeMappingVersion, corrections: Mapping[str, float], dry_run: bool = True) -> Dict[str, Any]:
+    """
+    Correct the points of grades in an existing mapping version and recompute
+    everything derived from them: grade points of registrations and compartments
+    graded under the version, and the SGPA/CGPA of every affected student.
+
+    With dry_run nothing is written; the result reports how CGPAs would change.
+    Otherwise the caller commits.
+    """
+    grades = list(corrections)
+    affected = _affected_students(db, version.id, grades)
+    if not dry_run:
+        # Taken before reading grades: a grade write committed after the read
+        # would otherwise be overwritten by the GPA rows computed from it
+        lock_student_gpa(db, affected)
+    rows = _load_rows(db, affected)
+
+    new_reg_points = _corrected(rows.reg_points, rows.reg_grades, rows.reg_versions, version.id, corrections)
+    new_comp_points = _corrected(rows.comp_points, rows.comp_grades, rows.comp_versions, version.id, corrections)
+    old_cgpa = _final_cgpa(compute_gpa(rows, rows.reg_points, rows.comp_points))
+    new_gpa = compute_gpa(rows, new_reg_points, new_comp_points)
+    new_cgpa = _final_cgpa(new_gpa)
+
+    student_ids = list(new_cgpa)
+    old = np.array([old_cgpa.get(s, np.nan) for s in student_ids], dtype=np.float64)
+    new = np.array([new_cgpa[s] for s in student_ids], dtype=np.float64)
+    delta = np.nan_to_num(new, nan=0.0) - np.nan_to_num(old, nan=0.0)
+    # Only changes visible at the two decimals CGPA is shown with
+    changed = np.abs(np.round(np.nan_to_num(new), 2) - np.round(np.nan_to_num(old), 2)) > 0
+    order = np.argsort(-np.abs(delta))[:20]
+
+    summary = {
+        "version_id": version.id,
+        "dry_run": dry_run,
+        "corrections": dict(corrections),
+        "registrations_affected": int(np.count_nonzero((new_reg_points != rows.reg_points) & ~np.isnan(new_reg_points))),
+        "compartments_affected": int(np.count_nonzero((new_comp_points != rows.comp_points) & ~np.isnan(new_comp_points))),
+        "students_affected": len(student_ids),
+        "cgpa_changed": int(np.count_nonzero(changed)),
+        "max_increase": round(float(delta.max()), 4) if len(delta) and delta.max() > 0 else 0.0,
+        "max_decrease": round(float(-delta.min()), 4) if len(delta) and delta.min() < 0 else 0.0,
+        "mean_abs_change": round(float(np.abs(delta).mean()), 4) if len(delta) else 0.0,
+        "largest_changes": [
+            {
+                "student_id": student_ids[i],
+                "old_cgpa": None if np.isnan(old[i]) else round(float(old[i]), 2),
+                "new_cgpa": None if np.isnan(new[i]) else round(float(new[i]), 2),
+                "delta": round(float(delta[i]), 4),
+            }
+            for i in order if delta[i] != 0
+        ],
+    }
+    if dry_run:
+        return summary
+
+    # Grade points: one Core UPDATE per table, executed for each corrected grade
+    params = [{"g": grade, "p": points} for grade, points in corrections.items()]
+    for table in (Registration.__table__, CompartmentRegistration.__table__):
+        db.execute(
+            update(table)
+            .where(table.c.grade_mapping_version_id == version.id, table.c.grade == bindparam("g"))
+            .values(grade_point=bindparam("p")),
+            params,
+        )
+    mappings = GradeMapping.__table__
+    db.execute(
+        update(mappings)
+        .where(mappings.c.version_id == version.id, mappings.c.grade == bindparam("g"))
+        .values(points=bindparam("p")),
+        params,
+    )
+    version.revision += 1
+
+    # GPA rows computed above replace the materialized ones in bulk
+    if student_ids:
+        db.execute(delete(StudentSemesterGPA).where(StudentSemesterGPA.student_id.in_(student_ids)))
+        db.execute(insert(StudentSemesterGPA), [
+            {
+                "student_id": new_gpa["student_id"][i],
+                "semester_id": int(new_gpa["semester_id"][i]),
+                "semester_start": new_gpa["semester_start"][i].item(),
+                "credits_attempted": float(new_gpa["credits_attempted"][i]),
+                "weighted_points": float(new_gpa["weighted_points"][i]),
+                "sgpa": None if np.isnan(new_gpa["sgpa"][i]) else float(new_gpa["sgpa"][i]),
+                "cumulative_credits": float(new_gpa["cumulative_credits"][i]),
+                "cumulative_points": float(new_gpa["cumulative_points"][i]),
+                "cgpa": None if np.isnan(new_gpa["cgpa"][i]) else float(new_gpa["cgpa"][i]),
+            }
+            for i in range(len(new_gpa["student_id"]))
+        ])
+        bump_history_version(db, student_ids)
+    # Students first graded under this version since the lock was taken had
+    # their grade points corrected above; recompute their GPA in SQL
+    late = set(_affected_students(db, version.id, grades)) - set(affected)
+    if late:
+        refresh_student_gpa(db, late)
+        bump_history_version(db, late)
+    return summary
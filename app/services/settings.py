@@ -1,9 +1,10 @@
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from app.models.setting import SystemSetting
-from app.models.user import User, UserRole
+from app.core.principal import Principal
+from app.models.user import UserRole
 
-def check_grade_submission_deadline(db: Session, user: User) -> None:
+def check_grade_submission_deadline(db: Session, user: Principal) -> None:
     """
     Check if the current date is before the grade submission deadline.
     Only checks for TEACHER role (Admin overrides).
@@ -26,7 +27,7 @@ def check_grade_submission_deadline(db: Session, user: User) -> None:
         # Ignore parse errors? Or block? Safe to ignore if format is bad, but admin should ensure format.
         pass
 
-def check_compartment_submission_deadline(db: Session, user: User) -> None:
+def check_compartment_submission_deadline(db: Session, user: Principal) -> None:
     """
     Check if the current date is before the compartment submission deadline.
     Only checks for TEACHER role.
@@ -0,0 +1,59 @@
+from datetime import date
+
+from app.services.academic import build_academic_history
+
+def _row(offering_id, grade, points, semester_id, start_date, code, lecture=3, tutorial=0, practice=0):
+    return (
+        "EMT01", offering_id, grade, points,
+        semester_id, f"Semester {semester_id}", start_date,
+        code, f"Course {code}", lecture, tutorial, practice,
+    )
+
+def test_empty_history():
+    history = build_academic_history("EMT01", "Student", None, None, [], {})
+    assert history.semesters == []
+    assert history.cgpa == 0.0
+
+def test_sgpa_cgpa_and_semester_order():
+    rows = [
+        _row(1, "A", 10.0, 1, date(2021, 1, 1), "C1", lecture=3, tutorial=1),
+        _row(2, "C", 6.0, 1, date(2021, 1, 1), "C2", lecture=2, practice=2),
+        _row(3, "B", 8.0, 2, date(2021, 7, 1), "C3", lecture=4),
+    ]
+    history = build_academic_history("EMT01", "Student", "CS", "Computer Science", rows, {})
+
+    assert [semester.semester_id for semester in history.semesters] == [2, 1]
+    first = history.semesters[1]
+    assert [course.credits for course in first.courses] == [4.0, 3.0]
+    assert first.sgpa == round((10 * 4 + 6 * 3) / 7, 2)
+    assert history.semesters[0].sgpa == 8.0
+    assert history.cgpa == round((10 * 4 + 6 * 3 + 8 * 4) / 11, 2)
+    assert history.discipline_name == "Computer Science"
+
+def test_compartment_overrides_original_grade():
+    rows = [
+        _row(1, "F", 0.0, 1, date(2021, 1, 1), "C1"),
+        _row(2, "A", 10.0, 1, date(2021, 1, 1), "C2"),
+    ]
+    history = build_academic_history("EMT01", "Student", None, None, rows, {1: ("C", 6.0)})
+
+    failed, passed = history.semesters[0].courses
+    assert failed.original_grade == "F"
+    assert failed.compartment_grade == "C"
+    assert failed.course_grade == "C"
+    assert failed.grade_point == 6.0
+    assert passed.compartment_grade is None
+    assert history.cgpa == 8.0
+
+def test_ungraded_courses_do_not_count():
+    rows = [
+        _row(1, "A", 10.0, 1, date(2021, 1, 1), "C1"),
+        _row(2, None, None, 1, date(2021, 1, 1), "C2"),
+        _row(3, None, None, 2, date(2021, 7, 1), "C3"),
+    ]
+    history = build_academic_history("EMT01", "Student", None, None, rows, {})
+
+    assert history.semesters[0].sgpa is None
+    assert history.semesters[1].sgpa == 10.0
+    assert len(history.semesters[1].courses) == 2
+    assert history.cgpa == 10.0
@@ -0,0 +1,42 @@
+from sqlalchemy import select
+
+from app.models.examination import Compartment, Registration
+
+URL = "/api/v1/registrations/compartment/auto-enroll"
+
+def _failing(db, catalog):
+    db.add_all([
+        Registration(student_id="S0", course_offering_id=catalog["MA101"], grade="F", grade_point=0.0),
+        Registration(student_id="S1", course_offering_id=catalog["MA101"], grade="C", grade_point=6.0),
+        Registration(student_id="S1", course_offering_id=catalog["PH101"], grade="F", grade_point=0.0),
+        Registration(student_id="S2", course_offering_id=catalog["PH101"]),
+        Registration(student_id="S3", course_offering_id=catalog["CS201"], grade="F", grade_point=0.0),
+    ])
+    db.commit()
+
+def _compartments(db):
+    return sorted(db.execute(select(Compartment.student_id, Compartment.course_offering_id)).all())
+
+def test_dry_run_and_rerun(db, catalog, client):
+    _failing(db, catalog)
+
+    response = client.post(URL, params={"semester_id": 1, "dry_run": True})
+    assert response.json() == {"registered_count": 2, "threshold": 4.0, "dry_run": True}
+    assert _compartments(db) == []
+
+    assert client.post(URL, params={"semester_id": 1}).json()["registered_count"] == 2
+    assert _compartments(db) == [("S0", 1), ("S1", 2)]
+
+    # Already enrolled students are skipped
+    assert client.post(URL, params={"semester_id": 1}).json()["registered_count"] == 0
+    assert client.post(URL, params={"semester_id": 1, "dry_run": True}).json()["registered_count"] == 0
+
+def test_threshold_and_course_filter(db, catalog, client):
+    _failing(db, catalog)
+
+    response = client.post(URL, params={"semester_id": 1, "threshold": 7, "course_codes": ["MA101"]})
+    assert response.json()["registered_count"] == 2
+    assert _compartments(db) == [("S0", 1), ("S1", 1)]
+
+def test_unknown_semester(db, catalog, client):
+    assert client.post(URL, params={"semester_id": 9}).status_code == 404
@@ -0,0 +1,59 @@
+import time
+
+from app.core.cache import TTLCache
+
+def test_get_returns_default_for_missing_key():
+    cache = TTLCache(maxsize=2, ttl=60)
+    assert cache.get("a") is None
+    assert cache.get("a", 0) == 0
+    assert cache.misses == 2
+
+def test_set_then_get():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.hits == 1
+
+def test_entries_expire(monkeypatch):
+    cache = TTLCache(maxsize=2, ttl=10)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    monkeypatch.setattr(time, "monotonic", lambda: now + 10)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["size"] == 1
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_invalidate_and_clear():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.clear()
+    assert cache.get("b") is None
+
+def test_stats():
+    cache = TTLCache(maxsize=4, ttl=60)
+    assert cache.stats()["hit_ratio"] is None
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    stats = cache.stats()
+    assert stats["size"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
@@ -0,0 +1,96 @@
+from sqlalchemy import select, text
+
+from app.models.examination import Compartment, Registration
+from app.models.gpa import StudentSemesterGPA
+
+def _upload(client, url: str, content: str):
+    return client.post(url, files={"file": ("compartments.csv", content.encode("utf-8"), "text/csv")})
+
+def _register(client, content: str):
+    return _upload(client, "/api/v1/registrations/compartment/bulk", content)
+
+def _grade(client, content: str):
+    return _upload(client, "/api/v1/registrations/compartment/bulk-grades?course_code=MA101&semester_id=1", content)
+
+def _registered(db, catalog):
+    db.add_all([
+        Registration(student_id="S0", course_offering_id=catalog["MA101"], grade="F", grade_point=0.0),
+        Registration(student_id="S1", course_offering_id=catalog["MA101"], grade="F", grade_point=0.0),
+        Registration(student_id="S2", course_offering_id=catalog["PH101"], grade="A", grade_point=10.0),
+    ])
+    db.commit()
+
+def test_missing_columns_are_rejected(client):
+    response = _register(client, "student_id,course_code\nS0,MA101\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing required column: semester"
+
+def test_register_duplicate_and_bad_rows(db, catalog, client):
+    _registered(db, catalog)
+    response = _register(client, (
+        "student_id,course_code,semester\r\n"
+        "S0,MA101,Odd 2021\r\n"
+        "S0,MA101,Odd 2021\r\n"
+        "S2,MA101,Odd 2021\r\n"
+        "S1,MA101,\r\n"
+        "S1,MA101,Spring 1999\r\n"
+        "S1,CS201,Odd 2021\r\n"
+    ))
+    assert response.status_code == 200
+    assert response.json() == {
+        "registered_count": 1,
+        "errors": [
+            "Row 1: Student S0 already registered for compartment in MA101",
+            "Row 2: Student S2 not registered for course MA101",
+            "Row 3: Missing required fields",
+            "Row 4: Semester 'Spring 1999' not found",
+            "Row 5: Course offering not found for CS201 in semester Odd 2021",
+        ],
+    }
+
+    response = _register(client, "student_id,course_code,semester\nS0,MA101,Odd 2021\nS1,MA101,Odd 2021\n")
+    assert response.json() == {
+        "registered_count": 1,
+        "errors": ["Row 0: Student S0 already registered for compartment in MA101"],
+    }
+    assert sorted(db.scalars(select(Compartment.student_id))) == ["S0", "S1"]
+
+def test_grades_bad_rows_and_reupload(db, catalog, client):
+    _registered(db, catalog)
+    db.add(Compartment(student_id="S0", course_offering_id=catalog["MA101"]))
+    db.commit()
+
+    response = _grade(client, "student_id,grade\nS0,C\nS1,B\nS0,Z\n,A\nS0,B\n")
+    assert response.status_code == 200
+    assert response.json() == {
+        "updated_count": 2,
+        "errors": [
+            "Row 1: Compartment registration not found for student S1",
+            "Row 2: Invalid grade Z for student S0",
+            "Row 3: Missing student_id or grade",
+        ],
+    }
+    # A later row for the same student wins
+    compartment = db.scalars(select(Compartment)).one()
+    assert (compartment.grade, compartment.grade_point) == ("B", 8.0)
+    assert compartment.grade_mapping_version_id is not None
+    assert db.scalar(select(StudentSemesterGPA.sgpa).where(StudentSemesterGPA.student_id == "S0")) == 8.0
+
+    assert _grade(client, "student_id,grade\nS0,A\n").json() == {"updated_count": 1, "errors": []}
+    db.expire_all()
+    assert db.scalars(select(Compartment.grade)).one() == "A"
+    assert db.scalar(select(StudentSemesterGPA.sgpa).where(StudentSemesterGPA.student_id == "S0")) == 10.0
+
+def test_grades_go_to_the_compartment_in_effect(db, catalog, client):
+    # Databases from before the unique index may still hold duplicates
+    db.execute(text("ALTER TABLE compartment DROP CONSTRAINT compartment_student_id_course_offering_id_key"))
+    _registered(db, catalog)
+    db.add_all([
+        Compartment(id=1, student_id="S0", course_offering_id=catalog["MA101"]),
+        Compartment(id=2, student_id="S0", course_offering_id=catalog["MA101"]),
+    ])
+    db.commit()
+
+    assert _grade(client, "student_id,grade\nS0,A\n").json() == {"updated_count": 1, "errors": []}
+    assert db.execute(select(Compartment.id, Compartment.grade).order_by(Compartment.id)).all() == [(1, None), (2, "A")]
+    assert db.scalar(select(StudentSemesterGPA.sgpa).where(StudentSemesterGPA.student_id == "S0")) == 10.0
@@ -0,0 +1,70 @@
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from app.models.academic import Semester
+from app.models.course import Course, CourseCategory, CourseOffering
+from app.models.examination import Compartment, GradeMappingVersion, Registration
+from app.models.user import User
+from app.services.gpa import _rows_query
+from app.services.recompute import _affected_students, _load_rows, compute_gpa
+
+POINTS = {"A": 10.0, "B": 8.0, "C": 6.0, "F": 0.0}
+
+def _seed(db) -> int:
+    version = GradeMappingVersion(effective_from=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    db.add(version)
+    # Semester 3 starts before semester 2, so chronological and id order differ
+    db.add_all([
+        Semester(id=1, name="S1", start_date=date(2021, 1, 1), end_date=date(2021, 6, 1)),
+        Semester(id=2, name="S2", start_date=date(2022, 1, 1), end_date=date(2022, 6, 1)),
+        Semester(id=3, name="S3", start_date=date(2021, 7, 1), end_date=date(2021, 12, 1)),
+    ])
+    db.add_all([
+        Course(code=f"C{i}", name=f"Course {i}", category=list(CourseCategory)[0],
+               lecture_credits=3, tutorial_credits=i % 2, practice_credits=i % 3)
+        for i in range(6)
+    ])
+    db.add_all([User(id=f"S{i}", name=f"Student {i}", hashed_password="x") for i in range(4)])
+    db.flush()
+    db.add_all([CourseOffering(id=i + 1, course_code=f"C{i}", semester_id=i % 3 + 1) for i in range(6)])
+    db.flush()
+
+    grades = ["A", "B", "C", "F", None]
+    for s in range(4):
+        for o in range(1, 7):
+            if (s + o) % 5 == 0:
+                continue
+            grade = grades[(s * 7 + o) % len(grades)]
+            db.add(Registration(
+                student_id=f"S{s}", course_offering_id=o, grade=grade,
+                grade_point=POINTS.get(grade), grade_mapping_version_id=version.id,
+            ))
+    # Compartment grade points override the original ones, ungraded ones do not
+    db.add_all([
+        Compartment(student_id="S0", course_offering_id=4, grade="B", grade_point=8.0, grade_mapping_version_id=version.id),
+        Compartment(student_id="S1", course_offering_id=1, grade="C", grade_point=6.0, grade_mapping_version_id=version.id),
+        Compartment(student_id="S2", course_offering_id=2, grade=None, grade_point=None, grade_mapping_version_id=version.id),
+    ])
+    db.flush()
+    return version.id
+
+def test_compute_gpa_matches_sql_aggregate(db):
+    version_id = _seed(db)
+
+    rows = _load_rows(db, _affected_students(db, version_id, list(POINTS)))
+    gpa = compute_gpa(rows, rows.reg_points, rows.comp_points)
+    expected = db.execute(_rows_query().order_by("student_id", "semester_start", "semester_id")).all()
+
+    assert len(expected) == len(gpa["student_id"])
+    for i, (student_id, semester_id, semester_start, credits, weighted, sgpa, cum_credits, cum_points, cgpa) in enumerate(expected):
+        assert gpa["student_id"][i] == student_id
+        assert gpa["semester_id"][i] == semester_id
+        assert gpa["semester_start"][i].item() == semester_start
+        assert np.isclose(gpa["credits_attempted"][i], credits)
+        assert np.isclose(gpa["weighted_points"][i], weighted)
+        assert np.isclose(gpa["cumulative_credits"][i], cum_credits)
+        assert np.isclose(gpa["cumulative_points"][i], cum_points)
+        assert np.isclose(gpa["sgpa"][i], np.nan if sgpa is None else sgpa, equal_nan=True)
+        assert np.isclose(gpa["cgpa"][i], np.nan if cgpa is None else cgpa, equal_nan=True)
+    assert gpa["is_last"].sum() == 4
@@ -0,0 +1,53 @@
+from sqlalchemy import select
+
+from app.models.examination import GradeMappingVersion, Registration
+from app.models.gpa import StudentSemesterGPA
+
+URL = "/api/v1/registrations/bulk-upload-grades?course_code=MA101&semester_id=1"
+
+def _upload(client, content: str):
+    return client.post(URL, files={"file": ("grades.csv", content.encode("utf-8"), "text/csv")})
+
+def _registered(db, catalog):
+    db.add_all([
+        Registration(student_id="S0", course_offering_id=catalog["MA101"]),
+        Registration(student_id="S1", course_offering_id=catalog["MA101"]),
+        Registration(student_id="S2", course_offering_id=catalog["PH101"]),
+    ])
+    db.commit()
+
+def _grades(db):
+    return sorted(db.execute(
+        select(Registration.student_id, Registration.grade, Registration.grade_point, Registration.grade_mapping_version_id)
+        .where(Registration.course_offering_id == 1)
+    ).all())
+
+def test_bad_and_duplicate_rows(db, catalog, client):
+    _registered(db, catalog)
+    version_id = db.scalar(select(GradeMappingVersion.id))
+    response = _upload(client, "student_id,grade\nS0,A\nS1,Z\nS2,B\n,C\nS0,B\n")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["grades_updated"] == 2
+    assert body["errors"] == [
+        "Row 1: Invalid grade Z",
+        "Row 2: Registration not found for student S2",
+        "Row 3: Missing student_id or grade",
+    ]
+    # A later row for the same student wins
+    assert _grades(db) == [("S0", "B", 8.0, version_id), ("S1", None, None, None)]
+    assert db.scalar(select(StudentSemesterGPA.cgpa).where(StudentSemesterGPA.student_id == "S0")) == 8.0
+
+def test_reupload_regrades(db, catalog, client):
+    _registered(db, catalog)
+    _upload(client, "student_id,grade\nS0,A\nS1,C\n")
+    assert _upload(client, "student_id,grade\nS1,A\n").json()["errors"] == []
+    assert [(s, g) for s, g, _, _ in _grades(db)] == [("S0", "A"), ("S1", "A")]
+    assert db.scalar(select(StudentSemesterGPA.cgpa).where(StudentSemesterGPA.student_id == "S1")) == 10.0
+
+def test_unknown_offering(client, db, catalog):
+    response = client.post(
+        "/api/v1/registrations/bulk-upload-grades?course_code=MA101&semester_id=2",
+        files={"file": ("grades.csv", b"student_id,grade\n", "text/csv")},
+    )
+    assert response.status_code == 404
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.hashing import PasswordHasher
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=1, max_queue=1)
+    yield hasher
+    hasher.shutdown()
+
+def test_hash_and_verify(hasher):
+    hashed = asyncio.run(hasher.hash("secret"))
+    assert asyncio.run(hasher.verify("secret", hashed))
+    assert not hasher.verify_sync("wrong", hashed)
+    assert hasher.verify_sync("secret", hasher.hash_sync("secret"))
+    stats = hasher.stats()
+    assert (stats["completed"], stats["pending"], stats["rejected"]) == (5, 0, 0)
+    assert stats["hash_avg_ms"] > 0
+
+def test_rejects_beyond_workers_and_queue(hasher):
+    release = threading.Event()
+    running = hasher._submit(release.wait)
+    queued = hasher._submit(lambda: "queued")
+
+    with pytest.raises(HTTPException) as excinfo:
+        hasher.hash_sync("secret")
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+    assert hasher.stats()["rejected"] == 1
+
+    release.set()
+    assert running.result() and queued.result() == "queued"
+    # Capacity frees up once the outstanding work finishes
+    assert hasher.verify_sync("secret", hasher.hash_sync("secret"))
+    assert hasher.stats()["pending"] == 0
+
+def test_hash_many_keeps_input_order(hasher, monkeypatch):
+    from app.core import security
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "BULK_HASH_PROCESSES", 2)
+    monkeypatch.setattr(settings, "BULK_HASH_BATCH_SIZE", 2)
+    passwords = ["one", "two", "three", "four", "five"]
+
+    assert asyncio.run(hasher.hash_many([])) == []
+    assert hasher._process_pool is None
+
+    hashed = asyncio.run(hasher.hash_many(passwords))
+    assert len(hashed) == len(passwords)
+    assert all(security.verify_password(p, h) for p, h in zip(passwords, hashed))
+    assert hasher.stats()["completed"] == 0
@@ -0,0 +1,59 @@
+from sqlalchemy import select
+
+from app.models.discipline import Discipline
+from app.models.examination import Registration
+from app.models.user import User
+
+URL = "/api/v1/users/S0/academic-history"
+
+def _history(db, catalog):
+    db.add(Discipline(code="CS", name="Computer Science"))
+    db.flush()
+    db.get(User, "S0").discipline_code = "CS"
+    db.add(Registration(student_id="S0", course_offering_id=catalog["MA101"], grade="A", grade_point=10.0))
+    db.commit()
+
+def test_etag_and_not_modified(db, catalog, client):
+    _history(db, catalog)
+
+    response = client.get(URL)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.json()["cgpa"] == 10.0
+
+    assert client.get(URL, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(URL, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get(URL, headers={"If-None-Match": '"S0-999"'}).status_code == 200
+
+def test_grade_change_changes_etag(db, catalog, client):
+    _history(db, catalog)
+    etag = client.get(URL).headers["ETag"]
+
+    registration_id = db.scalars(select(Registration.id)).one()
+    response = client.put(f"/api/v1/registrations/{registration_id}/grade", json={"grade": "B"})
+    assert response.status_code == 200
+
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["cgpa"] == 8.0
+
+def test_discipline_rename_changes_etag(db, catalog, client):
+    _history(db, catalog)
+    etag = client.get(URL).headers["ETag"]
+
+    assert client.put("/api/v1/disciplines/CS", json={"name": "Computing"}).status_code == 200
+
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["discipline_name"] == "Computing"
+
+def test_course_edit_changes_etag(db, catalog, client):
+    _history(db, catalog)
+    etag = client.get(URL).headers["ETag"]
+
+    assert client.put("/api/v1/courses/MA101", json={"tutorial_credits": 2}).status_code == 200
+
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["semesters"][0]["courses"][0]["credits"] == 5.0
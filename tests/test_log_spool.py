@@ -0,0 +1,48 @@
+import os
+
+from app.core.log_spool import LogSpool
+
+def test_append_seal_read_remove(tmp_path):
+    spool = LogSpool(str(tmp_path), segment_bytes=64, max_bytes=1 << 20)
+    records = [{"path": f"/item/{i}", "status": 200} for i in range(10)]
+    for i in range(0, 10, 2):
+        spool.append(records[i:i + 2])
+
+    segments = spool.seal()
+    assert len(segments) > 1
+    assert segments == sorted(segments)
+    replayed = [record for path in segments for record in spool.read(path)]
+    assert replayed == records
+
+    for path in segments:
+        spool.remove(path)
+    spool.remove(segments[0])
+    assert spool.seal() == []
+    assert spool.stats()["segments"] == 0
+
+def test_appends_after_seal_start_a_new_segment(tmp_path):
+    spool = LogSpool(str(tmp_path), segment_bytes=1 << 20, max_bytes=1 << 20)
+    spool.append([{"n": 1}])
+    first = spool.seal()
+    spool.append([{"n": 2}])
+    assert len(spool.seal()) == len(first) + 1
+
+def test_read_skips_truncated_last_line(tmp_path):
+    spool = LogSpool(str(tmp_path), segment_bytes=1 << 20, max_bytes=1 << 20)
+    spool.append([{"n": 1}, {"n": 2}])
+    (path,) = spool.seal()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"n": 3, "pa')
+    assert spool.read(path) == [{"n": 1}, {"n": 2}]
+
+def test_oldest_segments_are_dropped_past_max_bytes(tmp_path):
+    spool = LogSpool(str(tmp_path), segment_bytes=1, max_bytes=100)
+    for i in range(20):
+        spool.append([{"n": i}])
+
+    segments = spool.seal()
+    assert sum(os.path.getsize(path) for path in segments) <= 100
+    kept = [record["n"] for path in segments for record in spool.read(path)]
+    assert kept == list(range(20 - len(kept), 20))
+    assert spool.discarded == 20 - len(kept)
+    assert spool.stats()["discarded"] == spool.discarded
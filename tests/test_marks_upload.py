@@ -0,0 +1,70 @@
+from sqlalchemy import select
+
+from app.models.examination import Examination, Marks, Registration
+
+URL = "/api/v1/examinations/bulk-upload-marks?course_code=MA101&semester_id=1"
+
+def _upload(client, content: str):
+    return client.post(URL, files={"file": ("marks.csv", content.encode("utf-8"), "text/csv")})
+
+def _offering(db, catalog):
+    db.add_all([
+        Registration(student_id="S0", course_offering_id=catalog["MA101"]),
+        Registration(student_id="S1", course_offering_id=catalog["MA101"]),
+        Registration(student_id="S2", course_offering_id=catalog["PH101"]),
+        Examination(course_offering_id=catalog["MA101"], name="Midterm", max_marks=50),
+        Examination(course_offering_id=catalog["MA101"], name="Final", max_marks=100),
+    ])
+    db.commit()
+
+def _marks(db):
+    return sorted(db.execute(
+        select(Registration.student_id, Examination.name, Marks.marks_obtained)
+        .join(Registration, Registration.id == Marks.registration_id)
+        .join(Examination, Examination.id == Marks.examination_id)
+    ).all())
+
+def test_missing_student_column_is_rejected(db, catalog, client):
+    response = _upload(client, "roll,Midterm\nS0,40\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing required column: student_id"
+
+def test_bad_cells_and_duplicate_rows(db, catalog, client):
+    _offering(db, catalog)
+    response = _upload(client, (
+        "student_id,Midterm,Final,Quiz\n"
+        "S0,40,,\n"
+        "S1,abc,80,\n"
+        "S2,30,,\n"
+        ",10,10,\n"
+        "S1,,,5\n"
+        "S0,45,90\n"
+    ))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["marks_updated"] == 4
+    assert sorted(body["exams_processed"]) == ["Final", "Midterm"]
+    assert body["errors"] == [
+        "Row 1: Invalid marks 'abc' for Midterm",
+        "Row 2: Registration not found for student S2",
+        "Row 3: Missing student_id",
+        "Row 4: Examination Quiz not found",
+    ]
+    # A later row for the same student wins
+    assert _marks(db) == [("S0", "Final", 90.0), ("S0", "Midterm", 45.0), ("S1", "Final", 80.0)]
+
+def test_reupload_overwrites_marks(db, catalog, client):
+    _offering(db, catalog)
+    _upload(client, "student_id,Midterm,Final\nS0,40,70\nS1,35,\n")
+    response = _upload(client, "student_id,Midterm\nS0,42\n")
+    assert response.json()["errors"] == []
+    assert _marks(db) == [("S0", "Final", 70.0), ("S0", "Midterm", 42.0), ("S1", "Midterm", 35.0)]
+    assert db.scalar(select(Marks.id).order_by(Marks.id.desc()).limit(1)) == 3
+
+def test_single_mark_update_upserts(db, catalog, client):
+    _offering(db, catalog)
+    mark = {"course_code": "MA101", "semester_id": 1, "student_id": "S0", "exam_name": "Final"}
+    assert client.put("/api/v1/examinations/marks", json={**mark, "marks": 60}).status_code == 200
+    assert client.put("/api/v1/examinations/marks", json={**mark, "marks": 65}).status_code == 200
+    assert _marks(db) == [("S0", "Final", 65.0)]
+    assert client.put("/api/v1/examinations/marks", json={**mark, "student_id": "S2", "marks": 1}).status_code == 404
@@ -0,0 +1,33 @@
+from app.core.metrics import LATENCY_BUCKETS, MetricsRegistry
+
+def test_render_empty_registry():
+    text = MetricsRegistry().render()
+    assert text.startswith("# HELP http_requests_total")
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert "_bucket" not in text
+
+def test_render_counters_and_histograms():
+    registry = MetricsRegistry()
+    registry.observe("GET", "/api/v1/users/{user_id}", 200, 0.02, 300, 3, 0)
+    registry.observe("GET", "/api/v1/users/{user_id}", 404, 0.2, 50, 1, 0)
+    registry.observe("GET", "/api/v1/users/{user_id}", 201, 20.0, 50, 1, 1)
+    lines = registry.render().splitlines()
+    labels = 'method="GET",route="/api/v1/users/{user_id}"'
+
+    assert f'http_requests_total{{{labels},status="2xx"}} 2' in lines
+    assert f'http_requests_total{{{labels},status="4xx"}} 1' in lines
+
+    buckets = [line for line in lines if line.startswith("http_request_duration_seconds_bucket")]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.25"}} 2' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="10.0"}} 2' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"http_request_duration_seconds_count{{{labels}}} 3" in lines
+    assert f"http_request_mongo_calls_sum{{{labels}}} 1.0" in lines
+
+def test_render_escapes_label_values():
+    registry = MetricsRegistry()
+    registry.observe("GET", 'a"b\\c', 200, 0.01, 10, 0, 0)
+    assert 'route="a\\"b\\\\c"' in registry.render()
@@ -0,0 +1,36 @@
+import logging
+
+import app.core.middleware as middleware
+from app.core.metrics import metrics_registry
+
+def test_log_failure_is_logged_and_counted(client, monkeypatch, caplog):
+    async def submit(entry):
+        raise RuntimeError("queue closed")
+
+    monkeypatch.setattr(middleware, "APILog", lambda **fields: fields)
+    monkeypatch.setattr(middleware.api_log_writer, "submit", submit)
+    failures = metrics_registry.api_log_failures
+
+    with caplog.at_level(logging.WARNING, logger=middleware.logger.name):
+        response = client.get("/api/v1/diagnostics/metrics")
+
+    assert response.status_code == 200
+    assert metrics_registry.api_log_failures == failures + 1
+    assert f"api_log_failures_total {failures + 1}" in metrics_registry.render()
+    (record,) = [r for r in caplog.records if r.name == middleware.logger.name]
+    assert record.getMessage() == "Failed to queue API log for GET /api/v1/diagnostics/metrics"
+    assert record.exc_info[1].args == ("queue closed",)
+
+def test_queued_entries_are_not_counted(client, monkeypatch):
+    entries = []
+
+    async def submit(entry):
+        entries.append(entry)
+
+    monkeypatch.setattr(middleware, "APILog", lambda **fields: fields)
+    monkeypatch.setattr(middleware.api_log_writer, "submit", submit)
+    failures = metrics_registry.api_log_failures
+
+    assert client.get("/api/v1/diagnostics/metrics").status_code == 200
+    assert metrics_registry.api_log_failures == failures
+    assert [(e["method"], e["endpoint"], e["status_code"]) for e in entries] == [("GET", "/api/v1/diagnostics/metrics", 200)]
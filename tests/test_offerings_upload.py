@@ -0,0 +1,78 @@
+from sqlalchemy import select
+
+from app.models.course import Course, CourseOffering, TeacherCourse
+from app.models.examination import Examination
+from app.models.user import User
+
+URL = "/api/v1/courses/offerings/bulk-upload"
+
+def _upload(client, content: str):
+    return client.post(URL, files={"file": ("offerings.csv", content.encode("utf-8"), "text/csv")})
+
+def _offerings(db):
+    return sorted(db.execute(select(CourseOffering.course_code, CourseOffering.semester_id)).all())
+
+def _exams(db):
+    return sorted(db.execute(
+        select(CourseOffering.course_code, CourseOffering.semester_id, Examination.name, Examination.max_marks)
+        .join(CourseOffering, CourseOffering.id == Examination.course_offering_id)
+    ).all())
+
+def test_missing_columns_are_rejected(client):
+    response = _upload(client, "course_code,course_name\nMA101,Maths\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing required columns: semester"
+
+def test_creates_courses_offerings_teachers_and_exams(db, catalog, client):
+    db.add(User(id="T1", name="Teacher", hashed_password="x"))
+    db.commit()
+    category = db.scalar(select(Course.category))
+
+    response = _upload(client, (
+        "course_code,semester,course_name,category,credits,teacher_ids,Midterm,Final\n"
+        f"EE101,Odd 2021,Circuits,{category.value},3-1-2,T1;NOBODY,50,100\n"
+        "MA101,Even 2022,,,,T1,0,\n"
+        "EE101,Odd 2021,,,,T1,40,\n"
+    ))
+    assert response.status_code == 200
+    assert response.json() == {"courses_created": 1, "offerings_created": 2, "exams_created": 2, "errors": []}
+
+    course = db.get(Course, "EE101")
+    assert (course.lecture_credits, course.tutorial_credits, course.practice_credits) == (3, 1, 2)
+    assert ("EE101", 1) in _offerings(db) and ("MA101", 2) in _offerings(db)
+    # A later row for the same offering and exam wins
+    assert _exams(db) == [("EE101", 1, "Final", 100.0), ("EE101", 1, "Midterm", 40.0)]
+    assert sorted(db.scalars(select(TeacherCourse.teacher_id))) == ["T1", "T1"]
+
+def test_bad_rows(db, catalog, client):
+    response = _upload(client, (
+        "course_code,semester,course_name,category,Midterm\n"
+        ",Odd 2021,,,\n"
+        "MA101,Spring 1999,,,\n"
+        "XX999,Odd 2021,,,\n"
+        "MA101,Odd 2021,,,abc\n"
+        "YY100,Odd 2021,Name,NOT_A_CATEGORY,\n"
+    ))
+    body = response.json()
+    assert body["courses_created"] == 0
+    assert body["offerings_created"] == 0
+    assert body["errors"][:4] == [
+        "Row 0: Missing course_code or semester",
+        "Row 1: Semester 'Spring 1999' not found",
+        "Row 2: Course XX999 not found and details not provided",
+        "Row 3: Invalid max_marks 'abc' for exam 'Midterm'",
+    ]
+    assert body["errors"][4].startswith("Row 4: ")
+    assert db.get(Course, "YY100") is None
+
+def test_reupload_updates_existing_exams(db, catalog, client):
+    db.add(User(id="T1", name="Teacher", hashed_password="x"))
+    db.commit()
+    content = "course_code,semester,teacher_ids,Midterm\nMA101,Odd 2021,T1,50\n"
+    assert _upload(client, content).json() == {"courses_created": 0, "offerings_created": 0, "exams_created": 1, "errors": []}
+
+    response = _upload(client, content.replace(",50", ",60"))
+    assert response.json() == {"courses_created": 0, "offerings_created": 0, "exams_created": 0, "errors": []}
+    assert _exams(db) == [("MA101", 1, "Midterm", 60.0)]
+    assert len(_offerings(db)) == 3
+    assert db.scalars(select(TeacherCourse.teacher_id)).all() == ["T1"]
@@ -0,0 +1,24 @@
+from app.models.examination import Registration
+
+def test_ranks_percentiles_and_pages(db, catalog, client):
+    # S1 and S2 tie; S3 has no graded credits and is not ranked
+    for student_id, points in (("S0", 10.0), ("S1", 8.0), ("S2", 8.0), ("S3", None)):
+        db.add(Registration(student_id=student_id, course_offering_id=catalog["MA101"], grade_point=points))
+    db.add(Registration(student_id="S0", course_offering_id=catalog["CS201"], grade_point=0.0))
+    db.commit()
+
+    page = client.get("/api/v1/reports/rankings", params={"limit": 2}).json()
+    assert page["total"] == 3
+    assert [(i["rank"], i["student_id"], i["percentile"], i["gpa"]) for i in page["items"]] == [
+        (1, "S1", 100.0, 8.0),
+        (1, "S2", 100.0, 8.0),
+    ]
+
+    page = client.get("/api/v1/reports/rankings", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+    # Bottom of the cohort: no other student at or below
+    assert [(i["rank"], i["student_id"], i["percentile"]) for i in page["items"]] == [(3, "S0", 0.0)]
+    assert page["next_cursor"] is None
+
+def test_sgpa_ranking_needs_a_semester(client):
+    response = client.get("/api/v1/reports/rankings", params={"metric": "sgpa"})
+    assert response.status_code == 400
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models.examination import GradeMappingVersion, Registration
+from app.models.gpa import StudentSemesterGPA
+from app.services.gpa import _rows_query, refresh_student_gpa
+from app.services.recompute import correct_mapping_version
+
+def _grade(db, student_id, offering_id, grade, points, version_id):
+    db.add(Registration(
+        student_id=student_id, course_offering_id=offering_id,
+        grade=grade, grade_point=points, grade_mapping_version_id=version_id,
+    ))
+
+def _gpa(db):
+    return sorted(db.execute(select(
+        StudentSemesterGPA.student_id, StudentSemesterGPA.semester_id,
+        StudentSemesterGPA.weighted_points, StudentSemesterGPA.cgpa,
+    )).all())
+
+def _expected_gpa(db):
+    return sorted((row[0], row[1], row[4], row[8]) for row in db.execute(_rows_query()))
+
+def _graded(db, catalog):
+    version = db.scalars(select(GradeMappingVersion)).one()
+    _grade(db, "S0", catalog["MA101"], "A", 10.0, version.id)
+    _grade(db, "S0", catalog["PH101"], "B", 8.0, version.id)
+    _grade(db, "S1", catalog["MA101"], "C", 6.0, version.id)
+    db.flush()
+    refresh_student_gpa(db, ["S0", "S1"])
+    db.commit()
+    return version
+
+def test_dry_run_writes_nothing(db, catalog):
+    version = _graded(db, catalog)
+    before = _gpa(db)
+
+    summary = correct_mapping_version(db, version, {"A": 9.0}, dry_run=True)
+    db.commit()
+
+    assert summary["students_affected"] == 1
+    assert summary["registrations_affected"] == 1
+    assert summary["largest_changes"] == [{"student_id": "S0", "old_cgpa": 9.0, "new_cgpa": 8.5, "delta": -0.5}]
+    assert _gpa(db) == before
+    assert db.scalar(select(Registration.grade_point).where(Registration.grade == "A")) == 10.0
+
+def test_correction_updates_points_and_gpa(db, catalog):
+    version = _graded(db, catalog)
+
+    correct_mapping_version(db, version, {"A": 9.0}, dry_run=False)
+    db.commit()
+
+    assert db.scalar(select(Registration.grade_point).where(Registration.grade == "A")) == 9.0
+    assert db.scalar(select(GradeMappingVersion.revision)) == 1
+    assert _gpa(db) == _expected_gpa(db)
+
+def test_grade_committed_during_correction_is_not_lost(db, catalog):
+    version = _graded(db, catalog)
+    search_path = db.execute(text("SHOW search_path")).scalar_one()
+    db.commit()
+
+    # Another request regrades S0 and holds the student's GPA lock until it commits
+    other = Session(bind=db.get_bind().engine.connect())
+    other.execute(text(f"SET search_path TO {search_path}"))
+    other.execute(
+        Registration.__table__.update()
+        .where(Registration.student_id == "S0", Registration.course_offering_id == catalog["PH101"])
+        .values(grade="C", grade_point=6.0)
+    )
+    refresh_student_gpa(other, ["S0"])
+
+    def correct():
+        correct_mapping_version(db, version, {"A": 9.0}, dry_run=False)
+        db.commit()
+
+    worker = threading.Thread(target=correct)
+    worker.start()
+    time.sleep(0.5)
+    assert worker.is_alive()
+    other.commit()
+    other.close()
+    worker.join(10)
+
+    assert _gpa(db) == _expected_gpa(db)
+    assert db.scalar(select(StudentSemesterGPA.cgpa).where(StudentSemesterGPA.student_id == "S0")) == 7.5
+
+def test_students_graded_after_the_lock_are_refreshed(db, catalog, monkeypatch):
+    import app.services.recompute as recompute
+
+    version = _graded(db, catalog)
+    load_rows = recompute._load_rows
+
+    def load_rows_then_grade(session, student_ids):
+        rows = load_rows(session, student_ids)
+        # Simulates a grade committed by another request after the affected set was read
+        _grade(session, "S2", catalog["PH101"], "A", 10.0, version.id)
+        session.flush()
+        return rows
+
+    monkeypatch.setattr(recompute, "_load_rows", load_rows_then_grade)
+    correct_mapping_version(db, version, {"A": 9.0}, dry_run=False)
+    db.commit()
+
+    assert db.scalar(select(StudentSemesterGPA.cgpa).where(StudentSemesterGPA.student_id == "S2")) == 9.0
+    assert _gpa(db) == _expected_gpa(db)
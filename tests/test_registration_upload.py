@@ -0,0 +1,67 @@
+from sqlalchemy import select
+
+from app.models.examination import Registration
+
+def _upload(client, content: str):
+    return client.post(
+        "/api/v1/registrations/bulk-upload",
+        files={"file": ("registrations.csv", content.encode("utf-8"), "text/csv")},
+    )
+
+def _registrations(db):
+    return sorted(db.execute(select(Registration.student_id, Registration.course_offering_id)).all())
+
+def test_missing_columns_are_rejected(client):
+    response = _upload(client, "student_id,semester\nS0,Odd 2021\n")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Missing required columns: course_code"
+
+def test_empty_file_is_rejected(client):
+    response = _upload(client, "")
+    assert response.status_code == 400
+
+def test_upload_creates_registrations(db, catalog, client):
+    response = _upload(client, (
+        "student_id,course_code,semester\r\n"
+        "S0,MA101,Odd 2021\r\n"
+        "S1,MA101,Odd 2021\r\n"
+        "S1,CS201,Even 2022\r\n"
+    ))
+    assert response.status_code == 200
+    assert response.json() == {"registrations_created": 3, "errors": []}
+    assert _registrations(db) == [("S0", 1), ("S1", 1), ("S1", 3)]
+
+def test_duplicate_and_bad_rows(db, catalog, client):
+    response = _upload(client, (
+        "student_id,course_code,semester\n"
+        "S0,MA101,Odd 2021\n"
+        "S0,MA101,Odd 2021\n"
+        ",MA101,Odd 2021\n"
+        "S0,MA101,\n"
+        "S0,MA101,Spring 1999\n"
+        "S0,CS201,Odd 2021\n"
+        "NOBODY,MA101,Odd 2021\n"
+    ))
+    assert response.status_code == 200
+    assert response.json() == {
+        "registrations_created": 1,
+        "errors": [
+            "Row 2: Missing required fields",
+            "Row 3: Missing semester info",
+            "Row 4: Semester 'Spring 1999' not found",
+            "Row 5: Course offering not found for CS201 in semester 1",
+            "Row 6: Student NOBODY not found",
+        ],
+    }
+    assert _registrations(db) == [("S0", 1)]
+
+def test_reupload_skips_existing_registrations(db, catalog, client):
+    content = "student_id,course_code,semester\nS0,MA101,Odd 2021\nS1,PH101,Odd 2021\n"
+    assert _upload(client, content).json()["registrations_created"] == 2
+    response = _upload(client, content + "S2,PH101,Odd 2021\n")
+    assert response.json() == {"registrations_created": 1, "errors": []}
+    assert _registrations(db) == [("S0", 1), ("S1", 2), ("S2", 2)]
+
+def test_quoted_fields_and_non_ascii(db, catalog, client):
+    response = _upload(client, 'student_id,course_code,semester,note\nS0,MA101,"Odd 2021","Ünïcode, with\nnewline"\n')
+    assert response.json() == {"registrations_created": 1, "errors": []}
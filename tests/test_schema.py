@@ -0,0 +1,104 @@
+from sqlalchemy import func, select, text
+
+from app.db.dedupe_marks import dedupe_marks, find_duplicate_marks
+from app.db.schema import _UNIQUE_INDEXES, _backfill_student_gpa, _ensure_unique_index
+from app.models.examination import Compartment, Examination, Marks, Registration
+from app.models.gpa import StudentSemesterGPA
+
+def test_student_gpa_is_backfilled_once(db, catalog):
+    db.add_all([
+        Registration(student_id="S0", course_offering_id=catalog["MA101"], grade="A", grade_point=10.0),
+        Registration(student_id="S0", course_offering_id=catalog["CS201"], grade="C", grade_point=6.0),
+        Registration(student_id="S1", course_offering_id=catalog["PH101"], grade="B", grade_point=8.0),
+    ])
+    db.commit()
+    assert db.scalar(select(func.count()).select_from(StudentSemesterGPA)) == 0
+
+    _backfill_student_gpa(db.connection())
+    cgpa = dict(db.execute(
+        select(StudentSemesterGPA.student_id, StudentSemesterGPA.cgpa)
+        .where(StudentSemesterGPA.semester_id == 2)
+        .union_all(select(StudentSemesterGPA.student_id, StudentSemesterGPA.cgpa).where(StudentSemesterGPA.student_id == "S1"))
+    ).all())
+    assert cgpa == {"S0": 8.0, "S1": 8.0}
+
+    # Once populated, the table is left to the grade writes
+    db.execute(Registration.__table__.update().values(grade_point=0.0))
+    _backfill_student_gpa(db.connection())
+    assert db.scalar(select(StudentSemesterGPA.cgpa).where(StudentSemesterGPA.student_id == "S1")) == 8.0
+
+def test_empty_database_is_not_backfilled(db):
+    _backfill_student_gpa(db.connection())
+    assert db.scalar(select(func.count()).select_from(StudentSemesterGPA)) == 0
+
+def _without_unique_index(db, table, name):
+    db.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {name}"))
+    db.commit()
+
+def _has_index(db, name):
+    return db.execute(
+        text("SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() AND indexname = :name"), {"name": name}
+    ).first() is not None
+
+def _ensure(db, table):
+    (name, _, columns, dedupe), = [entry for entry in _UNIQUE_INDEXES if entry[1] == table]
+    _ensure_unique_index(db.connection(), name, table, columns, dedupe)
+    return name
+
+def _duplicate_marks(db, catalog):
+    registration = Registration(student_id="S0", course_offering_id=catalog["MA101"])
+    other = Registration(student_id="S1", course_offering_id=catalog["MA101"])
+    midterm = Examination(course_offering_id=catalog["MA101"], name="Midterm", max_marks=50)
+    final = Examination(course_offering_id=catalog["MA101"], name="Final", max_marks=100)
+    db.add_all([registration, other, midterm, final])
+    db.flush()
+    db.add_all([
+        Marks(id=1, registration_id=registration.id, examination_id=midterm.id, marks_obtained=40),
+        Marks(id=2, registration_id=registration.id, examination_id=midterm.id, marks_obtained=40),
+        Marks(id=3, registration_id=registration.id, examination_id=final.id, marks_obtained=70),
+        Marks(id=4, registration_id=registration.id, examination_id=final.id, marks_obtained=55),
+        Marks(id=5, registration_id=other.id, examination_id=final.id, marks_obtained=90),
+    ])
+    db.commit()
+
+def test_duplicate_marks_are_never_deleted_at_startup(db, catalog):
+    _without_unique_index(db, "marks", "marks_registration_id_examination_id_key")
+    _duplicate_marks(db, catalog)
+
+    name = _ensure(db, "marks")
+    assert not _has_index(db, name)
+    assert sorted(db.scalars(select(Marks.id))) == [1, 2, 3, 4, 5]
+
+def test_dedupe_marks_reports_and_resolves_conflicts(db, catalog):
+    _without_unique_index(db, "marks", "marks_registration_id_examination_id_key")
+    _duplicate_marks(db, catalog)
+
+    groups = find_duplicate_marks(db.connection())
+    assert [(g.student_id, g.examination, g.rows, g.conflicting) for g in groups] == [
+        ("S0", "Midterm", [(1, 40.0), (2, 40.0)], False),
+        ("S0", "Final", [(3, 70.0), (4, 55.0)], True),
+    ]
+
+    deleted, unresolved = dedupe_marks(db.connection())
+    assert deleted == 1
+    assert [g.examination for g in unresolved] == ["Final"]
+    assert sorted(db.scalars(select(Marks.id))) == [1, 3, 4, 5]
+    assert not _has_index(db, "marks_registration_id_examination_id_key")
+
+    deleted, unresolved = dedupe_marks(db.connection(), keep="highest")
+    assert (deleted, unresolved) == (1, [])
+    assert sorted(db.scalars(select(Marks.id))) == [1, 4, 5]
+    assert _has_index(db, "marks_registration_id_examination_id_key")
+
+def test_duplicate_compartments_keep_the_row_in_effect(db, catalog):
+    _without_unique_index(db, "compartment", "compartment_student_id_course_offering_id_key")
+    db.add_all([
+        Compartment(id=1, student_id="S0", course_offering_id=catalog["MA101"], grade="F", grade_point=0.0),
+        Compartment(id=2, student_id="S0", course_offering_id=catalog["MA101"], grade="B", grade_point=8.0),
+        Compartment(id=3, student_id="S1", course_offering_id=catalog["MA101"], grade="C", grade_point=6.0),
+    ])
+    db.commit()
+
+    name = _ensure(db, "compartment")
+    assert _has_index(db, name)
+    assert sorted(db.scalars(select(Compartment.id))) == [2, 3]
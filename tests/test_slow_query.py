@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.slow_query import explainable, parameter_types
+
+@pytest.mark.parametrize("statement", [
+    "SELECT id FROM registration WHERE student_id = %(id)s",
+    "  select count(*) from marks",
+    "SELECT s.student_id FROM studentsemestergpa s JOIN semester ON true  -- update notes",
+])
+def test_plain_selects_are_explained(statement):
+    assert explainable(statement)
+
+@pytest.mark.parametrize("statement", [
+    "SELECT pg_advisory_xact_lock(hashtext('grade_mapping_versions'))",
+    """SELECT pg_advisory_xact_lock(k) FROM (
+           SELECT DISTINCT hashtext('student_gpa:' || id) AS k FROM unnest(CAST(%(ids)s AS text[])) AS id ORDER BY k
+       ) keys""",
+    "SELECT pg_try_advisory_lock(1)",
+    "SELECT nextval('registration_id_seq')",
+    "SELECT id FROM registration WHERE id = 1 FOR UPDATE",
+    "SELECT id FROM registration FOR NO KEY UPDATE SKIP LOCKED",
+    "SELECT id FROM registration FOR SHARE",
+    "UPDATE registration SET grade = 'A'",
+    "WITH d AS (DELETE FROM marks RETURNING id) SELECT count(*) FROM d",
+])
+def test_side_effects_are_not_explained(statement):
+    assert not explainable(statement)
+
+def test_parameter_types_never_include_values():
+    assert parameter_types({"id": "S0", "n": 1}) == {"id": "str", "n": "int"}
+    assert parameter_types(("S0", 1.5)) == ["str", "float"]
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import select
+
+from app.core import security
+from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.models.discipline import Discipline
+from app.models.user import User, UserRole, UserRoleEntry
+
+URL = "/api/v1/users/bulk-upload"
+HEADER = "id,name,email,password,gender,address,phone_number,discipline_code,roles\n"
+
+@pytest.fixture(autouse=True)
+def small_hash_pool(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_HASH_PROCESSES", 1)
+    yield
+    if password_hasher._process_pool is not None:
+        password_hasher._process_pool.shutdown()
+        password_hasher._process_pool = None
+
+def _upload(client, content: str):
+    return client.post(URL, files={"file": ("users.csv", content.encode("utf-8"), "text/csv")})
+
+def _roles(db):
+    return sorted((user_id, role.value) for user_id, role in db.execute(select(UserRoleEntry.user_id, UserRoleEntry.role)))
+
+def test_missing_columns_are_rejected(client):
+    response = _upload(client, "id,name\nU1,One\n")
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Missing required columns: ")
+
+def test_creates_users_and_reports_bad_rows(db, client):
+    db.add(Discipline(code="CSE", name="Computer Science"))
+    db.commit()
+
+    response = _upload(client, HEADER + (
+        "U1,One,one@x.org,secret,M,Addr,123,CSE,student;teacher\n"
+        ",Nobody,,,,,,,student\n"
+        "U1,Again,,,,,,,student\n"
+        "U2,Two,,,,,,XXX,student\n"
+        "U3,Three,,,,,,,\n"
+        "U4,Four,,,,,,,student;wizard\n"
+    ))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["users_created"] == 2
+    assert body["errors"] == [
+        "Row 1: Missing user id",
+        "Row 2: Duplicate user id U1 in file",
+        "Row 3: Discipline XXX not found",
+        "Row 4: Missing roles",
+        "Row 5: Invalid role wizard",
+    ]
+    assert set(body["timings"]) == {"parse_ms", "validate_ms", "hash_ms", "insert_ms"}
+
+    one = db.get(User, "U1")
+    assert (one.name, one.discipline_code) == ("One", "CSE")
+    assert security.verify_password("secret", one.hashed_password)
+    # A blank password falls back to the default
+    assert security.verify_password("password123", db.get(User, "U4").hashed_password)
+    assert _roles(db) == [("U1", "student"), ("U1", "teacher"), ("U4", "student")]
+
+def test_reupload_skips_existing_users(db, client):
+    content = HEADER + "U1,One,,first,,,,,student\n"
+    assert _upload(client, content).json()["users_created"] == 1
+
+    response = _upload(client, content.replace("first", "second"))
+    assert response.json()["users_created"] == 0
+    assert response.json()["errors"] == ["Row 0: User U1 already exists"]
+    assert security.verify_password("first", db.get(User, "U1").hashed_password)
+    assert db.scalars(select(UserRoleEntry.role)).all() == [UserRole.STUDENT]